@@ -1,37 +1,17 @@
-from langchain.agents import AgentExecutor, create_react_agent
-from langchain.prompts import PromptTemplate
+import base64
+
+from langchain.agents import AgentExecutor, create_react_agent, create_tool_calling_agent
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 # from langchain_groq import ChatGroq
 from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnablePassthrough
+from config import AGENT_OPTIONS, LLM_GATEWAY
 
-def create_agent(tools, api_key):
-    """Create and return the LangChain agent with specified tools."""
-
-    # Initialize Groq model
-    # llm = ChatGroq(
-    #     model="llama-3.3-70b-versatile",
-    #     temperature=0,
-    #     max_tokens=2048,
-    #     api_key=api_key
-    # )
-
-    # For standard OpenAI API
-    llm = ChatOpenAI(
-        model="gpt-4o",
-        api_key=api_key,  # Change your .env to use OPENAI_API_KEY
-        temperature=1.0,
-        base_url= "https://api.openai.com/v1"
-    )
-
-    # Create prompt template with streamlined sections
-    prompt = PromptTemplate(
-        input_variables=["input", "agent_scratchpad", "tool_names", "tools"],
-        template="""
-You are an expert AI agent controlling a web browser with DOM analysis and human-like interaction capabilities.
-
-Available tools: {tool_names}
-Tool details: {tools}
+AGENT_INTRO = """You are an expert AI agent controlling a web browser with DOM analysis and human-like interaction capabilities.
+"""
 
-## PLANNING AND EXECUTION FRAMEWORK:
+AGENT_GUIDELINES = """## PLANNING AND EXECUTION FRAMEWORK:
 
 0. NAVIGATE - First determine and go to the appropriate website based on the user query
 
@@ -103,6 +83,7 @@ Tool details: {tools}
 • ALWAYS use VisualClick on an input field BEFORE using Type
 • Two-step process: 1) VisualClick to focus the field, 2) Type to enter text
 • NEVER attempt to Type without first clicking the field
+• For forms with several fields, use FillForm to fill them all (and submit) in one step
 
 ## ELEMENT SELECTION GUIDE:
 
@@ -127,9 +108,13 @@ Examples:
 • INITIAL NAVIGATION: Determine appropriate website → Navigate to site → Verify arrival
 • PAGE NAVIGATION: AnalyzePage → Plan interaction → Execute actions
 • LOGIN: AnalyzePage → VisualClick username field → Type → VisualClick password field → Type → VisualClick login button
+• FORMS: AnalyzePage → FillForm with every field's ID and value plus the submit button ID
 • SEARCH: AnalyzePage → VisualClick search field → Type query → Press Enter or VisualClick search button
 • NAVIGATION: AnalyzePage → VisualClick menu item → Wait for dropdown → VisualClick submenu item
 • SHOPPING: Navigate to retailer → Search for product → Filter/browse results → Select product → Add to cart/purchase
+• COMPARING OPTIONS: AnalyzePage → ReadPages with the candidate link IDs → Pick the best match
+• COLLECTING DATA: AnalyzePage → ExtractData for tables, result lists and price lists → page through with the offset it suggests
+• LONG PAGES AND FEEDS: ScrollUntil the text or element you need, or a number of new items → work with the new elements it returns
 
 ## ERROR RECOVERY:
 
@@ -143,8 +128,9 @@ Examples:
 • Check after each action
 • When goal achieved, proceed to Final Answer
 • Only verify if needed
+"""
 
-Format your response as:
+REACT_FORMAT = """Format your response as:
 
 Question: {input}
 
@@ -182,10 +168,125 @@ Final Answer: [Provide the specific information requested by the user, including
 Question: {input}
 {agent_scratchpad}
 """
+
+TOOL_CALLING_NOTES = """## PARALLEL READS:
+
+• Read-only tools ({read_only_tools}) do not change the page:
+  - Request several of them in the same turn when they don't depend on each other
+  - Use ReadPages to check several candidate links at once instead of visiting them one by one
+• Tools that change the page (clicks, typing, navigation) run one after another in the order requested
+• When the goal is achieved, reply with the final answer instead of calling another tool
+"""
+
+# Prompt for the default ReAct agent
+REACT_TEMPLATE = "\n" + AGENT_INTRO + "\nAvailable tools: {tool_names}\nTool details: {tools}\n\n" + AGENT_GUIDELINES + "\n" + REACT_FORMAT
+
+
+def screenshot_messages(intermediate_steps):
+    """
+    Messages showing the model the screenshots taken in the last turn.
+
+    Tool results reach the model as text, so images from the Screenshot tool (observations
+    carrying an image) are sent as a separate user message after the scratchpad, on the
+    next call only. Later calls see the text of the observation, not the image again.
+    """
+    steps = list(intermediate_steps or [])
+    if not steps:
+        return []
+
+    # The last turn: the last step, plus the steps requested in the same tool-calling message
+    last_message = getattr(steps[-1][0], "message_log", None)
+    turn = [steps[-1]]
+    for action, observation in reversed(steps[:-1]):
+        if not last_message or getattr(action, "message_log", None) != last_message:
+            break
+        turn.insert(0, (action, observation))
+
+    content = []
+    for action, observation in turn:
+        image = getattr(observation, "image", None)
+        if image:
+            content.append({"type": "text", "text": f"Screenshot from {action.tool}:"})
+            content.append({"type": "image_url",
+                            "image_url": {"url": "data:image/jpeg;base64," + base64.b64encode(image).decode("ascii")}})
+    return [HumanMessage(content=content)] if content else []
+
+
+def create_llm(api_key):
+    """Create the chat model used by the agent."""
+
+    # Initialize Groq model
+    # llm = ChatGroq(
+    #     model="llama-3.3-70b-versatile",
+    #     temperature=0,
+    #     max_tokens=2048,
+    #     api_key=api_key
+    # )
+
+    # Every model in the process shares one pooled, rate-governed HTTP client
+    client_options = {}
+    if LLM_GATEWAY.get("enabled", True):
+        from llm_gateway import get_gateway
+        client_options["http_client"] = get_gateway(LLM_GATEWAY).client
+
+    # For standard OpenAI API
+    llm = ChatOpenAI(
+        model="gpt-4o",
+        api_key=api_key,  # Change your .env to use OPENAI_API_KEY
+        temperature=1.0,
+        base_url=LLM_GATEWAY["base_url"],
+        **client_options
     )
 
-    # Create the agent
-    agent = create_react_agent(llm, tools, prompt)
+    return llm
+
+def create_agent(tools, api_key, llm=None, mode=None, trim_intermediate_steps=-1):
+    """
+    Create and return the LangChain agent with specified tools.
+
+    mode is "react" (one tool per turn, text format) or "tool_calling" (native tool calls,
+    several read-only tools per turn); it defaults to AGENT_OPTIONS["mode"].
+    """
+
+    # Reuse a model built ahead of time (e.g. while Chrome was starting)
+    if llm is None:
+        llm = create_llm(api_key)
+
+    mode = mode or AGENT_OPTIONS.get("mode", "react")
+
+    if mode == "tool_calling":
+        # Native tool calls let the model request several read-only tools in one turn
+        read_only_tools = ", ".join(tool.name for tool in tools if (tool.metadata or {}).get("read_only"))
+        system_prompt = AGENT_INTRO + "\n" + AGENT_GUIDELINES + "\n" + TOOL_CALLING_NOTES.format(read_only_tools=read_only_tools)
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", system_prompt),
+            ("human", "{input}"),
+            MessagesPlaceholder("agent_scratchpad"),
+            MessagesPlaceholder("screenshots", optional=True),
+        ])
+        agent = create_tool_calling_agent(llm, tools, prompt)
+    else:
+        # Create prompt template with streamlined sections; a chat prompt so screenshots can follow it
+        prompt = ChatPromptTemplate.from_messages([
+            ("human", REACT_TEMPLATE),
+            MessagesPlaceholder("screenshots", optional=True),
+        ])
+
+        # Create the agent
+        if AGENT_OPTIONS.get("streaming", False):
+            # Stream the completion and run the tool as soon as its Action Input is complete
+            from langchain_core.runnables import RunnableLambda
+            from streaming_react import StreamingReActLLM
+            agent = create_react_agent(RunnableLambda(StreamingReActLLM(llm)), tools, prompt, stop_sequence=False)
+        else:
+            agent = create_react_agent(llm, tools, prompt)
+
+    # Steps restored from a checkpoint ("resume_steps" input) come before this run's own steps
+    agent = RunnablePassthrough.assign(
+        intermediate_steps=lambda x: list(x.get("resume_steps") or []) + list(x["intermediate_steps"])
+    ) | RunnablePassthrough.assign(
+        screenshots=lambda x: screenshot_messages(x["intermediate_steps"])
+    ) | agent
 
     # Create the agent executor
     agent_executor = AgentExecutor(
@@ -196,7 +297,8 @@ Question: {input}
         max_iterations=50,
         max_execution_time=None,
         early_stopping_method="force",
-        return_intermediate_steps=True
+        return_intermediate_steps=True,
+        trim_intermediate_steps=trim_intermediate_steps
     )
 
     return agent_executor
@@ -0,0 +1,252 @@
+import time
+
+from langchain.callbacks.base import BaseCallbackHandler
+
+
+class FirstActionTimer(BaseCallbackHandler):
+    """Record how long a task takes before the agent runs its first tool."""
+
+    def __init__(self, start_time=None):
+        self.start_time = start_time if start_time is not None else time.time()
+        self.first_action_time = None
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        if self.first_action_time is None:
+            self.first_action_time = time.time()
+
+    @property
+    def seconds(self):
+        """Seconds from task start to the first tool call, or None if no tool ran."""
+        if self.first_action_time is None:
+            return None
+        return self.first_action_time - self.start_time
+
+
+class EventStreamCallback(BaseCallbackHandler):
+    """Forward agent steps to an emit(event_dict) function while a task runs."""
+
+    def __init__(self, emit):
+        self.emit = emit
+        self.step = 0
+
+    def on_agent_action(self, action, **kwargs):
+        self.step += 1
+        self.emit({"event": "action", "step": self.step, "tool": action.tool,
+                   "tool_input": action.tool_input, "log": action.log})
+
+    def on_tool_end(self, output, **kwargs):
+        self.emit({"event": "observation", "step": self.step, "observation": str(output)})
+
+    def on_tool_error(self, error, **kwargs):
+        self.emit({"event": "tool_error", "step": self.step, "error": str(error)})
+
+    def on_agent_finish(self, finish, **kwargs):
+        self.emit({"event": "finish", "step": self.step, "output": finish.return_values.get("output", "")})
+
+
+class CheckpointCallback(BaseCallbackHandler):
+    """Persist every completed step of a task to a TaskCheckpoint so it can be resumed."""
+
+    def __init__(self, checkpoint, page_getter=None, targets_getter=None):
+        self.checkpoint = checkpoint
+        self.page_getter = page_getter
+        self.targets_getter = targets_getter
+        self.pending_action = None
+
+    def on_agent_action(self, action, **kwargs):
+        self.pending_action = action
+        if self.targets_getter:
+            self.targets_getter()  # Drop anything resolved outside this step
+
+    def on_tool_end(self, output, **kwargs):
+        if self.pending_action is None:
+            return
+        try:
+            page = self.page_getter() if self.page_getter else None
+            targets = self.targets_getter() if self.targets_getter else None
+            self.checkpoint.record_step(self.pending_action, output, page, targets)
+        except Exception as e:
+            print(f"Could not write checkpoint: {e}")
+        self.pending_action = None
+
+    def on_agent_finish(self, finish, **kwargs):
+        try:
+            self.checkpoint.finish(finish.return_values.get("output", ""))
+        except Exception as e:
+            print(f"Could not finish checkpoint: {e}")
+
+
+def _token_usage(response):
+    """(prompt_tokens, completion_tokens) reported for an LLM call, or (None, None)."""
+    usage = (response.llm_output or {}).get("token_usage") if response is not None else None
+    if usage:
+        return usage.get("prompt_tokens"), usage.get("completion_tokens")
+    try:
+        metadata = response.generations[0][0].message.usage_metadata
+        if metadata:
+            return metadata.get("input_tokens"), metadata.get("output_tokens")
+    except (AttributeError, IndexError, TypeError):
+        pass
+    return None, None
+
+
+def _chars_in_prompt(prompt, observation):
+    """
+    How much of an observation actually made it into a prompt.
+
+    Older observations may have been cut short (MemoryBudget trims them to a prefix), so
+    this finds the longest prefix of the observation present in the prompt.
+    """
+    if not observation or observation in prompt:
+        return len(observation) if observation else 0
+    low, high = 0, len(observation)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if observation[:middle] in prompt:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _message_text(messages):
+    """Text of a chat prompt, leaving out image parts (screenshots) that are not billed by length."""
+    parts = []
+    for message in messages:
+        if isinstance(message.content, str):
+            parts.append(message.content)
+        else:
+            parts.extend(part.get("text", "") if isinstance(part, dict) else str(part) for part in message.content)
+    return "\n".join(parts)
+
+
+def _generated_text(response):
+    try:
+        return response.generations[0][0].text
+    except (AttributeError, IndexError, TypeError):
+        return ""
+
+
+class AccountingCallback(BaseCallbackHandler):
+    """
+    Per-step token and latency accounting for one task.
+
+    A step is one LLM call plus the tools run on its answer. Token counts come from the
+    API's usage when it reports one; otherwise (e.g. streamed completions) they are
+    estimated from text length. Each prompt is split into the fixed part (instructions,
+    tool descriptions, question), measured as the size of the task's first prompt, and the
+    scratchpad, which is the rest. Scratchpad tokens are attributed to tools by how much of
+    each observation is really in the prompt (after any trimming), using the prompt's own
+    chars-per-token ratio.
+    """
+
+    CHARS_PER_TOKEN = 4.0  # Used until the API has reported real usage
+
+    def __init__(self):
+        self.steps = []
+        self.observations = []  # (tool, observation) in the order they joined the scratchpad
+        self._fixed_chars = None
+        self._llm_starts = {}
+        self._tool_starts = {}
+        self._chars_per_token = self.CHARS_PER_TOKEN
+
+    def on_llm_start(self, serialized, prompts, run_id=None, **kwargs):
+        self._llm_starts[run_id] = (time.time(), prompts[0] if prompts else "")
+
+    def on_chat_model_start(self, serialized, messages, run_id=None, **kwargs):
+        self._llm_starts[run_id] = (time.time(), _message_text(messages[0]) if messages else "")
+
+    def on_llm_end(self, response, run_id=None, **kwargs):
+        self._finish_llm(run_id, response)
+
+    def on_llm_error(self, error, run_id=None, response=None, **kwargs):
+        # Closing a stream early (AGENT_STREAMING) ends the call with GeneratorExit
+        self._finish_llm(run_id, response, early=isinstance(error, GeneratorExit))
+
+    def _finish_llm(self, run_id, response, early=False):
+        started_at, prompt = self._llm_starts.pop(run_id, (time.time(), ""))
+        prompt_chars = len(prompt)
+        if self._fixed_chars is None:
+            self._fixed_chars = prompt_chars  # The first prompt has no scratchpad yet
+        prompt_tokens, completion_tokens = _token_usage(response)
+        estimated = prompt_tokens is None
+        if estimated:
+            prompt_tokens = round(prompt_chars / self._chars_per_token)
+            completion_tokens = round(len(_generated_text(response)) / self._chars_per_token)
+        elif prompt_chars:
+            self._chars_per_token = prompt_chars / max(1, prompt_tokens)
+
+        scratchpad_tokens = min(prompt_tokens,
+                                round(max(0, prompt_chars - self._fixed_chars) / self._chars_per_token))
+        by_tool = {}
+        for tool, observation in self.observations:
+            by_tool[tool] = by_tool.get(tool, 0) + _chars_in_prompt(prompt, observation)
+        self.steps.append({
+            "step": len(self.steps) + 1,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "fixed_prompt_tokens": prompt_tokens - scratchpad_tokens,
+            "scratchpad_tokens": scratchpad_tokens,
+            "scratchpad_by_tool": {tool: round(chars / self._chars_per_token) for tool, chars in by_tool.items()},
+            "llm_seconds": round(time.time() - started_at, 3),
+            "estimated": estimated,
+            "early_dispatch": early,
+            "tools": [],
+        })
+
+    def on_tool_start(self, serialized, input_str, run_id=None, **kwargs):
+        self._tool_starts[run_id] = ((serialized or {}).get("name", "unknown"), time.time())
+
+    def on_tool_end(self, output, run_id=None, **kwargs):
+        self._finish_tool(run_id, str(output))
+
+    def on_tool_error(self, error, run_id=None, **kwargs):
+        self._finish_tool(run_id, str(error))
+
+    def _finish_tool(self, run_id, observation):
+        tool, started_at = self._tool_starts.pop(run_id, ("unknown", time.time()))
+        record = {"tool": tool, "seconds": round(time.time() - started_at, 3),
+                  "observation_chars": len(observation),
+                  "observation_tokens": round(len(observation) / self._chars_per_token)}
+        if self.steps:
+            self.steps[-1]["tools"].append(record)
+
+        self.observations.append((tool, observation))
+
+    def summary(self):
+        """Per-step records plus task totals, by tool and by prompt part."""
+        tools = {}
+        for step in self.steps:
+            for record in step["tools"]:
+                totals = tools.setdefault(record["tool"], {"calls": 0, "seconds": 0.0, "observation_tokens": 0})
+                totals["calls"] += 1
+                totals["seconds"] = round(totals["seconds"] + record["seconds"], 3)
+                totals["observation_tokens"] += record["observation_tokens"]
+
+        return {
+            "steps": self.steps,
+            "totals": {
+                "llm_calls": len(self.steps),
+                "prompt_tokens": sum(step["prompt_tokens"] for step in self.steps),
+                "completion_tokens": sum(step["completion_tokens"] for step in self.steps),
+                "fixed_prompt_tokens": sum(step["fixed_prompt_tokens"] for step in self.steps),
+                "scratchpad_tokens": sum(step["scratchpad_tokens"] for step in self.steps),
+                "llm_seconds": round(sum(step["llm_seconds"] for step in self.steps), 3),
+                "tool_seconds": round(sum(totals["seconds"] for totals in tools.values()), 3),
+                "estimated": any(step["estimated"] for step in self.steps),
+            },
+            "by_tool": tools,
+        }
+
+    def report(self, summary=None):
+        summary = summary or self.summary()
+        totals = summary["totals"]
+        if not totals["llm_calls"]:
+            return "Accounting: no LLM calls"
+        heaviest = sorted(summary["by_tool"].items(), key=lambda item: item[1]["observation_tokens"], reverse=True)[:3]
+        return (f"Accounting: {totals['llm_calls']} LLM calls, {totals['prompt_tokens']} prompt tokens "
+                f"({totals['fixed_prompt_tokens']} fixed, {totals['scratchpad_tokens']} scratchpad) + "
+                f"{totals['completion_tokens']} completion{' (estimated)' if totals['estimated'] else ''}; "
+                f"LLM {totals['llm_seconds']:.1f}s, tools {totals['tool_seconds']:.1f}s; largest observations: "
+                + ", ".join(f"{tool} {usage['observation_tokens']} tokens/{usage['calls']} calls"
+                            for tool, usage in heaviest))
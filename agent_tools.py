@@ -14,15 +14,33 @@ def create_browser_tools(controller):
             func=lambda desc: controller.visual_click(desc.strip("'\"").strip()),
             description=f"Click an element using visual analysis when regular DOM methods fail. Input: JSON object with element id, type and text, e.g. {{\"id\": \"5\", \"type\": \"button\", \"text\": \"add to cart\"}}. This helps target specific elements on the page with higher precision."
         ),
+        Tool(
+            name="FillForm",
+            func=lambda form_spec: controller.fill_form(form_spec.strip()),
+            description='Fill many form fields in one step instead of VisualClick + Keyboard per field. Handles text inputs, textareas, dropdowns, checkboxes and radios. Input: JSON with element IDs (from AnalyzePage) or field descriptions and values, plus an optional submit target, e.g. {"fields": [{"id": "3", "value": "Jane"}, {"target": "email", "value": "jane@example.com"}, {"id": "8", "value": "Germany"}, {"id": "9", "value": "true"}], "submit": "12"}. Returns a status line per field.'
+        ),
         Tool(
             name="AnalyzePage",
             func=lambda *args: controller.analyze_page(),
-            description="Analyze the page's structure and content using DOM traversal. Returns a comprehensive structured report that includes: 1) Page metadata (title, URL), 2) Interactive elements organized by type with IDs and descriptions, and 3) Text content hierarchically organized by headings, paragraphs and other content types. The output is formatted for easy reading and reference. No input needed."
+            description="Analyze the page's structure and content using DOM traversal. Returns a comprehensive structured report that includes: 1) Page metadata (title, URL), 2) Interactive elements organized by type with IDs and descriptions, and 3) Text content hierarchically organized by headings, paragraphs and other content types. The output is formatted for easy reading and reference. No input needed.",
+            metadata={"read_only": True}
+        ),
+        Tool(
+            name="Screenshot",
+            func=lambda *args: controller.screenshot(args[0] if args else ""),
+            description="Look at the visible part of the page when text alone is ambiguous (charts, canvas, icon-only buttons). The image is shown to you right after this step. Says so when nothing visibly changed since the last screenshot, so repeated calls are cheap. Input: optional \"force\" to always capture a new image.",
+            metadata={"read_only": True}
+        ),
+        Tool(
+            name="ReadPages",
+            func=lambda targets: controller.read_pages(targets),
+            description="Read several pages at once without leaving the current page. Loads up to 5 URLs or link element IDs (from AnalyzePage) in parallel background tabs and returns an analysis of each. Input: JSON list, e.g. [\"4\", \"7\", \"https://example.com/item\"]. Use this to compare several candidate links in one step.",
+            metadata={"read_only": True}
         ),
         Tool(
             name="Keyboard",
             func=lambda input_text: controller.keyboard_action(input_text),
-            description="Perform keyboard actions including typing text, pressing special keys, and key combinations. Supports sequences using commas (e.g., 'tab, tab, enter'). Input can be text to type or special keys like 'enter', 'tab', 'backspace', 'escape', 'f1-f12', 'pageup', 'pagedown', 'home', 'end', and combinations like 'ctrl+a', 'shift+tab', 'ctrl+enter', etc. Mac users can use 'cmd+' instead of 'ctrl+'. Also supports 'hold shift, press tab' patterns."
+            description="Perform keyboard actions including typing text, pressing special keys, and key combinations. Supports sequences using commas (e.g., 'tab, tab, enter'). Input can be text to type or special keys like 'enter', 'tab', 'backspace', 'escape', 'f1-f12', 'pageup', 'pagedown', 'home', 'end', and combinations like 'ctrl+a', 'shift+tab', 'ctrl+enter', etc. Mac users can use 'cmd+' instead of 'ctrl+'. Also supports 'hold shift, press tab' patterns. To type long text (addresses, messages, text with commas) in one fast operation, pass JSON: {\"text\": \"...\", \"mode\": \"bulk\"} (modes: human, bulk, hybrid, auto)."
         ),
         Tool(
             name="GoBack",
@@ -34,6 +52,17 @@ def create_browser_tools(controller):
             func=lambda direction="down": controller.scroll(direction),
             description="Scroll the page with virtual mouse wheel. Input: direction ('up', 'down', 'top', or 'bottom')."
         ),
+        Tool(
+            name="ScrollUntil",
+            func=lambda condition="end": controller.scroll_until(condition),
+            description='Scroll in one step until a condition holds, instead of repeating Scroll and AnalyzePage. Input: text to find (e.g. "Contact us"), a number of new items to load on infinite-scroll pages (e.g. "20"), "end" to load everything, or JSON such as {"selector": "#reviews"} or {"new_items": 50, "max_scrolls": 40}. Returns only the content and elements that appeared while scrolling, with IDs usable by VisualClick.'
+        ),
+        Tool(
+            name="ExtractData",
+            func=lambda *args: controller.extract_data(args[0] if args else ""),
+            description='Extract tables and lists of similar items (search results, product cards, price lists) from the current page as column-aligned JSON or CSV, instead of copying values from AnalyzePage. Lists every dataset found with its row count, returns a page of rows and saves all rows to a file. Input: optional "csv", a dataset number, or JSON {"dataset": 0, "format": "csv", "offset": 50, "limit": 50} to page through large results.',
+            metadata={"read_only": True}
+        ),
         Tool(
             name="GoogleSearch",
             func=lambda query: controller.search_for(query.strip("'\"").strip()),
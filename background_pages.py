@@ -0,0 +1,73 @@
+import time
+
+
+class BackgroundLoad:
+    """
+    A page in the same context that is loading a URL without blocking the caller.
+
+    Navigation is started from inside the page, so several loads can be in flight
+    at once; completion is observed through the page's domcontentloaded event.
+    """
+
+    def __init__(self, context, url, block_resources=(), setup=None):
+        self.url = url
+        self.page = context.new_page()
+        if setup is not None:
+            setup(self.page)  # e.g. init scripts, which must be added before navigating
+        self.loaded = False
+        self.started_at = time.time()
+        self.loaded_at = None
+        self.block_resources = set(block_resources)
+
+        if self.block_resources:
+            self.page.route("**/*", self._route)
+        self.page.on("domcontentloaded", self._on_loaded)
+
+        # Start the navigation and return straight away
+        self.page.evaluate("url => { window.location.href = url; }", url)
+
+    def _route(self, route):
+        if route.request.resource_type in self.block_resources:
+            route.abort()
+        else:
+            route.continue_()
+
+    def _on_loaded(self, page):
+        if not self.loaded:
+            self.loaded = True
+            self.loaded_at = time.time()
+
+    def stop_blocking(self):
+        """Let blocked resource types through again, e.g. before the page is shown to the agent."""
+        if self.block_resources:
+            self.page.unroute("**/*", self._route)
+            self.block_resources = set()
+
+    @property
+    def load_seconds(self):
+        return (self.loaded_at - self.started_at) if self.loaded_at else None
+
+    def close(self):
+        try:
+            if not self.page.is_closed():
+                self.page.close()
+        except Exception:
+            pass
+
+
+def wait_for_loads(loads, pump_page, timeout=15):
+    """
+    Wait until every background load fired domcontentloaded or the timeout passed.
+
+    Playwright's sync API only delivers events while a call is blocking, so the wait
+    pumps the event loop through short timeouts on pump_page.
+
+    Returns:
+        bool: True if all loads finished in time
+    """
+    deadline = time.time() + timeout
+    while not all(load.loaded for load in loads):
+        if time.time() >= deadline:
+            return False
+        pump_page.wait_for_timeout(50)
+    return True
@@ -1,11 +1,71 @@
 import re
+import json
 import time
 import random
+from urllib.parse import urljoin
 
 from input_helpers import (
     natural_mouse_move, update_cursor, virtual_click,
-    virtual_type
+    virtual_type, resolve_typing_mode
 )
+from background_pages import BackgroundLoad, wait_for_loads
+from key_sequences import compile_key_sequence, run_key_plan, KEY_TIMING_POLICIES
+from visual_capture import VisualCapture, ImageObservation
+from selector_memory import SelectorMemory
+from page_analysis import ANALYZE_PAGE_JS, PageAnalysisStream
+from scroll_until import SCROLL_UNTIL_JS, STATUS_MESSAGES, parse_scroll_condition
+from data_extraction import EXTRACT_DATA_JS, parse_extract_request, format_rows, save_dataset
+from prefetch import PrefetchCache, prefetch_candidates
+from browser_recovery import recoverable
+from config import (
+    READ_PAGES_OPTIONS, TYPING_OPTIONS, KEYBOARD_OPTIONS, VISUAL_CAPTURE, SELECTOR_MEMORY, PREFETCH_OPTIONS,
+    ANALYSIS_STREAMING, FIND_ELEMENT_OPTIONS, SCROLL_UNTIL, EXTRACT_DATA
+)
+
+
+# Element types FillForm treats as form fields
+FORM_FIELD_TYPES = ('input', 'textarea', 'dropdown', 'checkbox', 'radio')
+
+# Set a select, checkbox or radio at page coordinates and fire the events frameworks listen for
+SET_CHOICE_FIELD_JS = """
+    ({x, y, value}) => {
+        let el = document.elementFromPoint(x - window.pageXOffset, y - window.pageYOffset);
+        if (!el) return {success: false, detail: 'no element at position'};
+
+        // Labels and wrappers point at the real control
+        if (el.tagName === 'LABEL' && el.control) el = el.control;
+        if (!['SELECT', 'INPUT'].includes(el.tagName)) {
+            el = el.querySelector('select, input[type=checkbox], input[type=radio]') ||
+                 el.closest('label')?.control || el;
+        }
+
+        const fire = (target) => {
+            target.dispatchEvent(new Event('input', {bubbles: true}));
+            target.dispatchEvent(new Event('change', {bubbles: true}));
+        };
+
+        if (el.tagName === 'SELECT') {
+            const wanted = value.trim().toLowerCase();
+            const options = Array.from(el.options);
+            const option = options.find(o => o.value.toLowerCase() === wanted || o.text.trim().toLowerCase() === wanted) ||
+                           options.find(o => o.text.trim().toLowerCase().includes(wanted));
+            if (!option) return {success: false, detail: `no option matching '${value}'`};
+            el.focus();
+            el.value = option.value;
+            fire(el);
+            return {success: true, detail: `selected '${option.text.trim()}'`};
+        }
+
+        if (el.type === 'checkbox' || el.type === 'radio') {
+            const wanted = el.type === 'radio' ||
+                           !['false', 'no', 'off', '0', 'unchecked', ''].includes(value.trim().toLowerCase());
+            if (el.checked !== wanted) el.click();
+            return {success: el.checked === wanted, detail: el.checked ? 'checked' : 'unchecked'};
+        }
+
+        return {success: false, detail: `unsupported element ${el.tagName.toLowerCase()}`};
+    }
+"""
 
 
 class VirtualBrowserController:
@@ -14,312 +74,289 @@ class VirtualBrowserController:
         self.page = page
         self.current_x = 100
         self.current_y = 100
+        self.visual_capture = VisualCapture(VISUAL_CAPTURE)
+        self.selector_memory = (SelectorMemory(SELECTOR_MEMORY["path"], SELECTOR_MEMORY["max_entries_per_domain"])
+                                if SELECTOR_MEMORY["enabled"] else None)
+        self.prefetch = PrefetchCache(PREFETCH_OPTIONS) if PREFETCH_OPTIONS["enabled"] else None
+        self._prefetch_origin = None  # (prefetched page URL, URL it replaced) for go_back
+        self.analysis_stream = PageAnalysisStream()
+        self.resolved_targets = []  # Elements resolved by the current step, for macro recording
+        self.recovery = None  # BrowserRecovery, set by callers that can reconnect the browser
+        self._extracted = None  # (url, datasets, {(index, format): saved path}) from the last ExtractData call
 
         # Set up navigation event listeners
-        self.page.on("popup", lambda popup: self._handle_new_tab(popup))
+        self.page.on("popup", self._handle_new_tab)
 
         # Initialize cursor position
         self._update_cursor(self.current_x, self.current_y)
 
+    def attach_page(self, page):
+        """Switch the controller to another prepared page (e.g. a per-task context)."""
+        if self.prefetch is not None:
+            self.prefetch.clear()
+        self._switch_page(page)
 
-
-    def analyze_page(self):
-        """Extract all visible text and page elements in a structured format while maintaining hierarchy."""
+    def _switch_page(self, page, prefetched=False):
+        """Move listeners and state to page; a previously swapped-in prefetched page is closed."""
         try:
-            # Initialize page elements array to store detailed information
-            self.page_elements = []
-
-            # Use JavaScript to directly analyze the DOM
-            page_content = self.page.evaluate("""
-            () => {
-                // Helper function to check if element is visible
-                function isVisible(el) {
-                    if (!el.getBoundingClientRect) return false;
-                    const rect = el.getBoundingClientRect();
-
-                    // Check if element has dimensions
-                    if (rect.width <= 0 || rect.height <= 0) return false;
-
-                    // Check CSS properties that would make it invisible
-                    const style = window.getComputedStyle(el);
-                    if (style.display === 'none' ||
-                        style.visibility === 'hidden' ||
-                        parseFloat(style.opacity) <= 0.1) {
-                        return false;
-                    }
-
-                    return true;
-                }
-
-                // Helper to clean text
-                function cleanText(text) {
-                    if (!text) return '';
-                    return text.replace(/\\s+/g, ' ').trim();
-                }
-
-                // In the analyze_page method, replace the current getElementType function with this enhanced version:
-                function getElementType(el) {
-                    const tagName = el.tagName.toLowerCase();
-                    const type = el.getAttribute('type')?.toLowerCase();
-                    const role = el.getAttribute('role')?.toLowerCase();
-
-                    // Interactive elements with specific types
-                    if (tagName === 'a') return 'link';
-                    if (tagName === 'button') return 'button';
-
-                    if (tagName === 'input') {
-                        if (['submit', 'button', 'reset'].includes(type)) return 'button';
-                        if (['text', 'email', 'password', 'search', 'tel', 'url'].includes(type)) return 'input';
-                        if (type === 'checkbox') return 'checkbox';
-                        if (type === 'radio') return 'radio';
-                        return 'input'; // Default for other input types
-                    }
-
-                    if (tagName === 'select') return 'dropdown';
-                    if (tagName === 'textarea') return 'textarea';
-
-                    // Check for ARIA roles
-                    if (role === 'button') return 'button';
-                    if (role === 'link') return 'link';
-                    if (role === 'checkbox') return 'checkbox';
-                    if (role === 'radio') return 'radio';
-                    if (role === 'textbox' || role === 'searchbox') return 'input';
-                    if (role === 'combobox' || role === 'listbox') return 'dropdown';
-                    if (role === 'tab') return 'tab';
-
-                    // Check for interactive divs/spans
-                    const style = window.getComputedStyle(el);
-                    const hasClickHandler = el.onclick || el.getAttribute('onclick');
-                    const isPointable = style.cursor === 'pointer';
-
-                    if ((tagName === 'div' || tagName === 'span') && (hasClickHandler || isPointable)) {
-                        // Try to determine a more specific type for divs/spans that are clickable
-                        if (el.getAttribute('aria-haspopup') === 'true') return 'dropdown';
-                        if (el.classList.contains('btn') || el.classList.contains('button')) return 'button';
-                        if (el.getAttribute('href') || el.getAttribute('url')) return 'link';
-
-                        // If we can't determine a more specific type, default to button
-                        return 'button';
-                    }
-
-                    // Enhanced detection for additional interactive elements
-                    if (el.getAttribute('onclick') || el.getAttribute('tabindex') === '0') return 'interactive';
-                    if (style.cursor === 'pointer') return 'interactive';
-
-                    // Form label elements often need to be clickable
-                    if (tagName === 'label') return 'label';
-
-                    // Interactive list items
-                    if (tagName === 'li' && (isPointable || hasClickHandler)) return 'listitem';
-
-                    // Images that might be clickable
-                    if (tagName === 'img' && (isPointable || hasClickHandler || el.parentElement?.tagName.toLowerCase() === 'a'))
-                        return 'image';
+            self.page.remove_listener("popup", self._handle_new_tab)
+        except Exception:
+            pass  # Old page may already be closed
 
-                    // Headers that might be expandable
-                    if (['h1','h2','h3','h4','h5','h6'].includes(tagName) && (isPointable || hasClickHandler))
-                        return 'header';
-
-                    // For elements that aren't clearly interactive but have children that are
-                    if (el.querySelector('a, button, input, select, textarea')) return 'container';
-
-                    // Last resort: any element with sufficient content should be identifiable
-                    if (el.innerText && el.innerText.trim().length > 0 &&
-                        ['div', 'span', 'p', 'section', 'article'].includes(tagName))
-                        return 'content';
-
-                    return null; // Only truly non-interactive elements get null
-                }
-
-                // Get all attributes of an element
-                function getElementAttributes(el) {
-                    const result = {};
-                    for (const attr of el.attributes) {
-                        result[attr.name] = attr.value;
-                    }
-                    return result;
-                }
-
-                // Generate CSS selector for element
-                function generateSelector(el) {
-                    if (!el) return '';
-                    if (el.id) return '#' + CSS.escape(el.id);
+        # Prefetched pages belong to the controller; pages handed in by callers do not
+        if self._prefetch_origin is not None:
+            try:
+                if not self.page.is_closed():
+                    self.page.close()
+            except Exception:
+                pass
+            self._prefetch_origin = None
 
-                    let selector = el.tagName.toLowerCase();
+        self.page = page
+        self.page_elements = []
 
-                    if (el.classList && el.classList.length) {
-                        const classes = Array.from(el.classList).slice(0, 2);
-                        selector += '.' + classes.join('.');
-                    }
+        # Listeners are per page, so register them on the new one
+        self.page.on("popup", self._handle_new_tab)
+        self._update_cursor(self.current_x, self.current_y)
 
-                    return selector;
-                }
+    def _start_prefetch(self):
+        """Warm the links the agent is most likely to open next from the last analysis."""
+        from browser_setup import install_page_scripts
 
-                // Get parent info for context
-                function getParentInfo(el) {
-                    if (!el || !el.parentElement) return null;
+        urls = prefetch_candidates(self.page_elements, self.page.url, PREFETCH_OPTIONS)
+        if urls:
+            self.prefetch.prefetch(self.page.context, urls, setup=install_page_scripts)
 
-                    const parent = el.parentElement;
-                    return {
-                        tagName: parent.tagName.toLowerCase(),
-                        id: parent.id || '',
-                        className: parent.className || '',
-                        text: cleanText(parent.innerText || parent.textContent || '').substring(0, 50)
-                    };
-                }
+    def _use_prefetched(self, url):
+        """Swap in the warm page for url if one was prefetched. Returns True on success."""
+        load = self.prefetch.take(url)
+        if load is None:
+            return False
 
-                // Extract all visible content maintaining the document structure
-                function extractStructuredContent() {
-                    const extractedContent = [];
-                    const detailedElements = [];
-                    const processedNodes = new Set();
-                    let elementId = 0;
+        try:
+            if not load.loaded:
+                load.page.wait_for_load_state("domcontentloaded", timeout=20000)
+        except Exception as e:
+            print(f"Prefetched page for {url} did not load: {e}")
+            load.close()
+            return False
 
-                    // Process elements in document order
-                    function processNode(node, depth = 0) {
-                        if (!node || processedNodes.has(node)) return;
-                        processedNodes.add(node);
+        origin_url = self.page.url
+        self._switch_page(load.page)
+        self._prefetch_origin = (load.page.url, origin_url)
+        try:
+            self.page.bring_to_front()
+        except Exception:
+            pass
+        print(f"Using prefetched page for {url} (started {time.time() - load.started_at:.1f}s ago)")
+        return True
 
-                        // Only process elements (not text nodes or other node types)
-                        if (node.nodeType !== Node.ELEMENT_NODE) return;
+    @recoverable
+    def analyze_page(self):
+        """Extract all visible text and page elements in a structured format while maintaining hierarchy."""
+        try:
+            # Initialize page elements array to store detailed information
+            self.page_elements = []
 
-                        // Skip invisible elements
-                        if (!isVisible(node)) return;
+            # Store the detailed elements information alongside the formatted report
+            if ANALYSIS_STREAMING["enabled"]:
+                formatted_result, self.page_elements = self._stream_page_content(
+                    self.page, ANALYSIS_STREAMING["max_chars"])
+            else:
+                formatted_result, self.page_elements = self._extract_page_content(self.page)
 
-                        // Get element's own text (excluding child element text)
-                        let ownText = '';
+            if self.prefetch is not None:
+                try:
+                    self._start_prefetch()
+                except Exception as e:
+                    print(f"Prefetch skipped: {e}")
+            return formatted_result
 
-                        for (const child of node.childNodes) {
-                            if (child.nodeType === Node.TEXT_NODE) {
-                                ownText += child.textContent;
-                            }
-                        }
-                        ownText = cleanText(ownText);
-
-                        // Get element type
-                        const elementType = getElementType(node);
-
-                        // Replace the conditional element processing block with this:
-                        // For interactive elements, add with type prefix
-                        if (elementType) {
-                            // For input fields, use placeholder or name if there's no text
-                            let displayText = ownText;
-                            if ((elementType === 'input' || elementType === 'textarea') && !displayText) {
-                                displayText = node.getAttribute('placeholder') ||
-                                            node.getAttribute('name') ||
-                                            node.getAttribute('aria-label') ||
-                                            node.getAttribute('title') || '';
-                            }
+        except Exception as e:
+            return f"Error analyzing page: {str(e)}"
 
-                            // For images without text, use alt text
-                            if (elementType === 'image' && !displayText) {
-                                displayText = node.getAttribute('alt') || node.getAttribute('title') || 'image';
-                            }
+    @recoverable
+    def screenshot(self, input_text=""):
+        """
+        Capture a downscaled viewport screenshot, skipping it if nothing visibly changed.
 
-                            // Only include elements that have text content or are interactive inputs
-                            if (displayText || elementType === 'input' || elementType === 'button' ||
-                                elementType === 'checkbox' || elementType === 'radio') {
-                                if (!displayText) displayText = elementType; // Default text is the element type
-
-                                // Add element ID to the output
-                                extractedContent.push(`[${elementId}][${elementType}]${displayText}`);
-
-                                // Get detailed information about the element
-                                const rect = node.getBoundingClientRect();
-                                const elementInfo = {
-                                    id: elementId,
-                                    tagName: node.tagName,
-                                    type: elementType,
-                                    text: displayText,
-                                    x: rect.left + window.pageXOffset,
-                                    y: rect.top + window.pageYOffset,
-                                    width: rect.width,
-                                    height: rect.height,
-                                    center_x: rect.left + rect.width/2 + window.pageXOffset,
-                                    center_y: rect.top + rect.height/2 + window.pageYOffset,
-                                    inViewport: (
-                                        rect.top >= 0 &&
-                                        rect.left >= 0 &&
-                                        rect.bottom <= (window.innerHeight || document.documentElement.clientHeight) &&
-                                        rect.right <= (window.innerWidth || document.documentElement.clientWidth)
-                                    ),
-                                    attributes: getElementAttributes(node),
-                                    cssSelector: generateSelector(node),
-                                    parentInfo: getParentInfo(node),
-                                    innerHTML: node.innerHTML.substring(0, 200),
-                                    childElementCount: node.childElementCount,
-                                    isDisabled: node.disabled || node.hasAttribute('disabled'),
-                                    zIndex: parseInt(window.getComputedStyle(node).zIndex) || 0
-                                };
-
-                                detailedElements.push(elementInfo);
-                                elementId++;
-                            }
-                        }
-                        // For non-interactive elements with text, just add the text
-                        else if (ownText && ownText.length > 1) {
-                            extractedContent.push(ownText);
-                        }
+        Input "force" always captures a new frame. The result carries the frame's JPEG
+        (an ImageObservation), which the agent sends to the model with its next call.
+        """
+        try:
+            force = str(input_text).strip("'\" ").lower() == "force"
+            result = self.visual_capture.capture(self.page, force=force)
+            frame = result["frame"]
+
+            if result["status"] == "unchanged":
+                text = (f"No visual change since the last screenshot"
+                        + (f" (frame {frame['number']}: {frame['path']})" if frame else "")
+                        + f". Checked in {result['seconds']:.2f}s.")
+            elif result["status"] == "seen_before":
+                text = (f"Page looks the same as frame {frame['number']} captured earlier on {frame['url']} "
+                        f"({frame['path']}). No new image taken.")
+            else:
+                print(f"Screenshot saved: {frame['path']} ({frame['bytes'] / 1024:.1f} KB, {result['seconds']:.2f}s)")
+                text = (f"Captured frame {frame['number']} of {frame['url']}: {frame['path']} "
+                        f"({frame['bytes'] / 1024:.1f} KB JPEG, hash {result['hash']:016x})")
 
-                        // Process children in document order
-                        for (const child of node.children) {
-                            processNode(child, depth + 1);
-                        }
-                    }
+            # Frames whose bytes were released between tasks can only be described
+            if frame and frame.get("image"):
+                return ImageObservation(text + " The image follows.", frame["image"])
+            return text
 
-                    // Start processing from body
-                    processNode(document.body);
+        except Exception as e:
+            return f"Error taking screenshot: {str(e)}"
 
-                    return {
-                        content: extractedContent,
-                        elements: detailedElements
-                    };
-                }
+    def _extract_page_content(self, page):
+        """Run the DOM analysis on a page and return (formatted report, detailed elements)."""
+        # Use JavaScript to directly analyze the DOM
+        page_content = page.evaluate(ANALYZE_PAGE_JS)
+        return self._format_page_content(page_content['content']), page_content['elements']
 
-                // Extract content in document structure order
-                return extractStructuredContent();
-            }
-            """)
+    def _stream_page_content(self, page, max_chars=0):
+        """
+        Streaming version of _extract_page_content.
 
-            # Store the detailed elements information
-            self.page_elements = page_content['elements']
+        With max_chars set, the in-page traversal is cancelled once that much text has
+        arrived, so large pages are not serialized past the observation budget.
+        """
+        content, elements = [], []
+        stopped_early = False
+        chunks = self.analysis_stream.stream(
+            page, order=ANALYSIS_STREAMING["order"], chunk_elements=ANALYSIS_STREAMING["chunk_elements"],
+            timeout=ANALYSIS_STREAMING["timeout"])
+        try:
+            received_chars = 0
+            for chunk in chunks:
+                content.extend(chunk['content'])
+                elements.extend(chunk['elements'])
+                received_chars += sum(len(item) + 1 for item in chunk['content'])
+                if max_chars and received_chars >= max_chars and not chunk['done']:
+                    stopped_early = True
+                    break
+        finally:
+            chunks.close()
+
+        print(self.analysis_stream.report())
+        formatted_result = self._format_page_content(content)
+        if stopped_early:
+            formatted_result += "\n...analysis stopped at the observation budget; scroll or analyze again for more..."
+        return formatted_result, elements
+
+    def _format_page_content(self, content_items):
+        """Join analysis items into report lines, keeping short related items together."""
+        # Post-process the content - clean up formatting and structure
+        result = []
+        current_line = ""
+
+        # Add each item, grouping related content on the same line
+        for item in content_items:
+            # Start a new line for interactive elements or if current line is empty
+            if item.startswith('[') or not current_line:
+                if (current_line):  # Add the previous line if it exists
+                    result.append(current_line)
+                current_line = item
 
-            # Post-process the content - clean up formatting and structure
-            result = []
-            current_line = ""
+            # Keep short content items together if they're related (price, ratings, etc.)
+            elif len(item) < 30 and len(current_line) + len(item) + 1 < 80:
+                current_line += " " + item
 
-            # Add each item, grouping related content on the same line
-            for item in page_content['content']:
-                # Start a new line for interactive elements or if current line is empty
-                if item.startswith('[') or not current_line:
-                    if (current_line):  # Add the previous line if it exists
-                        result.append(current_line)
-                    current_line = item
+            # Otherwise start a new line
+            else:
+                result.append(current_line)
+                current_line = item
 
-                # Keep short content items together if they're related (price, ratings, etc.)
-                elif len(item) < 30 and len(current_line) + len(item) + 1 < 80:
-                    current_line += " " + item
+        # Don't forget the last line
+        if current_line:
+            result.append(current_line)
 
-                # Otherwise start a new line
-                else:
-                    result.append(current_line)
-                    current_line = item
+        # Format the result and limit length
+        formatted_result = "\n".join(result).strip()
 
-            # Don't forget the last line
-            if current_line:
-                result.append(current_line)
+        # if len(formatted_result) > 4000:
+        #     return formatted_result[:4000] + "\n...content truncated..."
 
-            # Format the result and limit length
-            formatted_result = "\n".join(result).strip()
+        return formatted_result
 
-            # if len(formatted_result) > 4000:
-            #     return formatted_result[:4000] + "\n...content truncated..."
+    @recoverable
+    def read_pages(self, targets):
+        """
+        Load several URLs or link element IDs in background tabs at once and analyze each.
 
-            return formatted_result
+        This is read-only: the current page, its analysis and the cursor are left untouched.
+        """
+        try:
+            urls = self._resolve_read_targets(targets)
+            if not urls:
+                return "No URLs or link IDs to read. Input: JSON list of URLs and/or link element IDs."
+
+            max_pages = READ_PAGES_OPTIONS.get("max_pages", 5)
+            skipped = urls[max_pages:]
+            urls = urls[:max_pages]
+
+            # Start every load before waiting on any of them
+            start_time = time.time()
+            loads = [BackgroundLoad(self.page.context, url, READ_PAGES_OPTIONS.get("block_resources", ()))
+                     for url in urls]
+            try:
+                wait_for_loads(loads, self.page, timeout=READ_PAGES_OPTIONS.get("timeout", 15))
+
+                max_chars = READ_PAGES_OPTIONS.get("max_chars_per_page", 3000)
+                reports = []
+                for load in loads:
+                    if not load.loaded:
+                        reports.append(f"=== {load.url} ===\nDid not finish loading in time")
+                        continue
+                    try:
+                        report, _ = self._extract_page_content(load.page)
+                        if len(report) > max_chars:
+                            report = report[:max_chars] + "\n...content truncated..."
+                        reports.append(f"=== {load.page.url} ({load.load_seconds:.1f}s) ===\n{report}")
+                    except Exception as e:
+                        reports.append(f"=== {load.url} ===\nError analyzing page: {str(e)}")
+            finally:
+                for load in loads:
+                    load.close()
+
+            print(f"Read {len(urls)} pages in parallel in {time.time() - start_time:.2f}s")
+            if skipped:
+                reports.append(f"Skipped {len(skipped)} more targets (limit {max_pages}): {', '.join(skipped)}")
+            return "\n\n".join(reports)
 
         except Exception as e:
-            return f"Error analyzing page: {str(e)}"
+            return f"Error reading pages: {str(e)}"
 
+    def _resolve_read_targets(self, targets):
+        """Turn a JSON list / comma-separated string of URLs and link IDs into absolute URLs."""
+        if isinstance(targets, str):
+            targets = targets.strip().strip("'\"")
+            try:
+                parsed = json.loads(targets)
+                targets = parsed if isinstance(parsed, list) else [parsed]
+            except ValueError:
+                targets = [part for part in re.split(r'[,\s]+', targets) if part]
+
+        urls = []
+        for target in targets:
+            target = str(target).strip().strip("'\"[]")
+            if target.isdigit():
+                # Element ID from the last AnalyzePage: use its link target
+                index = int(target)
+                elements = getattr(self, 'page_elements', None) or []
+                href = elements[index].get('attributes', {}).get('href') if 0 <= index < len(elements) else None
+                if not href:
+                    print(f"Element {target} has no link to read")
+                    continue
+                target = urljoin(self.page.url, href)
+            elif not target.startswith(('http://', 'https://')):
+                target = 'https://' + target
+
+            if target not in urls:
+                urls.append(target)
+        return urls
+
+    @recoverable
     def visual_click(self, target_description):
         """
         Click on an element based on element ID, type, and text using DOM selection.
@@ -367,6 +404,8 @@ class VirtualBrowserController:
                 else:
                     return f"No elements matching '{target_description}' found, even after scrolling."
 
+            self._note_target("click", result)
+
             # Get element coordinates for clicking
             x, y = result['center_x'], result['center_y']
             print(f"Selected element: ID={result.get('id', 'unknown')}, Type={result['type']}, Text=\"{result['text']}\"")
@@ -440,9 +479,20 @@ class VirtualBrowserController:
 
     def _find_element(self, target_type, target_text, is_structured, relaxed=False, target_description=None):
             """Find an element based on type and text with improved selection logic."""
+            description = target_text if is_structured else (target_text or target_description or "")
+
+            # Repeat visits: try the element that matched last time before scoring the whole DOM
+            if self.selector_memory is not None and not relaxed:
+                try:
+                    remembered = self.selector_memory.lookup(self.page, target_type, description)
+                    if remembered:
+                        return remembered
+                except Exception as e:
+                    print(f"Selector memory lookup failed: {e}")
+
             js_code = """
                 (params) => {
-                    const { targetType, targetText, isStructured, relaxed } = params;
+                    const { targetType, targetText, isStructured, relaxed, earlyExitRatio } = params;
 
                     // Helper function to check if element is visible
                     function isVisible(el) {
@@ -811,16 +861,44 @@ class VirtualBrowserController:
                         return score;
                     }
 
-                    // Find all elements and evaluate them
-                    const candidates = [];
-                    const allElements = document.querySelectorAll('*');
+                    // Full candidate details, built only for the element that is returned
+                    function describeCandidate(candidate) {
+                        const el = candidate.el;
+                        const rect = el.getBoundingClientRect();
+                        return {
+                            score: candidate.score,
+                            tagName: el.tagName,
+                            type: candidate.type,
+                            text: candidate.text.substring(0, 100), // Limit text length
+                            x: rect.left + window.pageXOffset,
+                            y: rect.top + window.pageYOffset,
+                            width: rect.width,
+                            height: rect.height,
+                            center_x: rect.left + rect.width/2 + window.pageXOffset,
+                            center_y: rect.top + rect.height/2 + window.pageYOffset,
+                            inViewport: rect.top >= 0 && rect.left >= 0 &&
+                                    rect.bottom <= (window.innerHeight || document.documentElement.clientHeight) &&
+                                    rect.right <= (window.innerWidth || document.documentElement.clientWidth),
+                            // Enhanced element identification
+                            attributes: getElementAttributes(el),
+                            cssSelector: generateSelector(el),
+                            xpath: getXPath(el),
+                            parentInfo: getParentInfo(el),
+                            innerHTML: el.innerHTML.substring(0, 200), // Limited for size
+                            childElementCount: el.childElementCount,
+                            isDisabled: el.disabled || el.hasAttribute('disabled') || el.getAttribute('aria-disabled') === 'true',
+                            zIndex: parseInt(window.getComputedStyle(el).zIndex) || 0
+                        };
+                    }
 
-                    allElements.forEach(el => {
+                    // Score one element; only the element, score, type and text are kept
+                    const candidates = [];
+                    function evaluate(el) {
                         const elementType = getElementType(el);
-                        if (!elementType) return; // Skip non-interactive elements
+                        if (!elementType) return 0; // Skip non-interactive elements
 
                         // Skip disabled elements unless explicitly requested
-                        if (el.disabled && !targetText?.includes('disabled')) return;
+                        if (el.disabled && !targetText?.includes('disabled')) return 0;
 
                         const elementText = getElementText(el);
 
@@ -829,58 +907,82 @@ class VirtualBrowserController:
 
                         // Only include elements with some match
                         if (score > 0) {
-                            const rect = el.getBoundingClientRect();
-
-                            candidates.push({
-                                score: score,
-                                tagName: el.tagName,
-                                type: elementType,
-                                text: elementText.substring(0, 100), // Limit text length
-                                x: rect.left + window.pageXOffset,
-                                y: rect.top + window.pageYOffset,
-                                width: rect.width,
-                                height: rect.height,
-                                center_x: rect.left + rect.width/2 + window.pageXOffset,
-                                center_y: rect.top + rect.height/2 + window.pageYOffset,
-                                inViewport: rect.top >= 0 && rect.left >= 0 &&
-                                        rect.bottom <= (window.innerHeight || document.documentElement.clientHeight) &&
-                                        rect.right <= (window.innerWidth || document.documentElement.clientWidth),
-                                // Enhanced element identification
-                                attributes: getElementAttributes(el),
-                                cssSelector: generateSelector(el),
-                                xpath: getXPath(el),
-                                parentInfo: getParentInfo(el),
-                                innerHTML: el.innerHTML.substring(0, 200), // Limited for size
-                                childElementCount: el.childElementCount,
-                                isDisabled: el.disabled || el.hasAttribute('disabled') || el.getAttribute('aria-disabled') === 'true',
-                                zIndex: parseInt(window.getComputedStyle(el).zIndex) || 0
-                            });
+                            candidates.push({ el, score, type: elementType, text: elementText });
                         }
-                    });
+                        return score;
+                    }
 
-                    // Sort candidates by score (highest first)
+                    // Highest score any element can reach for this target. The text branches are
+                    // exclusive: an exact match (450), the composite "/" parts (up to 200 each) or the
+                    // word matches (up to 25 each), plus the type and viewport bonuses
+                    const normalizedTarget = normalizeText(targetText || '');
+                    const compositeParts = normalizedTarget.includes('/')
+                        ? normalizedTarget.split('/').filter(part => part.length > 3).length : 0;
+                    const matchableWords = normalizedTarget.split(' ').filter(word => word.length > 2).length;
+                    const maxTextScore = normalizedTarget
+                        ? Math.max(450, 200 * compositeParts, (relaxed ? 15 : 25) * matchableWords) : 0;
+                    const maxScore = maxTextScore + 25 + (targetType ? 150 : 0);
+                    const stopScore = earlyExitRatio > 0 ? maxScore * earlyExitRatio : Infinity;
+
+                    // Elements on screen are scored first; the rest only if no confident match was found
+                    const viewportHeight = window.innerHeight || document.documentElement.clientHeight;
+                    const viewportWidth = window.innerWidth || document.documentElement.clientWidth;
+                    const offscreen = [];
+                    let stoppedEarly = false;
+                    let scanned = 0;
+
+                    for (const el of document.querySelectorAll('*')) {
+                        const rect = el.getBoundingClientRect();
+                        if (rect.bottom < 0 || rect.right < 0 || rect.top > viewportHeight || rect.left > viewportWidth) {
+                            offscreen.push(el);
+                            continue;
+                        }
+                        scanned++;
+                        if (evaluate(el) >= stopScore) {
+                            stoppedEarly = true;
+                            break;
+                        }
+                    }
+                    if (!stoppedEarly) {
+                        for (const el of offscreen) {
+                            scanned++;
+                            if (evaluate(el) >= stopScore) break;
+                        }
+                    }
+
+                    // Sort candidates by score (highest first); ties keep viewport-then-document order
                     candidates.sort((a, b) => b.score - a.score);
 
                     // Include top candidates for debugging
                     const alternatives = candidates.slice(1, 4).map(c => ({
-                        text: c.text,
+                        text: c.text.substring(0, 100),
                         type: c.type,
                         score: c.score,
-                        cssSelector: c.cssSelector
+                        cssSelector: generateSelector(c.el)
                     }));
 
                     // Return best match with debug info
-                    return candidates.length > 0 ? {...candidates[0], alternatives} : null;
+                    return candidates.length > 0 ?
+                        {...describeCandidate(candidates[0]), alternatives, scanned, stoppedEarly} : null;
                 }
             """
 
-            free_text = None if is_structured else (target_text or target_description or "")
-            return self.page.evaluate(js_code, {
+            start_time = time.time()
+            result = self.page.evaluate(js_code, {
                 "targetType": target_type,
-                "targetText": target_text if is_structured else free_text,
+                "targetText": description,
                 "isStructured": is_structured,
-                "relaxed": relaxed
+                "relaxed": relaxed,
+                "earlyExitRatio": FIND_ELEMENT_OPTIONS["early_exit_ratio"]
             })
+            if result:
+                print(f"Scored {result.get('scanned')} elements in {time.time() - start_time:.3f}s"
+                      + (" (stopped at a confident on-screen match)" if result.get('stoppedEarly') else ""))
+
+            if result and self.selector_memory is not None and not relaxed:
+                self.selector_memory.remember(self.page.url, target_type, description, result,
+                                              time.time() - start_time)
+            return result
 
     def _scroll_to_element(self, element):
         """
@@ -1089,6 +1191,14 @@ class VirtualBrowserController:
                                 element_info.get('tagName', '').lower() == 'a' or
                                 'href' in element_info.get('attributes', {}))
 
+        # Plain links to a prefetched page open the warm page instead of navigating
+        attributes = element_info.get('attributes', {})
+        if (self.prefetch is not None and attributes.get('href') and 'onclick' not in attributes and
+                element_info.get('tagName', '').lower() == 'a'):
+            target_url = urljoin(self.page.url, attributes['href'])
+            if self._use_prefetched(target_url):
+                return f"Clicked on element: {element_type} with text '{element_info['text']}' - Current page: {self.page.url}"
+
         try:
             self._virtual_click(x, y)
                 # Return success message
@@ -1099,125 +1209,232 @@ class VirtualBrowserController:
             self._virtual_click(x, y)
             return f"Click attempted with errors: {str(e)}"
 
-    def keyboard_action(self, input_text):
-        """Handle keyboard actions including typing text and pressing special keys."""
-        try:
-            # Check if this is a special key command
-            special_keys = {
-                # Basic navigation keys
-                "enter": "Enter",
-                "tab": "Tab",
-                "shift+tab": "Shift+Tab",
-                "backspace": "Backspace",
-                "escape": "Escape", "esc": "Escape",
-                "delete": "Delete", "del": "Delete",
-                "space": " ",
-
-                # Arrow keys
-                "up": "ArrowUp",
-                "down": "ArrowDown",
-                "left": "ArrowLeft",
-                "right": "ArrowRight",
-
-                # Common shortcuts
-                "ctrl+a": "Control+a", "cmd+a": "Meta+a",
-                "ctrl+c": "Control+c", "cmd+c": "Meta+c",
-                "ctrl+v": "Control+v", "cmd+v": "Meta+v",
-                "ctrl+x": "Control+x", "cmd+x": "Meta+x",
-                "ctrl+z": "Control+z", "cmd+z": "Meta+z",
-                "ctrl+y": "Control+y", "cmd+y": "Meta+y",
-                "ctrl+f": "Control+f", "cmd+f": "Meta+f",
-
-                # Function keys
-                "f1": "F1", "f2": "F2", "f3": "F3", "f4": "F4",
-                "f5": "F5", "f6": "F6", "f7": "F7", "f8": "F8",
-                "f9": "F9", "f10": "F10", "f11": "F11", "f12": "F12",
-
-                # Navigation shortcuts
-                "home": "Home",
-                "end": "End",
-                "pageup": "PageUp",
-                "pagedown": "PageDown",
-
-                # Special combinations
-                "alt+tab": "Alt+Tab",
-                "ctrl+enter": "Control+Enter", "cmd+enter": "Meta+Enter",
-                "ctrl+home": "Control+Home", "cmd+home": "Meta+Home",
-                "ctrl+end": "Control+End", "cmd+end": "Meta+End",
-
-                # Web-specific
-                "ctrl+t": "Control+t", "cmd+t": "Meta+t",  # New tab
-                "ctrl+w": "Control+w", "cmd+w": "Meta+w",  # Close tab
-                "ctrl+r": "Control+r", "cmd+r": "Meta+r",  # Reload
-            }
-
-            # Clean input
-            if isinstance(input_text, str):
-                input_text = input_text.strip("'\"").strip()
+    @recoverable
+    def fill_form(self, form_spec):
+        """
+        Fill several form fields in one call and optionally submit.
 
-            # Handle multiple key sequence if separated by commas or semicolons
-            if "," in input_text or ";" in input_text:
-                key_sequence = re.split(r'[,;]', input_text)
-                results = []
+        Args:
+            form_spec: JSON with "fields" (list of {"id" or "target", "value"} objects or
+                       [target, value] pairs), an optional "submit" element ID/description and
+                       an optional "typing_mode" for text fields.
+                       A plain JSON list of pairs is accepted as well.
 
-                for single_key in key_sequence:
-                    single_key = single_key.strip().lower()
-                    result = self._execute_single_key_action(single_key, special_keys)
-                    results.append(result)
-                    time.sleep(0.3)  # Brief pause between keys
+        Returns:
+            str: One status line per field plus the submit result
+        """
+        try:
+            fields, submit_target, typing_mode = self._parse_form_spec(form_spec)
+            if not fields:
+                return "No form fields given. Input: {\"fields\": [{\"id\": \"3\", \"value\": \"text\"}], \"submit\": \"7\"}"
+
+            if not getattr(self, 'page_elements', None):
+                self.analyze_page()
+
+            # Each field is resolved and located just before it is filled, since filling earlier
+            # fields can reveal, hide or move later ones
+            report = []
+            for target, value in fields:
+                element = self._resolve_form_target(target, FORM_FIELD_TYPES)
+                self._note_target("field", element)
+                if not element:
+                    report.append(f"- '{target}': not found")
+                    continue
+                element = self._current_position(element)
+                label = f"[{element.get('id', '?')}][{element['type']}] '{element.get('text', '')}'"
+                try:
+                    report.append(f"- {label}: {self._fill_form_field(element, value, typing_mode)}")
+                except Exception as e:
+                    report.append(f"- {label}: error - {str(e)}")
+
+            if submit_target is not None:
+                element = self._resolve_form_target(submit_target)
+                self._note_target("submit", element)
+                if element:
+                    x, y = self._scroll_to_element(self._current_position(element))
+                    report.append(f"Submit: {self._perform_click(x, y, element)}")
+                else:
+                    report.append(f"Submit: '{submit_target}' not found")
 
-                return "Executed key sequence: " + " → ".join(results)
-            else:
-                # Single key/text handling
-                normalized_input = input_text.lower()
-                return self._execute_single_key_action(normalized_input, special_keys)
+            return "FillForm results:\n" + "\n".join(report)
 
         except Exception as e:
-            return f"Error with keyboard action: {str(e)}"
-
-    def _execute_single_key_action(self, key_input, special_keys):
-        """Execute a single key action (helper for keyboard_action)."""
-        if key_input in special_keys:
-            key = special_keys[key_input]
-            print(f"Pressing special key: {key}")
-            time.sleep(0.2)
-
-            # Handle special case for space
-            if key == " ":
-                self.page.keyboard.press("Space")
+            return f"Error filling form: {str(e)}"
+
+    def _note_target(self, role, element):
+        """Remember a resolved element in a form that does not depend on analysis IDs."""
+        if not element:
+            self.resolved_targets.append({"role": role, "missing": True})
+            return
+        attributes = element.get('attributes') or {}
+        name = next((attributes[attr] for attr in ('name', 'id', 'placeholder', 'aria-label') if attributes.get(attr)),
+                    element.get('text', ''))
+        self.resolved_targets.append({
+            "role": role,
+            "type": element.get('type'),
+            "text": element.get('text', ''),
+            "name": str(name),
+            "input_type": attributes.get('type'),
+            "cssSelector": element.get('cssSelector'),
+        })
+
+    def take_resolved_targets(self):
+        """Return and clear the elements resolved since the last call."""
+        targets, self.resolved_targets = self.resolved_targets, []
+        return targets
+
+    def _parse_form_spec(self, form_spec):
+        """Normalize FillForm input into ([(target, value), ...], submit_target, typing_mode)."""
+        spec = json.loads(form_spec) if isinstance(form_spec, str) else form_spec
+        submit_target = None
+        typing_mode = None
+
+        if isinstance(spec, dict):
+            submit_target = spec.get("submit")
+            typing_mode = spec.get("typing_mode")
+            spec = spec.get("fields", [])
+
+        fields = []
+        for field in spec:
+            if isinstance(field, dict):
+                target = field.get("id", field.get("target", field.get("text")))
+                fields.append((str(target), field.get("value", "")))
+            elif isinstance(field, (list, tuple)) and len(field) == 2:
+                fields.append((str(field[0]), field[1]))
+
+        if isinstance(submit_target, dict):
+            submit_target = submit_target.get("id", submit_target.get("target", submit_target.get("text")))
+        return fields, submit_target, typing_mode
+
+    def _resolve_form_target(self, target, allowed_types=None):
+        """Find a form target by element ID or by matching its description against page_elements."""
+        target = str(target).strip()
+        elements = getattr(self, 'page_elements', None) or []
+
+        if target.isdigit():
+            index = int(target)
+            return elements[index] if 0 <= index < len(elements) else None
+
+        wanted = target.lower()
+        best, best_score = None, 0
+        for element in elements:
+            if allowed_types and element['type'] not in allowed_types:
+                continue
+            text = (element.get('text') or '').lower()
+            attributes = element.get('attributes', {})
+            names = [text] + [str(attributes.get(attr, '')).lower()
+                              for attr in ('name', 'id', 'placeholder', 'aria-label')]
+            if wanted in names:
+                score = 3
+            elif any(name and (wanted in name or name in wanted) for name in names):
+                score = 2
             else:
-                self.page.keyboard.press(key)
+                continue
+            if score > best_score:
+                best, best_score = element, score
+
+        if best:
+            return best
+
+        # Fall back to the full DOM search for anything the analysis missed, keeping the type filter
+        found = self._find_element(None, target, False, target_description=target)
+        if found and allowed_types and found.get('type') not in allowed_types:
+            return None
+        return found
+
+    def _current_position(self, element):
+        """Return element with its center re-read from the live page, or unchanged if it cannot be found."""
+        selector = element.get('cssSelector')
+        if not selector:
+            return element
+        try:
+            center = self.page.evaluate("""
+                (selector) => {
+                    const el = document.querySelector(selector);
+                    if (!el) return null;
+                    const rect = el.getBoundingClientRect();
+                    if (rect.width <= 0 && rect.height <= 0) return null;
+                    return {
+                        center_x: rect.left + rect.width/2 + window.pageXOffset,
+                        center_y: rect.top + rect.height/2 + window.pageYOffset
+                    };
+                }
+            """, selector)
+        except Exception:
+            return element
+        return {**element, **center} if center else element
+
+    def _fill_form_field(self, element, value, typing_mode=None):
+        """Focus one resolved field and set its value according to its type."""
+        x, y = self._scroll_to_element(element)
+        self._natural_mouse_move(x, y)
 
-            time.sleep(0.3)
-            return f"Pressed {key_input}"
+        if element['type'] in ('dropdown', 'checkbox', 'radio'):
+            result = self.page.evaluate(SET_CHOICE_FIELD_JS, {"x": x, "y": y, "value": str(value)})
+            return result.get('detail', 'done') if result.get('success') else f"failed - {result.get('detail')}"
 
-        # Handle hold-and-press patterns like "hold shift, press tab"
-        hold_match = re.match(r'hold\s+(\w+),?\s+(?:press\s+)?(\w+)', key_input)
-        if hold_match:
-            modifier, key = hold_match.groups()
-            modifier_key = special_keys.get(modifier.lower(), modifier.capitalize())
-            key_to_press = special_keys.get(key.lower(), key.capitalize())
+        # Text-like fields: clicking focuses and selects existing text, typing replaces it
+        self._virtual_click(x, y)
+        self._virtual_type(str(value), typing_mode)
+        return f"filled ({len(str(value))} chars)"
 
-            print(f"Holding {modifier_key} and pressing {key_to_press}")
-            self.page.keyboard.down(modifier_key)
-            time.sleep(0.3)
-            self.page.keyboard.press(key_to_press)
-            time.sleep(0.2)
-            self.page.keyboard.up(modifier_key)
+    @recoverable
+    def keyboard_action(self, input_text):
+        """Handle keyboard actions including typing text and pressing special keys."""
+        try:
+            # Clean input
+            if isinstance(input_text, str):
+                input_text = input_text.strip("'\"").strip()
 
-            return f"Held {modifier} and pressed {key}"
+            # Checkpoints must not keep what is typed into a password field
+            try:
+                if self.page.evaluate("() => !!document.activeElement && document.activeElement.type === 'password'"):
+                    self.resolved_targets.append({"role": "keyboard", "input_type": "password"})
+            except Exception:
+                pass
 
-        # Otherwise treat as text to type
-        self._virtual_type(key_input)
-        return f"Typed '{key_input}'"
+            # JSON input types the text as a whole (commas included) with a chosen typing mode
+            if isinstance(input_text, str) and input_text.startswith('{') and input_text.endswith('}'):
+                try:
+                    typing_request = json.loads(input_text)
+                except ValueError:
+                    typing_request = None
+                if isinstance(typing_request, dict) and "text" in typing_request:
+                    text = str(typing_request["text"])
+                    mode = typing_request.get("mode")
+                    self._virtual_type(text, mode)
+                    return f"Typed {len(text)} characters" + (f" ({mode} mode)" if mode else "")
+
+            # Parse once into keys, chords, holds and text runs (key-only plans are cached), then dispatch
+            steps = compile_key_sequence(input_text)
+            timing = KEY_TIMING_POLICIES.get(KEYBOARD_OPTIONS["timing"], KEY_TIMING_POLICIES["fast"])
+            print(f"Key plan: {' → '.join(step.label for step in steps)}")
+            completed, failure = run_key_plan(self.page, steps, timing, self._virtual_type)
+
+            if failure:
+                done = " → ".join(completed) if completed else "nothing"
+                return f"Key sequence failed at {failure}. Completed before failure: {done}"
+            if len(completed) == 1:
+                return completed[0]
+            return "Executed key sequence: " + " → ".join(completed)
 
+        except Exception as e:
+            return f"Error with keyboard action: {str(e)}"
 
+    @recoverable
     def go_back(self):
         """Navigate back to the previous page in browser history."""
         try:
             # Store current URL to verify navigation
             current_url = self.page.url
 
+            # A swapped-in prefetched page has no history of the page it replaced
+            if self._prefetch_origin is not None and current_url == self._prefetch_origin[0]:
+                origin_url = self._prefetch_origin[1]
+                self.page.goto(origin_url, wait_until="domcontentloaded", timeout=10000)
+                print(f"Successfully navigated back to: {self.page.url}")
+                return f"Navigated back to previous page: {self.page.url}"
+
             # Check if we can go back
             can_go_back = self.page.evaluate("() => window.history.length > 1")
 
@@ -1252,6 +1469,7 @@ class VirtualBrowserController:
             print(f"Error navigating back: {str(e)}")
             return f"Error navigating back: {str(e)}"
 
+    @recoverable
     def navigate(self, url):
         """
         Navigate to a URL using direct navigation.
@@ -1273,6 +1491,9 @@ class VirtualBrowserController:
 
             print(f"Attempting to navigate to: {url}")
 
+            if self.prefetch is not None and self._use_prefetched(url):
+                return f"Navigated to {url} - Current page: {self.page.url} (prefetched)"
+
             # STEP 1: Direct navigation attempt
             try:
                 print(f"Trying direct navigation to {url}")
@@ -1294,6 +1515,7 @@ class VirtualBrowserController:
             return f"Error navigating to {url}: {str(e)}"
 
 
+    @recoverable
     def scroll(self, direction="down"):
         """Scroll the page with visible virtual mouse wheel movement."""
         try:
@@ -1376,6 +1598,109 @@ class VirtualBrowserController:
                 return f"Error scrolling: {str(e)} - Fallback also failed: {str(fallback_error)}"
 
 
+    @recoverable
+    def scroll_until(self, condition):
+        """
+        Scroll until text or an element is present, N new items have loaded, or the content ends.
+
+        The whole loop runs in one in-page call. Only elements that appeared while scrolling
+        are returned; they get IDs after those of the last analysis, so VisualClick and
+        FillForm can use them directly.
+        """
+        try:
+            mode, params = parse_scroll_condition(condition)
+        except ValueError as e:
+            return f"Error: {str(e)}"
+
+        try:
+            result = self.page.evaluate(SCROLL_UNTIL_JS, {
+                "mode": mode,
+                "text": params["text"],
+                "selector": params["selector"],
+                "count": params["count"],
+                "maxScrolls": params.get("maxScrolls", SCROLL_UNTIL["max_scrolls"]),
+                "stepRatio": SCROLL_UNTIL["step_ratio"],
+                "settleMs": SCROLL_UNTIL["settle_ms"],
+                "stableRounds": SCROLL_UNTIL["stable_rounds"],
+                "timeoutMs": SCROLL_UNTIL["timeout"] * 1000,
+                "startId": len(self.page_elements),
+            })
+        except Exception as e:
+            return f"Error scrolling until {mode}: {str(e)}"
+
+        self.page_elements.extend(result["elements"])
+        status = STATUS_MESSAGES[result["status"]].format(
+            target=f"'{result['targetText']}'", new_items=result["newItems"], scrolls=result["scrolls"])
+        summary = (f"{status} ({result['scrolls']} scrolls, {result['newItems']} new items, "
+                   f"{result['seconds']:.1f}s).")
+        if result["status"] == "found":
+            summary += " It is now centered in the viewport."
+
+        if not result["content"]:
+            return summary + " No new content appeared."
+        content = self._format_page_content(result["content"])
+        max_chars = SCROLL_UNTIL["max_chars"]
+        if len(content) > max_chars:
+            content = content[:max_chars] + "\n...more new content; use AnalyzePage for the full page..."
+        return f"{summary}\nNew content:\n{content}"
+
+    @recoverable
+    def extract_data(self, request_text=""):
+        """
+        Extract tables and repeated items from the page as column-aligned JSON or CSV.
+
+        The first call on a page runs the in-page extraction; later calls with an offset page
+        through the cached rows without touching the page again. Each requested dataset is
+        saved to a file once per extraction and format.
+        """
+        try:
+            request = parse_extract_request(request_text)
+        except ValueError as e:
+            return f"Error: {str(e)}"
+
+        try:
+            url = self.page.url
+            if request["offset"] == 0 or self._extracted is None or self._extracted[0] != url:
+                datasets = self.page.evaluate(EXTRACT_DATA_JS, {
+                    "minRepeat": EXTRACT_DATA["min_repeat"],
+                    "maxCellChars": EXTRACT_DATA["max_cell_chars"],
+                    "maxDatasets": EXTRACT_DATA["max_datasets"],
+                })
+                self._extracted = (url, datasets, {})
+            datasets, saved = self._extracted[1], self._extracted[2]
+        except Exception as e:
+            return f"Error extracting data: {str(e)}"
+
+        if not datasets:
+            return "No tables or repeated items found on this page. Use AnalyzePage to read it instead."
+        if not 0 <= request["dataset"] < len(datasets):
+            return f"Error: dataset {request['dataset']} does not exist; there are {len(datasets)} (0-{len(datasets) - 1})"
+
+        lines = [f"Found {len(datasets)} datasets:"]
+        for index, dataset in enumerate(datasets):
+            title = f" '{dataset['title']}'" if dataset["title"] else ""
+            lines.append(f"[{index}] {dataset['kind']}{title}: {len(dataset['rows'])} rows x "
+                         f"{len(dataset['columns'])} columns ({', '.join(dataset['columns'][:8])})")
+
+        dataset = datasets[request["dataset"]]
+        offset = request["offset"]
+        limit = request["limit"] or EXTRACT_DATA["page_rows"]
+        rows = dataset["rows"][offset:offset + limit]
+        if not rows:
+            return "\n".join(lines + [f"\nDataset {request['dataset']} has only {len(dataset['rows'])} rows."])
+        key = (request["dataset"], request["format"])
+        if key not in saved:
+            saved[key] = save_dataset(dataset, url, request["dataset"], request["format"], EXTRACT_DATA["dir"])
+        path = saved[key]
+
+        lines.append(f"\nDataset {request['dataset']}, rows {offset}-{offset + len(rows) - 1} of "
+                     f"{len(dataset['rows'])} (all rows saved to {path}):")
+        lines.append(format_rows(dataset["columns"], rows, request["format"]))
+        if offset + len(rows) < len(dataset["rows"]):
+            lines.append(f"More rows: {json.dumps({**request, 'offset': offset + len(rows), 'limit': limit})}")
+        return "\n".join(lines)
+
+    @recoverable
     def search_for(self, query):
         """Execute a search query using virtual mouse and keyboard."""
         try:
@@ -1433,6 +1758,16 @@ class VirtualBrowserController:
             return f"Error during search: {str(e)}"
 
 
+    def release_memory(self, aggressive=False):
+        """Drop per-task caches between tasks; aggressive also clears warm pages and all images."""
+        self.page_elements = []
+        self._extracted = None
+        self.visual_capture.drop_images(keep_last=not aggressive)
+        if aggressive:
+            self.visual_capture.frames.clear()
+            if self.prefetch is not None:
+                self.prefetch.clear()
+
     def close(self):
         """Close the browser cleanly."""
         try:
@@ -1446,9 +1781,11 @@ class VirtualBrowserController:
         """Click with the virtual cursor."""
         virtual_click(self.page, x, y)
 
-    def _virtual_type(self, text):
-        """Type text character by character with realistic timing."""
-        virtual_type(self.page, text)
+    def _virtual_type(self, text, mode=None):
+        """Type text using the given typing mode, or the configured default."""
+        mode = resolve_typing_mode(text, mode or TYPING_OPTIONS.get("mode", "human"),
+                                   TYPING_OPTIONS.get("auto_threshold", 40))
+        virtual_type(self.page, text, mode, TYPING_OPTIONS.get("human_chars", 5))
 
     def _natural_mouse_move(self, target_x, target_y):
         """Move the virtual mouse in a natural way, simulating human movement."""
@@ -0,0 +1,505 @@
+import argparse
+import hmac
+import json
+import queue
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from config import (
+    OPENAI_API_KEY, BROWSER_OPTIONS, BROWSER_CONNECTION, DAEMON_OPTIONS, MEMORY_BUDGET,
+    CHECKPOINTS, RESOURCE_MONITOR, LLM_GATEWAY, BROWSER_RECOVERY
+)
+
+# Controller operations exposed as POST /sessions/<id>/<action>
+SESSION_ACTIONS = {
+    "navigate": lambda controller, body: controller.navigate(body["url"]),
+    "analyze": lambda controller, body: controller.analyze_page(),
+    "click": lambda controller, body: controller.visual_click(
+        body["target"] if isinstance(body["target"], str) else json.dumps(body["target"])),
+    "type": lambda controller, body: controller.keyboard_action(body["text"]),
+    "scroll": lambda controller, body: controller.scroll(body.get("direction", "down")),
+    "back": lambda controller, body: controller.go_back(),
+    "search": lambda controller, body: controller.search_for(body["query"]),
+}
+
+SESSION_PATH = re.compile(r'^/sessions/(?P<session_id>[a-f0-9]+)(?:/(?P<action>[a-z_]+))?$')
+
+
+class BrowserSession:
+    """One client session: a page with its own controller and, once needed, its own agent."""
+
+    def __init__(self, session_id, controller):
+        self.session_id = session_id
+        self.controller = controller
+        self.agent_executor = None
+        self.created_at = time.time()
+        self.last_used = self.created_at
+
+    @property
+    def page(self):
+        # The controller's page, which recovery or a recycle may have replaced
+        return self.controller.page
+
+    def describe(self):
+        return {
+            "session_id": self.session_id,
+            "url": self.page.url,
+            "created_at": self.created_at,
+            "last_used": self.last_used,
+        }
+
+
+class BrowserService:
+    """
+    Keep one warm browser, a page pool and per-session controllers alive between clients.
+
+    Playwright's sync API only works on the thread that started it, so every browser call
+    is funnelled through a single-worker executor. HTTP handler threads submit work to it
+    and wait for the result; calls from different sessions are therefore serialized.
+    """
+
+    def __init__(self, pool_size=2):
+        self.pool_size = pool_size
+        self.sessions = {}
+        self._browser_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="browser")
+        self.playwright = None
+        self.browser = None
+        self.page_pool = None
+        self.llm = None
+        self.memory_budget = None
+        self.chrome_monitor = None
+        self.recycles = 0
+        self._recycle_queued = False
+        self.using_connected_browser = BROWSER_CONNECTION.get("use_existing", False)
+        self.recovery = None  # Reconnects or relaunches the shared browser for every session's recovery
+        self._port = None
+
+    def run(self, func, *args):
+        """Run func on the browser thread and wait for its result."""
+        return self._browser_thread.submit(func, *args).result()
+
+    def submit(self, func, *args):
+        """Queue func on the browser thread without waiting."""
+        return self._browser_thread.submit(func, *args)
+
+    def start(self):
+        self.run(self._start)
+
+    def _start(self):
+        from browser_setup import connect_browser, prepare_page
+        from page_pool import PagePool
+        from agent import create_llm
+
+        connection_options = BROWSER_CONNECTION
+        port = None
+        if self.using_connected_browser:
+            from chrome_launcher import launch_chrome_with_debugging
+            port = int(BROWSER_CONNECTION.get("cdp_endpoint", "http://localhost:9222").split(":")[-1])
+            chrome_launched = launch_chrome_with_debugging(port, mode="new_window")
+            if isinstance(chrome_launched, str):
+                connection_options = {**BROWSER_CONNECTION, "cdp_endpoint": chrome_launched}
+
+        self.playwright, self.browser, page = connect_browser(BROWSER_OPTIONS, connection_options)
+        prepare_page(page)
+        self._port = port
+        if BROWSER_RECOVERY.get("enabled", True):
+            from browser_recovery import BrowserRecovery
+            self.recovery = BrowserRecovery(self.playwright, self.browser, BROWSER_RECOVERY, BROWSER_OPTIONS,
+                                            connection_options, connected=self.using_connected_browser)
+
+        context = page.context if self.using_connected_browser else self.browser.new_context(viewport=None)
+        self.page_pool = PagePool(context, size=self.pool_size)
+        self.page_pool.fill()
+        self.llm = create_llm(OPENAI_API_KEY)
+        if MEMORY_BUDGET.get("enabled", True):
+            from memory_budget import MemoryBudget
+            self.memory_budget = MemoryBudget(MEMORY_BUDGET)
+        if RESOURCE_MONITOR.get("enabled", True):
+            self._start_monitor(port)
+        print(f"✅ Browser service ready ({self.pool_size} warm pages)")
+
+    def _start_monitor(self, port):
+        from chrome_monitor import ChromeResourceMonitor, find_browser_process
+
+        process = find_browser_process(port=port)
+        if process is None:
+            print("⚠️ Chrome process not found; resource monitor disabled")
+            return
+        self.chrome_monitor = ChromeResourceMonitor(process, RESOURCE_MONITOR, label="daemon",
+                                                    on_threshold=self._request_recycle).start()
+
+    def _session_recovery(self):
+        """Crash and hang recovery for one session's controller, or None when recovery is off."""
+        if self.recovery is None:
+            return None
+        from browser_recovery import BrowserRecovery
+        return BrowserRecovery(self.playwright, self.browser, BROWSER_RECOVERY, BROWSER_OPTIONS,
+                               relaunch=self._recovered_context)
+
+    def _recovered_context(self):
+        """
+        Relaunch callback of every session's recovery; runs on the browser thread.
+
+        The first session to find the browser gone reconnects (or relaunches) it and rebuilds
+        the page pool on it; sessions recovering after that just get the live context.
+        """
+        if self.browser is None or not self.browser.is_connected():
+            from page_pool import PagePool
+            from chrome_monitor import find_browser_process
+
+            context = self.recovery.reconnect()
+            self.browser = self.recovery.browser
+            self.page_pool.close()
+            self.page_pool = PagePool(context, size=self.pool_size)
+            self.page_pool.fill()
+            if self.chrome_monitor is not None:
+                self.chrome_monitor.reset(find_browser_process(port=self._port))
+            print("✅ Browser service moved to the reconnected browser")
+        return self.page_pool.context
+
+    def _request_recycle(self, reason):
+        """Called from the monitor thread: queue a recycle behind the work already on the browser thread."""
+        if self.using_connected_browser:
+            # Connected Chrome may be the user's own browser, so it is only reported, never restarted
+            print(f"⚠️ Connected Chrome is over its resource budget ({reason}); restart it to recover")
+            return
+        if not self._recycle_queued:
+            self._recycle_queued = True
+            self.submit(self._recycle, reason)
+
+    def _recycle(self, reason):
+        """
+        Relaunch the browser and move every session onto it.
+
+        Runs on the browser thread, so queued tasks and calls drain first. Cookies and
+        localStorage carry over through a storage_state() snapshot, and each session's
+        page is reopened at the URL it was on.
+        """
+        from page_pool import PagePool
+        from chrome_monitor import find_browser_process
+
+        start_time = time.time()
+        print(f"♻️ Recycling browser ({reason})...")
+        try:
+            state = self.page_pool.context.storage_state()
+            urls = {session_id: session.page.url for session_id, session in self.sessions.items()}
+
+            self.page_pool.close()
+            self.browser.close()
+            self.browser = self.playwright.chromium.launch(**BROWSER_OPTIONS)
+            context = self.browser.new_context(viewport=None, storage_state=state)
+            self.page_pool = PagePool(context, size=self.pool_size)
+
+            for session_id, session in self.sessions.items():
+                page, _, _ = self.page_pool.acquire()
+                session.controller.attach_page(page)
+                session.controller.recovery = self._session_recovery()  # The old one watches the closed browser
+                session.controller.release_memory(aggressive=True)
+                if urls[session_id].startswith("http"):
+                    try:
+                        page.goto(urls[session_id], wait_until="domcontentloaded", timeout=30000)
+                    except Exception as e:
+                        print(f"Session {session_id} could not reopen {urls[session_id]}: {str(e)}")
+            self.page_pool.fill()
+
+            if self.chrome_monitor is not None:
+                self.chrome_monitor.reset(find_browser_process())
+            self.recycles += 1
+            print(f"✅ Browser recycled in {time.time() - start_time:.1f}s ({len(urls)} sessions restored)")
+        except Exception as e:
+            print(f"❌ Browser recycle failed: {str(e)}")
+        finally:
+            self._recycle_queued = False
+
+    def create_session(self):
+        return self.run(self._create_session)
+
+    def _create_session(self):
+        from browser_controller import VirtualBrowserController
+
+        page, wait_seconds, from_pool = self.page_pool.acquire()
+        controller = VirtualBrowserController(page)
+        controller.recovery = self._session_recovery()
+        session = BrowserSession(uuid.uuid4().hex[:12], controller)
+        self.sessions[session.session_id] = session
+        # Top the pool back up for the next client
+        self.page_pool.refill()
+        print(f"Created session {session.session_id} ({'warm' if from_pool else 'cold'} page in {wait_seconds:.2f}s)")
+        return session.describe()
+
+    def close_session(self, session_id):
+        return self.run(self._close_session, session_id)
+
+    def _close_session(self, session_id):
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return False
+        self.page_pool.release(session.page)
+        return True
+
+    def get_session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise KeyError(f"Unknown session: {session_id}")
+        session.last_used = time.time()
+        return session
+
+    def call(self, session_id, action, body):
+        """Run one controller operation for a session and return its result string."""
+        session = self.get_session(session_id)
+        return self.run(SESSION_ACTIONS[action], session.controller, body)
+
+    def start_task(self, session_id, instruction, emit):
+        """Queue a whole agent task; steps are reported through emit as they happen."""
+        session = self.get_session(session_id)
+        return self.submit(self._run_task, session, instruction, emit)
+
+    def _run_task(self, session, instruction, emit):
+        from agent_tools import create_browser_tools
+        from agent import create_agent
+        from agent_callbacks import EventStreamCallback, CheckpointCallback, AccountingCallback
+
+        start_time = time.time()
+        checkpoint = None
+        try:
+            if session.agent_executor is None:
+                tools = create_browser_tools(session.controller)
+                session.agent_executor = create_agent(
+                    tools, OPENAI_API_KEY, llm=self.llm,
+                    trim_intermediate_steps=self.memory_budget.trim_intermediate_steps if self.memory_budget else -1)
+
+            accounting = AccountingCallback()
+            callbacks = [EventStreamCallback(emit), accounting]
+            if CHECKPOINTS.get("enabled", True):
+                from checkpoints import CheckpointStore
+                checkpoint = CheckpointStore(CHECKPOINTS).start(instruction)
+                callbacks.append(CheckpointCallback(checkpoint, lambda: session.controller.page,
+                                                    session.controller.take_resolved_targets))
+
+            emit({"event": "start", "input": instruction})
+            if LLM_GATEWAY.get("enabled", True):
+                from llm_gateway import llm_session
+                llm_session.set(session.session_id)  # LLM calls queue fairly per session
+            response = session.agent_executor.invoke(
+                {"input": instruction},
+                config={"callbacks": callbacks}
+            )
+            response["accounting"] = accounting.summary()
+            done_event = {"event": "done", "output": response.get("output", ""),
+                          "seconds": round(time.time() - start_time, 2), "accounting": response["accounting"]}
+            if self.memory_budget is not None:
+                metrics = self.memory_budget.release_task(session.controller, response)
+                done_event["memory_mb"] = round(metrics["rss_mb"], 1)
+            emit(done_event)
+        except Exception as e:
+            emit({"event": "error", "error": str(e), "seconds": round(time.time() - start_time, 2)})
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+
+    def status(self):
+        return {
+            "status": "ok" if self.browser is not None else "starting",
+            "sessions": [session.describe() for session in self.sessions.values()],
+            "pool": self.page_pool.stats() if self.page_pool else None,
+            "memory_mb": round(self.memory_budget.last_mb, 1) if self.memory_budget else None,
+            "chrome": self._chrome_metrics(),
+            "llm": self._llm_metrics(),
+        }
+
+    def _llm_metrics(self):
+        if not LLM_GATEWAY.get("enabled", True):
+            return None
+        from llm_gateway import get_gateway
+        return get_gateway(LLM_GATEWAY).stats()
+
+    def _chrome_metrics(self):
+        if self.chrome_monitor is None:
+            return None
+        return {
+            "latest": self.chrome_monitor.latest(),
+            "peak_rss_mb": max((sample["rss_mb"] for sample in self.chrome_monitor.samples), default=None),
+            "recycle_pending": self.chrome_monitor.recycle_reason,
+            "recycles": self.recycles,
+        }
+
+    def shutdown(self):
+        def _shutdown():
+            from browser_setup import close_browser
+            if self.chrome_monitor is not None:
+                self.chrome_monitor.stop()
+            for session_id in list(self.sessions):
+                self._close_session(session_id)
+            if self.page_pool:
+                self.page_pool.close()
+            if self.playwright:
+                print(close_browser(self.playwright, self.browser, is_connected=self.using_connected_browser))
+
+        try:
+            self.run(_shutdown)
+        finally:
+            self._browser_thread.shutdown(wait=False)
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    """JSON API over the BrowserService; task steps stream back as Server-Sent Events."""
+
+    service = None  # Set by serve()
+    token = ""  # Bearer token required on every request when set (DAEMON_TOKEN)
+
+    def _rejection(self, json_body=False):
+        """
+        Return (status, message) if the request must be refused, else None.
+
+        Web pages can reach a localhost port, so requests must name the daemon's own
+        loopback address as Host (defeats DNS rebinding), must not carry an Origin
+        (browsers add it to cross-site requests), and POSTs must be JSON, which a page
+        cannot send cross-origin without a preflight.
+        """
+        port = self.server.server_address[1]
+        allowed_hosts = {f"{name}:{port}" for name in ("127.0.0.1", "localhost", "[::1]", DAEMON_OPTIONS["host"])}
+        if (self.headers.get("Host") or "").lower() not in allowed_hosts:
+            return 403, "Host not allowed"
+        if self.headers.get("Origin") is not None:
+            return 403, "Cross-origin requests are not allowed"
+        if self.token and not hmac.compare_digest(self.headers.get("Authorization") or "", f"Bearer {self.token}"):
+            return 401, "Missing or wrong bearer token"
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if json_body and content_type != "application/json":
+            return 415, "Content-Type must be application/json"
+        return None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode("utf-8"))
+
+    def do_GET(self):
+        rejection = self._rejection()
+        if rejection:
+            return self._send_json(rejection[0], {"error": rejection[1]})
+        path = urlparse(self.path).path
+        if path in ("/health", "/sessions"):
+            return self._send_json(200, self.service.status())
+
+        match = SESSION_PATH.match(path)
+        if match and not match.group("action"):
+            try:
+                return self._send_json(200, self.service.get_session(match.group("session_id")).describe())
+            except KeyError as e:
+                return self._send_json(404, {"error": str(e)})
+
+        self._send_json(404, {"error": f"Unknown path: {path}"})
+
+    def do_DELETE(self):
+        rejection = self._rejection()
+        if rejection:
+            return self._send_json(rejection[0], {"error": rejection[1]})
+        match = SESSION_PATH.match(urlparse(self.path).path)
+        if not match or match.group("action"):
+            return self._send_json(404, {"error": "Expected DELETE /sessions/<id>"})
+        closed = self.service.close_session(match.group("session_id"))
+        self._send_json(200 if closed else 404, {"closed": closed})
+
+    def do_POST(self):
+        rejection = self._rejection(json_body=True)
+        if rejection:
+            return self._send_json(rejection[0], {"error": rejection[1]})
+        path = urlparse(self.path).path
+        try:
+            body = self._read_json()
+        except ValueError as e:
+            return self._send_json(400, {"error": f"Invalid JSON body: {str(e)}"})
+
+        if path == "/sessions":
+            return self._send_json(201, self.service.create_session())
+
+        match = SESSION_PATH.match(path)
+        if not match or not match.group("action"):
+            return self._send_json(404, {"error": f"Unknown path: {path}"})
+
+        session_id, action = match.group("session_id"), match.group("action")
+        try:
+            if action == "tasks":
+                return self._stream_task(session_id, body)
+            if action not in SESSION_ACTIONS:
+                return self._send_json(404, {"error": f"Unknown action: {action}"})
+            result = self.service.call(session_id, action, body)
+            self._send_json(200, {"result": result})
+        except KeyError as e:
+            self._send_json(404 if "session" in str(e) else 400, {"error": f"Missing or unknown value: {str(e)}"})
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+    def _stream_task(self, session_id, body):
+        """Run a task and write each step as a Server-Sent Event until it finishes."""
+        instruction = body.get("input")
+        if not instruction:
+            return self._send_json(400, {"error": "Task needs an 'input' instruction"})
+
+        events = queue.Queue()
+        self.service.start_task(session_id, instruction, events.put)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        while True:
+            event = events.get()
+            try:
+                self.wfile.write(f"event: {event['event']}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # The client went away; the task keeps running, there is just nobody to tell
+                print(f"Event stream for session {session_id} closed by the client")
+                return
+            if event["event"] in ("done", "error"):
+                break
+
+
+def serve(host, port, pool_size):
+    """Start the browser service and serve the API until interrupted."""
+    service = BrowserService(pool_size=pool_size)
+    print("Starting browser service...")
+    service.start()
+
+    DaemonRequestHandler.service = service
+    DaemonRequestHandler.token = DAEMON_OPTIONS["token"]
+    server = ThreadingHTTPServer((host, port), DaemonRequestHandler)
+    server.daemon_threads = True
+    print(f"🚀 Browser daemon listening on http://{host}:{port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down browser daemon...")
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-lived local service that shares a warm browser")
+    parser.add_argument("--host", default=DAEMON_OPTIONS["host"])
+    parser.add_argument("--port", type=int, default=DAEMON_OPTIONS["port"])
+    parser.add_argument("--pool-size", type=int, default=DAEMON_OPTIONS["pool_size"])
+    args = parser.parse_args()
+    serve(args.host, args.port, args.pool_size)
+
+
+if __name__ == "__main__":
+    main()
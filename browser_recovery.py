@@ -0,0 +1,196 @@
+import functools
+import time
+from urllib.parse import urlparse
+
+# Controller results that may come from a dead page rather than a real failure on the site
+ERROR_PREFIXES = ("Error", "Failed", "Cannot", "Click attempted with errors", "Key sequence failed")
+
+
+class BrowserRecovery:
+    """
+    Detect a dead browser or page and bring the controller back onto a working one.
+
+    Crash and disconnect events set a flag that is checked, together with page.is_closed(),
+    before every action at no cost. A heartbeat (a trivial wait_for_function with a short
+    timeout, which a hung renderer cannot answer) is only sent after an action reports an
+    error, to tell a page problem from an ordinary failure on the site.
+
+    Recovery opens a fresh page in the same browser when it is still connected, and
+    otherwise gets a new browser: from the relaunch callback when one is given (for a
+    Chrome we started ourselves), by relaunching a Playwright-launched browser, or by
+    reconnecting to the CDP endpoint. It then reinstalls the init scripts and reopens the
+    last good URL. A new browser comes with a plain context: anything the caller set up on
+    the old one (HAR routing, a page pool) is not carried over, so callers compare
+    self.browser with theirs and rebuild it.
+    """
+
+    def __init__(self, playwright, browser, options, browser_options=None, connection_options=None, connected=True,
+                 relaunch=None):
+        self.playwright = playwright
+        self.browser = browser
+        self.options = options
+        self.browser_options = browser_options or {}
+        self.connection_options = connection_options or {}
+        self.connected = connected
+        self.relaunch = relaunch  # Optional callable returning a context on a freshly started browser
+        self.last_url = None
+        self.recoveries = []
+        self.in_action = False
+        self._watched_page = None
+        self._problem = None
+        self._watch_browser(browser)
+
+    def _watch_browser(self, browser):
+        browser.on("disconnected", lambda *args: self._flag("browser disconnected"))
+
+    def watch(self, page):
+        """Listen for renderer crashes on the controller's current page."""
+        if page is self._watched_page:
+            return
+        page.on("crash", lambda crashed: self._flag("renderer crashed") if crashed is self._watched_page else None)
+        self._watched_page = page
+
+    def _flag(self, problem):
+        if self._problem is None:
+            self._problem = problem
+
+    def heartbeat(self, page):
+        """Return None if the page answers within the heartbeat timeout, else the problem."""
+        if self._problem:
+            return self._problem
+        try:
+            if page.is_closed():
+                return "page closed"
+            page.wait_for_function("() => true", timeout=self.options["heartbeat_timeout"] * 1000)
+            return None
+        except Exception as e:
+            message = str(e)
+            if "Timeout" in message:
+                return "renderer not responding"
+            if "closed" in message or "crash" in message.lower():
+                return "page or browser closed"
+            return None  # Navigation races and similar are not a dead page
+
+    def reconnect(self):
+        """Get a live browser: relaunch it, or reconnect over CDP (waiting for Chrome to come back)."""
+        if self.relaunch is not None:
+            context = self.relaunch()
+            self.browser = context.browser
+            self._watch_browser(self.browser)
+            return context
+
+        if not self.connected:
+            self.browser = self.playwright.chromium.launch(**self.browser_options)
+            self._watch_browser(self.browser)
+            return self.browser.new_context(viewport=None)
+
+        endpoint = self.connection_options.get("cdp_endpoint", "http://localhost:9222")
+        if endpoint.startswith("ws"):
+            # A restarted Chrome announces a new websocket URL, so go through the HTTP endpoint
+            endpoint = f"http://{urlparse(endpoint).netloc}"
+        deadline = time.time() + self.options["reconnect_timeout"]
+        while True:
+            try:
+                self.browser = self.playwright.chromium.connect_over_cdp(endpoint)
+                break
+            except Exception as e:
+                if time.time() >= deadline:
+                    raise RuntimeError(f"Could not reconnect to {endpoint}: {str(e)}")
+                time.sleep(1)
+        self._watch_browser(self.browser)
+        return self.browser.contexts[0] if self.browser.contexts else self.browser.new_context(viewport=None)
+
+    def recover(self, controller, problem):
+        """Move the controller onto a fresh page and reopen the last good URL."""
+        from browser_setup import prepare_page
+
+        start_time = time.time()
+        print(f"🩺 Browser problem detected ({problem}); recovering...")
+        old_page = controller.page
+
+        if self.browser is not None and self.browser.is_connected():
+            context = old_page.context
+        else:
+            context = self.reconnect()
+
+        page = context.new_page()
+        prepare_page(page)
+        self._problem = None
+        controller.attach_page(page)
+        self.watch(page)
+
+        try:
+            if not old_page.is_closed():
+                old_page.close()
+        except Exception:
+            pass  # A crashed or hung page may refuse to close
+
+        if self.last_url and self.last_url.startswith("http"):
+            try:
+                page.goto(self.last_url, wait_until="domcontentloaded", timeout=30000)
+            except Exception as e:
+                print(f"Could not reopen {self.last_url}: {str(e)}")
+
+        seconds = time.time() - start_time
+        self.recoveries.append({"problem": problem, "url": self.last_url, "seconds": round(seconds, 2),
+                                "time": time.time()})
+        print(f"✅ Recovered in {seconds:.1f}s")
+        return f"(Browser recovered from '{problem}'; reopened {self.last_url or 'a blank page'})"
+
+
+def recoverable(method):
+    """
+    Run a controller action with crash/hang recovery when the controller has one configured.
+
+    A known-dead page is recovered before the action. If the action raises or reports an
+    error and the heartbeat then fails, the browser is recovered and the action retried once.
+    If recovery itself fails, the action returns an error instead of raising.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        recovery = self.recovery
+        if recovery is None or recovery.in_action:
+            # Actions called from inside another action are covered by the outer one
+            return method(self, *args, **kwargs)
+
+        recovery.in_action = True
+        try:
+            return _run_with_recovery(self, recovery, method, args, kwargs)
+        finally:
+            recovery.in_action = False
+    return wrapper
+
+
+def _run_with_recovery(controller, recovery, method, args, kwargs):
+    """Recover a known-dead page, run the action, and recover and retry once if the page died during it."""
+    recovery.watch(controller.page)
+    notes = []
+    if recovery._problem or controller.page.is_closed():
+        try:
+            notes.append(recovery.recover(controller, recovery._problem or "page closed"))
+        except Exception as e:
+            return f"Error: the browser could not be recovered: {str(e)}"
+
+    for attempt in range(2):
+        try:
+            result = method(controller, *args, **kwargs)
+            failed = isinstance(result, str) and result.startswith(ERROR_PREFIXES)
+            error = None
+        except Exception as e:
+            result, failed, error = None, True, e
+
+        problem = recovery.heartbeat(controller.page) if failed else None
+        if problem is None or attempt == 1:
+            if error is not None:
+                raise error
+            if not failed:
+                try:
+                    recovery.last_url = controller.page.url
+                except Exception:
+                    pass
+            return "\n".join(notes + [result]) if notes else result
+
+        try:
+            notes.append(recovery.recover(controller, problem) + "; retrying the action")
+        except Exception as e:
+            return "\n".join(notes + [f"Error: the browser could not be recovered: {str(e)}"])
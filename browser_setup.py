@@ -1,3 +1,4 @@
+import json
 from playwright.sync_api import sync_playwright
 
 def inject_cursor_script():
@@ -40,55 +41,8 @@ def inject_cursor_script():
     };
     """
 
-def initialize_browser(options, connection_options=None):
-    """Initialize the browser by connecting to existing instance or launching a new one."""
-    playwright = sync_playwright().start()
-    
-    # Default connection options if none provided
-    if connection_options is None:
-        connection_options = {
-            "use_existing": True,
-            "cdp_endpoint": "http://localhost:9222",
-            "fallback_to_new": True
-        }
-    
-    browser = None
-    page = None
-    
-    # Try connecting to existing browser if requested
-    if connection_options.get("use_existing", False):
-        try:
-            print(f"Attempting to connect to existing browser at {connection_options['cdp_endpoint']}...")
-            browser = playwright.chromium.connect_over_cdp(connection_options["cdp_endpoint"])
-            print("Successfully connected to existing Chrome browser")
-            
-            # Get the default context or create a new one
-            if (len(browser.contexts) > 0):
-                context = browser.contexts[0]
-            else:
-                context = browser.new_context(viewport=None)
-                
-            # Create a new page in the existing browser
-            page = context.new_page()
-            
-        except Exception as e:
-            print(f"Failed to connect to existing browser: {str(e)}")
-            
-            # Fall back to launching a new browser if configured to do so
-            if not connection_options.get("fallback_to_new", True):
-                print("Fallback disabled. Exiting.")
-                raise e
-                
-            print("Falling back to launching a new browser instance...")
-            browser = None  # Reset for fallback path
-    
-    # Launch a new browser if needed
-    if browser is None:
-        print(f"Launching new browser with options: {options}")
-        browser = playwright.chromium.launch(**options)
-        page = browser.new_page(viewport=None)
-    
-    # Shared initialization regardless of connection method
+def install_page_scripts(page):
+    """Install the cursor and new-tab interception init scripts on a page."""
     # Inject cursor visualization CSS and JavaScript
     page.add_init_script(inject_cursor_script())
     
@@ -112,7 +66,11 @@ def initialize_browser(options, connection_options=None):
             }
         }, true);
     """)
-    
+
+def prepare_page(page):
+    """Install init scripts on a fresh page and make sure the cursor is ready."""
+    install_page_scripts(page)
+
     # Navigate to a blank page first to ensure script loading
     page.goto('about:blank')
     
@@ -150,8 +108,64 @@ def initialize_browser(options, connection_options=None):
             }
         }
     """)
+
+def connect_browser(options, connection_options=None):
+    """Connect to an existing browser or launch a new one and open a page, without preparing it."""
+    playwright = sync_playwright().start()
     
+    # Default connection options if none provided
+    if connection_options is None:
+        connection_options = {
+            "use_existing": True,
+            "cdp_endpoint": "http://localhost:9222",
+            "fallback_to_new": True
+        }
+    
+    browser = None
+    page = None
+    
+    # Try connecting to existing browser if requested
+    if connection_options.get("use_existing", False):
+        try:
+            print(f"Attempting to connect to existing browser at {connection_options['cdp_endpoint']}...")
+            browser = playwright.chromium.connect_over_cdp(connection_options["cdp_endpoint"])
+            print("Successfully connected to existing Chrome browser")
+            
+            # Get the default context or create a new one
+            if (len(browser.contexts) > 0):
+                context = browser.contexts[0]
+            else:
+                context = browser.new_context(viewport=None)
+                
+            # Create a new page in the existing browser
+            page = context.new_page()
+            
+        except Exception as e:
+            print(f"Failed to connect to existing browser: {str(e)}")
+            
+            # Fall back to launching a new browser if configured to do so
+            if not connection_options.get("fallback_to_new", True):
+                print("Fallback disabled. Exiting.")
+                raise e
+                
+            print("Falling back to launching a new browser instance...")
+            browser = None  # Reset for fallback path
     
+    # Launch a new browser if needed
+    if browser is None:
+        print(f"Launching new browser with options: {options}")
+        browser = playwright.chromium.launch(**options)
+        page = browser.new_page(viewport=None)
+    
+    return playwright, browser, page
+
+def initialize_browser(options, connection_options=None):
+    """Initialize the browser by connecting to existing instance or launching a new one."""
+    playwright, browser, page = connect_browser(options, connection_options)
+
+    # Shared initialization regardless of connection method
+    prepare_page(page)
+
     print(f"Browser setup successful. User agent: {page.evaluate('() => navigator.userAgent')}")
     
     return playwright, browser, page
@@ -170,4 +184,29 @@ def close_browser(playwright, browser, is_connected=False):
             playwright.stop()
             return "Browser closed successfully"
     except Exception as e:
-        return f"Error closing browser: {str(e)}"
\ No newline at end of file
+        return f"Error closing browser: {str(e)}"
+
+def restore_storage_state(context, state):
+    """
+    Restore a storage_state() snapshot into an existing context.
+
+    Cookies are added directly. localStorage can only be written from a page on the right
+    origin, so it is restored by an init script the first time each origin is loaded again.
+    """
+    if state.get("cookies"):
+        context.add_cookies(state["cookies"])
+
+    origins = {saved["origin"]: saved["localStorage"] for saved in state.get("origins", [])
+               if saved.get("localStorage")}
+    if origins:
+        context.add_init_script(f"""
+            (() => {{
+                const saved = {json.dumps(origins)}[location.origin];
+                if (!saved) return;
+                try {{
+                    saved.forEach(item => {{
+                        if (localStorage.getItem(item.name) === null) localStorage.setItem(item.name, item.value);
+                    }});
+                }} catch (e) {{}}
+            }})();
+        """)
@@ -0,0 +1,271 @@
+import glob
+import json
+import os
+import re
+import time
+import uuid
+from urllib.parse import urlparse
+
+REDACTED = "[redacted]"
+
+
+def redact_passwords(record):
+    """
+    Blank out what a step typed into password fields before it is written.
+
+    FillForm values go field by field (the step's "field" targets are in spec order);
+    Keyboard input is dropped whole when the focused element was a password field. The
+    secrets are also removed from the step's log and observation.
+    """
+    targets = record.get("targets") or []
+    secrets = []
+    if record["tool"] == "FillForm":
+        field_targets = [target for target in targets if target.get("role") == "field"]
+        if not any(target.get("input_type") == "password" for target in field_targets):
+            return record
+        tool_input = record["tool_input"]
+        try:
+            spec = json.loads(tool_input) if isinstance(tool_input, str) else tool_input
+        except ValueError:
+            spec = None
+        fields = spec.get("fields", []) if isinstance(spec, dict) else spec
+        if not isinstance(fields, list):
+            # Unreadable spec: keep nothing of it
+            record["tool_input"] = REDACTED
+            return record
+        fields = [field for field in fields if isinstance(field, dict) or
+                  (isinstance(field, list) and len(field) == 2)]
+        for field, target in zip(fields, field_targets):
+            if target.get("input_type") != "password":
+                continue
+            if isinstance(field, dict):
+                secrets.append(str(field.get("value", "")))
+                field["value"] = REDACTED
+            else:
+                secrets.append(str(field[1]))
+                field[1] = REDACTED
+        record["tool_input"] = json.dumps(spec) if isinstance(tool_input, str) else spec
+    elif record["tool"] == "Keyboard" and any(target.get("input_type") == "password" for target in targets):
+        secrets.append(str(record["tool_input"]))
+        record["tool_input"] = REDACTED
+        record["observation"] = f"Typed into a password field ({REDACTED})"
+
+    for secret in secrets:
+        if not secret:
+            continue
+        for form in (secret, json.dumps(secret)[1:-1]):
+            record["log"] = (record.get("log") or "").replace(form, REDACTED)
+            record["observation"] = record["observation"].replace(form, REDACTED)
+    return record
+
+
+class TaskCheckpoint:
+    """
+    Append-only JSONL record of one task run: a header line, one line per completed step
+    and a finish line. Lines are flushed but not fsynced, so a step costs one small write.
+
+    Browser storage state (cookies, localStorage) is only saved when save_state is on. It
+    can hold every login in the profile, so it goes to an owner-only side file, written every
+    few steps or when the agent moves to another site, and deleted when the task finishes.
+    """
+
+    def __init__(self, path, options, task_input=None, steps=None):
+        self.path = path
+        self.state_path = path[:-len(".jsonl")] + ".state.json"
+        self.options = options
+        self.task_input = task_input
+        self.steps = steps or []
+        self.finished = False
+        self._last_state_step = len(self.steps)
+        self._last_origin = None
+        self._file = None
+
+    @property
+    def task_id(self):
+        return os.path.basename(self.path)[:-len(".jsonl")]
+
+    def _write(self, record):
+        if self._file is None:
+            # Owner-only: steps carry page text and form input
+            self._file = os.fdopen(os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600),
+                                   "a", encoding="utf-8")
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def start(self):
+        self._write({"type": "task", "input": self.task_input, "started_at": time.time()})
+
+    def record_step(self, action, observation, page=None, targets=None):
+        """
+        Persist one completed step; page (optional) supplies the URL and storage state, targets
+        the elements the step resolved (used when compiling the run into a macro).
+        """
+        max_chars = self.options["max_observation_chars"]
+        observation = str(observation)
+        record = {
+            "type": "step",
+            "step": len(self.steps) + 1,
+            "tool": action.tool,
+            "tool_input": action.tool_input,
+            "log": action.log,
+            "tool_call_id": getattr(action, "tool_call_id", None),
+            "observation": observation[:max_chars],
+            "url": None,
+            "targets": targets or [],
+            "time": time.time(),
+        }
+
+        if page is not None:
+            try:
+                record["url"] = page.url
+                if self.options["save_state"]:
+                    origin = urlparse(page.url).netloc
+                    due = len(self.steps) + 1 - self._last_state_step >= self.options["state_every"]
+                    if due or (origin and origin != self._last_origin):
+                        self.save_state(page)
+                        self._last_state_step = len(self.steps) + 1
+                        self._last_origin = origin
+            except Exception as e:
+                print(f"Checkpoint could not read browser state: {e}")
+
+        redact_passwords(record)
+        self.steps.append(record)
+        self._write(record)
+
+    def save_state(self, page):
+        temp_path = self.state_path + ".tmp"
+        state = json.dumps(page.context.storage_state())
+        # Created owner-only: the state holds session cookies
+        with os.fdopen(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f:
+            f.write(state)
+        os.replace(temp_path, self.state_path)
+
+    def finish(self, output):
+        self.finished = True
+        self._write({"type": "finish", "output": output, "time": time.time()})
+        self.close()
+        # A finished task is never resumed, so its cookies are not kept around
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def last_url(self):
+        for step in reversed(self.steps):
+            if step.get("url"):
+                return step["url"]
+        return None
+
+
+class CheckpointStore:
+    """
+    Directory of task checkpoints, one JSONL file (plus a storage-state file) per run.
+
+    Unfinished runs are kept for --resume. Finished runs are only kept for compiling into
+    macros, so only the newest keep_finished of them are kept.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self.directory = options["dir"]
+
+    def prune(self):
+        """Delete finished checkpoints beyond the newest keep_finished."""
+        paths = sorted(glob.glob(os.path.join(self.directory, "*.jsonl")), key=os.path.getmtime, reverse=True)
+        finished = [path for path in paths if self._read(path).finished]
+        for path in finished[self.options["keep_finished"]:]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Could not remove old checkpoint {path}: {e}")
+
+    def start(self, task_input):
+        os.makedirs(self.directory, exist_ok=True)
+        self.prune()
+        slug = re.sub(r'[^a-z0-9]+', '-', task_input.lower()).strip('-')[:40] or "task"
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}-{slug}.jsonl")
+        checkpoint = TaskCheckpoint(path, self.options, task_input)
+        checkpoint.start()
+        return checkpoint
+
+    def load(self, task_id="latest"):
+        """Load a checkpoint by id, or the most recent unfinished one for "latest"."""
+        if task_id and task_id != "latest":
+            path = task_id if task_id.endswith(".jsonl") else os.path.join(self.directory, task_id + ".jsonl")
+            return self._read(path)
+
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.jsonl")), key=os.path.getmtime, reverse=True):
+            checkpoint = self._read(path)
+            if not checkpoint.finished:
+                return checkpoint
+        raise FileNotFoundError(f"No unfinished task checkpoints in {self.directory}")
+
+    def _read(self, path):
+        checkpoint = TaskCheckpoint(path, self.options)
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # Partially written last line from a crash
+                if record["type"] == "task":
+                    checkpoint.task_input = record["input"]
+                elif record["type"] == "step":
+                    checkpoint.steps.append(record)
+                elif record["type"] == "finish":
+                    checkpoint.finished = True
+        checkpoint._last_state_step = len(checkpoint.steps)
+        return checkpoint
+
+
+def rebuild_steps(checkpoint, mode="react"):
+    """Turn checkpointed steps back into (action, observation) pairs for the agent scratchpad."""
+    if mode == "tool_calling":
+        from langchain.agents.output_parsers.tools import ToolAgentAction
+        from langchain_core.messages import AIMessage
+    else:
+        from langchain_core.agents import AgentAction
+
+    steps = []
+    for record in checkpoint.steps:
+        if mode == "tool_calling" and record.get("tool_call_id"):
+            tool_input = record["tool_input"]
+            args = tool_input if isinstance(tool_input, dict) else {"__arg1": tool_input}
+            message = AIMessage(content="", tool_calls=[{"name": record["tool"], "args": args,
+                                                         "id": record["tool_call_id"]}])
+            action = ToolAgentAction(tool=record["tool"], tool_input=tool_input, log=record["log"],
+                                     message_log=[message], tool_call_id=record["tool_call_id"])
+        elif mode == "tool_calling":
+            continue  # Parse-error steps have no tool call to answer
+        else:
+            action = AgentAction(tool=record["tool"], tool_input=record["tool_input"], log=record["log"])
+        steps.append((action, record["observation"]))
+    return steps
+
+
+def restore_browser_state(page, checkpoint):
+    """Restore cookies and the last page's localStorage, then reopen the last URL."""
+    state = {}
+    if os.path.exists(checkpoint.state_path):
+        with open(checkpoint.state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+
+    if state.get("cookies"):
+        page.context.add_cookies(state["cookies"])
+
+    last_url = checkpoint.last_url
+    if not last_url:
+        return None
+
+    page.goto(last_url, wait_until="domcontentloaded", timeout=30000)
+    origin = f"{urlparse(last_url).scheme}://{urlparse(last_url).netloc}"
+    for saved in state.get("origins", []):
+        if saved.get("origin") == origin and saved.get("localStorage"):
+            page.evaluate("items => items.forEach(item => localStorage.setItem(item.name, item.value))",
+                          saved["localStorage"])
+            page.reload(wait_until="domcontentloaded")
+    return last_url
@@ -1,12 +1,18 @@
 import os
+import re
+import json
 import platform
 import subprocess
+import threading
 import time
 import socket
 import sys
+import urllib.request
 import psutil
 from pathlib import Path
 
+DEVTOOLS_LISTENING_PATTERN = re.compile(r'DevTools listening on (ws://\S+)')
+
 def is_port_in_use(port):
     """Check if the specified port is already in use."""
     try:
@@ -46,6 +52,101 @@ def get_default_chrome_profile():
     else:
         return None
 
+def get_websocket_debugger_url(port, timeout=1):
+    """Ask the DevTools HTTP endpoint for the browser websocket URL, or return None."""
+    try:
+        with urllib.request.urlopen(f"http://localhost:{port}/json/version", timeout=timeout) as response:
+            if response.status == 200:
+                return json.loads(response.read().decode("utf-8")).get("webSocketDebuggerUrl")
+    except Exception:
+        pass
+    return None
+
+def read_devtools_active_port(user_data_dir, not_before=0):
+    """
+    Read the DevToolsActivePort file Chrome writes into its user data directory.
+
+    Args:
+        user_data_dir: Chrome user data directory of the launched instance
+        not_before: Ignore files last written before this timestamp (left over from earlier runs)
+
+    Returns:
+        str: Browser websocket URL, or None if the file is missing, stale or incomplete
+    """
+    if not user_data_dir:
+        return None
+    active_port_file = Path(user_data_dir) / "DevToolsActivePort"
+    try:
+        if active_port_file.stat().st_mtime < not_before:
+            return None
+        lines = active_port_file.read_text().splitlines()
+        if len(lines) >= 2 and lines[0].strip().isdigit():
+            return f"ws://127.0.0.1:{lines[0].strip()}{lines[1].strip()}"
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _watch_devtools_announcement(stream, found):
+    """Drain Chrome's stderr and record the 'DevTools listening on ws://...' line."""
+    try:
+        for raw_line in iter(stream.readline, b''):
+            if "url" not in found:
+                match = DEVTOOLS_LISTENING_PATTERN.search(raw_line.decode("utf-8", errors="replace"))
+                if match:
+                    found["url"] = match.group(1)
+    except Exception:
+        pass
+
+def wait_for_devtools(port, chrome_process=None, user_data_dir=None, launched_at=0, timeout=45):
+    """
+    Wait until Chrome's DevTools endpoint is announced and return its websocket URL.
+
+    Readiness is taken from the first of: the stderr announcement of a process we started,
+    a fresh DevToolsActivePort file in the profile, or the debugging port answering.
+    Checks start immediately and back off exponentially instead of sleeping a fixed time.
+
+    Returns:
+        str or bool: Websocket URL when known, True if the port answered without one,
+                     False if nothing responded before the timeout
+    """
+    announced = {}
+    if chrome_process is not None and chrome_process.stderr is not None:
+        threading.Thread(
+            target=_watch_devtools_announcement,
+            args=(chrome_process.stderr, announced),
+            daemon=True
+        ).start()
+
+    deadline = time.time() + timeout
+    delay = 0.05
+    while time.time() < deadline:
+        if "url" in announced:
+            print("✅ Chrome announced its DevTools endpoint")
+            return announced["url"]
+
+        ws_url = read_devtools_active_port(user_data_dir, not_before=launched_at)
+        if ws_url:
+            print("✅ Found DevToolsActivePort for the launched Chrome")
+            return ws_url
+
+        if is_port_in_use(port):
+            print(f"✅ Verified Chrome is running with debugging port {port}")
+            return get_websocket_debugger_url(port) or True
+
+        time.sleep(delay)
+        delay = min(delay * 2, 1.0)
+
+    return False
+
+def wait_for_chrome_exit(timeout=3):
+    """Poll until no Chrome process is left, up to timeout seconds."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if not get_chrome_process():
+            return True
+        time.sleep(0.1)
+    return False
+
 def launch_chrome_with_debugging(port=9222, use_default_profile=True, mode=None):
     """
     Launch Chrome with remote debugging enabled, with options for handling existing Chrome sessions.
@@ -59,12 +160,13 @@ def launch_chrome_with_debugging(port=9222, use_default_profile=True, mode=None)
               - None: Prompt the user to choose (interactive mode)
     
     Returns:
-        bool: True if successful, False otherwise
+        str or bool: Browser websocket URL when it could be discovered, True if Chrome is
+                     running but the URL is unknown, False otherwise
     """
     # Check if debugging port is already in use
     if is_port_in_use(port):
         print(f"✅ Chrome already running with remote debugging on port {port}")
-        return True
+        return get_websocket_debugger_url(port) or True
     
     # Check if Chrome is already running (without debugging)
     chrome_proc = get_chrome_process()
@@ -101,10 +203,9 @@ def launch_chrome_with_debugging(port=9222, use_default_profile=True, mode=None)
         if mode == "close_reopen":
             print("Closing Chrome and reopening with debugging enabled...")
             close_chrome()
-            time.sleep(3)  # Wait for Chrome to fully close
             
-            # Check if Chrome really closed
-            if get_chrome_process():
+            # Wait for Chrome to fully close, then check if it really did
+            if not wait_for_chrome_exit(timeout=3):
                 print("⚠️ Chrome is still running. Trying more aggressive close...")
                 system = platform.system()
                 if system == "Darwin":  # macOS
@@ -113,7 +214,7 @@ def launch_chrome_with_debugging(port=9222, use_default_profile=True, mode=None)
                     subprocess.run(["taskkill", "/F", "/IM", "chrome.exe"], check=False)
                 elif system == "Linux":
                     subprocess.run(["killall", "-9", "chrome", "chromium"], check=False)
-                time.sleep(2)
+                wait_for_chrome_exit(timeout=2)
             
             # Now Chrome is closed, so we'll treat this like Chrome wasn't running
             chrome_running = False
@@ -126,6 +227,8 @@ def launch_chrome_with_debugging(port=9222, use_default_profile=True, mode=None)
     # Set up the system-specific Chrome launch command
     system = platform.system()
     chrome_process = None
+    user_data_dir = profile_dir  # Where Chrome will write DevToolsActivePort
+    launched_at = time.time() - 1  # Small margin for filesystem timestamp resolution
     
     try:
         # Launch Chrome with the appropriate profile based on situation
@@ -134,6 +237,7 @@ def launch_chrome_with_debugging(port=9222, use_default_profile=True, mode=None)
                 # Create a temporary profile for the new window
                 temp_profile_dir = Path(os.path.expanduser("~/Library/Application Support/Google/ChromeTemp"))
                 os.makedirs(temp_profile_dir, exist_ok=True)
+                user_data_dir = temp_profile_dir
                 
                 cmd = [
                     "open", "-n", "-a", "Google Chrome", 
@@ -158,7 +262,8 @@ def launch_chrome_with_debugging(port=9222, use_default_profile=True, mode=None)
                     print("✓ Using default profile with your login information")
             
             print(f"Executing: {' '.join(cmd)}")
-            chrome_process = subprocess.Popen(cmd)
+            # 'open' exits right away, so readiness comes from DevToolsActivePort instead of stderr
+            subprocess.Popen(cmd)
             print(f"🚀 Launched Chrome on macOS with debugging port {port}")
             
         elif system == "Windows":
@@ -181,6 +286,7 @@ def launch_chrome_with_debugging(port=9222, use_default_profile=True, mode=None)
                     # Use a temporary profile when Chrome is already running
                     temp_profile_dir = os.path.join(os.environ.get('TEMP', 'C:\\Temp'), 'ChromeTemp')
                     os.makedirs(temp_profile_dir, exist_ok=True)
+                    user_data_dir = temp_profile_dir
                     
                     cmd = [
                         chrome_path, 
@@ -207,13 +313,14 @@ def launch_chrome_with_debugging(port=9222, use_default_profile=True, mode=None)
                         print("✓ Using default profile with your login information")
                 
                 print(f"Executing: {' '.join(cmd)}")
-                chrome_process = subprocess.Popen(cmd)
+                chrome_process = subprocess.Popen(cmd, stderr=subprocess.PIPE)
                 print(f"🚀 Launched Chrome on Windows with debugging port {port}")
             else:
                 # Fallback with shell=True when chrome path not found
                 if chrome_running:  # Using new_window mode
                     temp_profile_dir = os.path.join(os.environ.get('TEMP', 'C:\\Temp'), 'ChromeTemp')
                     os.makedirs(temp_profile_dir, exist_ok=True)
+                    user_data_dir = temp_profile_dir
                     cmd = f"start chrome --remote-debugging-port={port} --no-first-run --user-data-dir=\"{temp_profile_dir}\""
                     print("ℹ️ Using temporary profile without login information")
                 else:
@@ -237,6 +344,7 @@ def launch_chrome_with_debugging(port=9222, use_default_profile=True, mode=None)
                         # When Chrome is already running, use a temporary profile
                         temp_profile_dir = "/tmp/chromeTemp"
                         os.makedirs(temp_profile_dir, exist_ok=True)
+                        user_data_dir = temp_profile_dir
                         
                         cmd = [
                             browser_cmd, 
@@ -263,7 +371,7 @@ def launch_chrome_with_debugging(port=9222, use_default_profile=True, mode=None)
                             print("✓ Using default profile with your login information")
                             
                     print(f"Executing: {' '.join(cmd)}")
-                    chrome_process = subprocess.Popen(cmd)
+                    chrome_process = subprocess.Popen(cmd, stderr=subprocess.PIPE)
                     print(f"🚀 Launched {browser_cmd} on Linux with debugging port {port}")
                     break
                 except FileNotFoundError:
@@ -275,29 +383,10 @@ def launch_chrome_with_debugging(port=9222, use_default_profile=True, mode=None)
             print(f"❌ Unsupported operating system: {system}")
             return False
             
-        # Wait for Chrome to start and open the debugging port
-        print("Giving Chrome extra time to start...")
-        time.sleep(5)  # Initial delay
-        
-        max_attempts = 20
-        for attempt in range(max_attempts):
-            # Check if the port is open
-            if is_port_in_use(port):
-                print(f"✅ Verified Chrome is running with debugging port {port}")
-                return True
-                
-            # Try HTTP request to check debugging endpoint
-            try:
-                import urllib.request
-                with urllib.request.urlopen(f"http://localhost:{port}/json/version", timeout=1) as response:
-                    if response.status == 200:
-                        print(f"✅ Verified Chrome debugging endpoint is responding on port {port}")
-                        return True
-            except:
-                pass
-                
-            print(f"Waiting for Chrome to start (attempt {attempt+1}/{max_attempts})...")
-            time.sleep(2)
+        # Wait for Chrome to announce its DevTools endpoint
+        ws_url = wait_for_devtools(port, chrome_process, user_data_dir, launched_at)
+        if ws_url:
+            return ws_url
             
         print("⚠️ Chrome started but debugging port is not responding")
         print("Continuing anyway... the browser might work regardless")
@@ -307,6 +396,63 @@ def launch_chrome_with_debugging(port=9222, use_default_profile=True, mode=None)
         print(f"❌ Error launching Chrome: {str(e)}")
         return False
 
+def find_chrome_executable():
+    """Path (or command name) of a Chrome/Chromium binary that can be started directly, or None."""
+    system = platform.system()
+    if system == "Darwin":
+        candidates = ["/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+                      "/Applications/Chromium.app/Contents/MacOS/Chromium"]
+    elif system == "Windows":
+        candidates = [
+            os.path.join(os.environ.get('PROGRAMFILES', 'C:\\Program Files'), 'Google\\Chrome\\Application\\chrome.exe'),
+            os.path.join(os.environ.get('PROGRAMFILES(X86)', 'C:\\Program Files (x86)'), 'Google\\Chrome\\Application\\chrome.exe'),
+            os.path.join(os.environ.get('LOCALAPPDATA', ''), 'Google\\Chrome\\Application\\chrome.exe')
+        ]
+    else:
+        candidates = []
+
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+
+    import shutil
+    for name in ["google-chrome", "chrome", "chromium", "chromium-browser"]:
+        found = shutil.which(name)
+        if found:
+            return found
+    return None
+
+def launch_isolated_chrome(port, user_data_dir, headless=False, extra_args=()):
+    """
+    Start a separate Chrome instance with its own debugging port and profile directory.
+
+    Unlike launch_chrome_with_debugging this never touches other Chrome processes, so
+    several instances can run side by side (e.g. one per worker process).
+
+    Returns:
+        tuple: (subprocess.Popen, websocket URL or None)
+    """
+    chrome_path = find_chrome_executable()
+    if chrome_path is None:
+        raise FileNotFoundError("Could not find a Chrome/Chromium executable")
+
+    os.makedirs(user_data_dir, exist_ok=True)
+    cmd = [
+        chrome_path,
+        f"--remote-debugging-port={port}",
+        f"--user-data-dir={user_data_dir}",
+        "--no-first-run",
+        "--no-default-browser-check",
+        *extra_args
+    ]
+    if headless:
+        cmd.append("--headless=new")
+
+    launched_at = time.time() - 1
+    chrome_process = subprocess.Popen(cmd, stderr=subprocess.PIPE)
+    ws_url = wait_for_devtools(port, chrome_process, user_data_dir, launched_at)
+    return chrome_process, (ws_url if isinstance(ws_url, str) else None)
+
 def close_chrome():
     """Close Chrome browser."""
     system = platform.system()
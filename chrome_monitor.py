@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import psutil
+
+CHROME_NAMES = ['chrome', 'google chrome', 'google-chrome', 'chromium']
+
+
+def find_browser_process(port=None, pid=None):
+    """
+    Find the top-level browser process to monitor.
+
+    Args:
+        port: Remote debugging port of a Chrome we connected to (matched on its command line)
+        pid: Known process id (e.g. from a Popen we started)
+
+    Returns:
+        psutil.Process or None
+    """
+    if pid is not None:
+        try:
+            return psutil.Process(pid)
+        except psutil.NoSuchProcess:
+            return None
+
+    if port is not None:
+        flag = f"--remote-debugging-port={port}"
+        for proc in psutil.process_iter(['name', 'cmdline']):
+            try:
+                cmdline = proc.info['cmdline'] or []
+                if flag in cmdline and not any(arg.startswith('--type=') for arg in cmdline):
+                    return proc
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return None
+
+    # Browser launched by Playwright: a Chrome child of this process
+    for child in psutil.Process(os.getpid()).children(recursive=True):
+        try:
+            name = child.name().lower()
+            if any(chrome in name for chrome in CHROME_NAMES) and \
+                    not any(arg.startswith('--type=') for arg in child.cmdline()):
+                return child
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return None
+
+
+class ChromeResourceMonitor:
+    """
+    Background thread sampling CPU and RSS of a Chrome process tree.
+
+    Samples are kept in a short history, optionally appended to a JSONL metrics file, and
+    checked against thresholds. When RSS stays over max_rss_mb, or CPU over max_cpu_percent,
+    for sustain_samples samples in a row, recycle_reason is set and on_threshold is called
+    once. The monitor only observes; the owner of the browser decides when to recycle,
+    since Playwright calls must stay on the browser's own thread.
+    """
+
+    def __init__(self, process, options, label="browser", on_threshold=None):
+        self.process = process
+        self.options = options
+        self.label = label
+        self.on_threshold = on_threshold
+        self.samples = deque(maxlen=options["history"])
+        self.recycle_reason = None
+        self._tracked = {}  # pid -> psutil.Process, kept so cpu_percent has a baseline
+        self._over_count = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"chrome-monitor-{self.label}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.options["interval"] + 1)
+
+    def reset(self, process):
+        """Monitor a relaunched browser from scratch."""
+        self.process = process
+        self._tracked = {}
+        self._over_count = 0
+        self.recycle_reason = None
+        self.samples.clear()
+
+    def _run(self):
+        while not self._stop.wait(self.options["interval"]):
+            try:
+                sample = self.sample()
+            except Exception as e:
+                print(f"[{self.label}] Chrome monitor sample failed: {e}")
+                continue
+            if sample is not None:
+                self._export(sample)
+                self._check(sample)
+
+    def sample(self):
+        """Sum CPU percent and RSS over the browser process and all its children."""
+        if self.process is None:
+            return None
+        try:
+            processes = [self.process] + self.process.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return None
+
+        rss = 0
+        cpu = 0.0
+        alive = {}
+        for proc in processes:
+            tracked = self._tracked.get(proc.pid, proc)
+            try:
+                rss += tracked.memory_info().rss
+                cpu += tracked.cpu_percent(None)  # 0.0 on the first call for a new process
+                alive[proc.pid] = tracked
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        self._tracked = alive
+
+        sample = {"time": time.time(), "label": self.label, "processes": len(alive),
+                  "rss_mb": round(rss / (1024 * 1024), 1), "cpu_percent": round(cpu, 1)}
+        self.samples.append(sample)
+        return sample
+
+    def _export(self, sample):
+        path = self.options.get("metrics_file")
+        if path:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(sample) + "\n")
+
+    def _check(self, sample):
+        if self.recycle_reason is not None:
+            return
+
+        reasons = []
+        if self.options["max_rss_mb"] and sample["rss_mb"] > self.options["max_rss_mb"]:
+            reasons.append(f"RSS {sample['rss_mb']:.0f} MB > {self.options['max_rss_mb']} MB")
+        if self.options["max_cpu_percent"] and sample["cpu_percent"] > self.options["max_cpu_percent"]:
+            reasons.append(f"CPU {sample['cpu_percent']:.0f}% > {self.options['max_cpu_percent']}%")
+
+        self._over_count = self._over_count + 1 if reasons else 0
+        if self._over_count >= self.options["sustain_samples"]:
+            self.recycle_reason = ", ".join(reasons)
+            print(f"[{self.label}] Chrome over its resource budget ({self.recycle_reason}); recycle requested")
+            if self.on_threshold:
+                self.on_threshold(self.recycle_reason)
+
+    def latest(self):
+        return self.samples[-1] if self.samples else None
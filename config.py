@@ -30,3 +30,177 @@ BROWSER_CONNECTION = {
     "cdp_endpoint": "http://localhost:9222",  # Chrome DevTools Protocol endpoint
     "fallback_to_new": True  # If connection fails, launch a new browser
 }
+
+# Network archive (HAR) options for deterministic, network-free runs
+NETWORK_ARCHIVE = {
+    "mode": os.getenv("HAR_MODE", "off").lower(),  # "off", "record" or "replay"
+    "har_dir": os.getenv("HAR_DIR", "har_archives"),  # One HAR file per task instruction
+    "not_found": os.getenv("HAR_NOT_FOUND", "abort").lower(),  # Replay: "abort" or "fallback" to the live network
+    "url_filter": os.getenv("HAR_URL_FILTER") or None  # Optional glob limiting which requests are archived
+}
+
+# Warm page pool: keep fully initialized pages ready so each task starts on a fresh page
+PAGE_POOL = {
+    "enabled": os.getenv("PAGE_POOL_ENABLED", "false").lower() == "true",
+    "size": int(os.getenv("PAGE_POOL_SIZE", "2"))
+}
+
+# Local browser-control daemon (browser_daemon.py)
+DAEMON_OPTIONS = {
+    "host": os.getenv("DAEMON_HOST", "127.0.0.1"),  # Keep on localhost
+    "port": int(os.getenv("DAEMON_PORT", "8765")),
+    "token": os.getenv("DAEMON_TOKEN", ""),  # When set, clients send "Authorization: Bearer <token>"
+    "pool_size": int(os.getenv("DAEMON_POOL_SIZE", "2"))  # Warm pages kept ready for new sessions
+}
+
+# Agent options
+AGENT_OPTIONS = {
+    "mode": os.getenv("AGENT_MODE", "react").lower(),  # "react" or "tool_calling" (several read-only tools per turn)
+    "streaming": os.getenv("AGENT_STREAMING", "false").lower() == "true"  # ReAct: dispatch actions mid-generation
+}
+
+# ReadPages: analyze several links at once in background tabs
+READ_PAGES_OPTIONS = {
+    "max_pages": 5,  # Pages loaded in parallel per call
+    "max_chars_per_page": 3000,  # Analysis text kept per page
+    "timeout": 15,  # Seconds to wait for all pages to load
+    "block_resources": ["image", "media", "font"]  # Not needed for reading text
+}
+
+# Typing behaviour for Keyboard and FillForm text entry
+TYPING_OPTIONS = {
+    "mode": os.getenv("TYPING_MODE", "human").lower(),  # "human", "bulk", "hybrid" or "auto"
+    "human_chars": 5,  # Hybrid: characters typed human-style before bulk-inserting the rest
+    "auto_threshold": 40  # Auto: text at least this long is typed in hybrid mode
+}
+
+# Keyboard tool timing between key presses
+KEYBOARD_OPTIONS = {
+    "timing": os.getenv("KEYBOARD_TIMING", "fast").lower()  # "fast" or "human" (original fixed pauses)
+}
+
+# Screenshot tool: downscaled viewport captures with perceptual-hash dedupe
+VISUAL_CAPTURE = {
+    "screenshot_dir": os.getenv("SCREENSHOT_DIR", "screenshots"),
+    "max_width": 800,  # Saved JPEG width in pixels
+    "jpeg_quality": 50,
+    "change_threshold": 4,  # Hash bits (of 64) that may differ and still count as "no visual change"
+    "cache_size": 8  # Recent frames remembered
+}
+
+# Per-domain memory of elements found by VisualClick, tried before full DOM scoring
+SELECTOR_MEMORY = {
+    "enabled": os.getenv("SELECTOR_MEMORY_ENABLED", "true").lower() == "true",
+    "path": os.getenv("SELECTOR_MEMORY_PATH", "selector_memory.json"),
+    "max_entries_per_domain": 200
+}
+
+# Speculative prefetch of likely next links after AnalyzePage (opt-in)
+PREFETCH_OPTIONS = {
+    "enabled": os.getenv("PREFETCH_ENABLED", "false").lower() == "true",
+    "max_links": 3,  # Top link candidates considered per analysis
+    "max_concurrent": 3,  # Loads started per analysis
+    "max_pages": 4,  # Warm pages held at once; the oldest is closed to make room
+    "ttl": 30,  # Seconds a prefetched page stays usable
+    "min_text_length": 10,  # Links with shorter text (menus, "Sign in") are not prefetched
+    "same_origin_only": True,
+    "block_resources": []  # Types skipped while prefetching stay missing on the swapped-in page
+}
+
+# Streaming page analysis: chunks arrive region by region and can stop early
+ANALYSIS_STREAMING = {
+    "enabled": os.getenv("ANALYSIS_STREAMING", "false").lower() == "true",
+    "order": os.getenv("ANALYSIS_ORDER", "document").lower(),  # "document" or "viewport" (visible regions first)
+    "chunk_elements": 25,  # Interactive elements per chunk
+    "max_chars": int(os.getenv("ANALYSIS_MAX_CHARS", "0")),  # Stop once this much text arrived (0 = whole page)
+    "timeout": 20
+}
+
+# VisualClick element search
+FIND_ELEMENT_OPTIONS = {
+    # Stop scoring once an on-screen element reaches this fraction of the highest possible score (0 = always scan everything)
+    "early_exit_ratio": float(os.getenv("FIND_ELEMENT_EARLY_EXIT", "1.0"))
+}
+
+# Memory limits for long-lived controllers and agents
+MEMORY_BUDGET = {
+    "enabled": os.getenv("MEMORY_BUDGET_ENABLED", "true").lower() == "true",
+    "keep_full_steps": 5,  # Most recent steps whose observations are kept whole during a task
+    "max_observation_chars": 2000,  # Older observations are cut to this length
+    "max_rss_mb": int(os.getenv("MEMORY_MAX_RSS_MB", "0"))  # Above this, caches are cleared after each task (0 = no limit)
+}
+
+# Per-step task checkpoints for resuming after a crash (python main.py --resume)
+CHECKPOINTS = {
+    "enabled": os.getenv("CHECKPOINTS_ENABLED", "true").lower() == "true",
+    "dir": os.getenv("CHECKPOINT_DIR", "checkpoints"),
+    # Also save cookies/localStorage so a resume restores logins (owner-only file, deleted on finish)
+    "save_state": os.getenv("CHECKPOINT_SAVE_STATE", "false").lower() == "true",
+    "state_every": 5,  # Save cookies/localStorage every N steps (and whenever the site changes)
+    "keep_finished": int(os.getenv("CHECKPOINT_KEEP_FINISHED", "20")),  # Finished runs kept for --compile-macro
+    "max_observation_chars": 20000  # Observation text kept per step
+}
+
+# Macros compiled from successful task checkpoints (python main.py --compile-macro / --macro)
+MACRO_OPTIONS = {
+    "dir": os.getenv("MACRO_DIR", "macros")
+}
+
+# Multi-process executor (sharded_executor.py): one Chrome, controller and agent per worker
+SHARDED_OPTIONS = {
+    "workers": int(os.getenv("SHARD_WORKERS", str(max(1, (os.cpu_count() or 2) // 2)))),
+    "base_port": int(os.getenv("SHARD_BASE_PORT", "9300")),  # Worker N debugs Chrome on base_port + N
+    "profile_dir": os.getenv("SHARD_PROFILE_DIR", "worker_profiles")  # One Chrome profile per worker
+}
+
+# Chrome resource monitor: samples CPU/RSS of the browser process tree and requests a
+# recycle (drain, relaunch, restore cookies/localStorage) of browsers we own when over budget
+RESOURCE_MONITOR = {
+    "enabled": os.getenv("CHROME_MONITOR", "true").lower() == "true",
+    "interval": float(os.getenv("CHROME_MONITOR_INTERVAL", "10")),  # Seconds between samples
+    "history": 360,  # Samples kept in memory for metrics
+    "max_rss_mb": int(os.getenv("CHROME_MAX_RSS_MB", "4096")),  # Total RSS of all Chrome processes (0 = no limit)
+    "max_cpu_percent": float(os.getenv("CHROME_MAX_CPU", "0")),  # Summed over processes, 100 = one core (0 = no limit)
+    "sustain_samples": 3,  # Consecutive samples over a limit before a recycle is requested
+    "metrics_file": os.getenv("CHROME_METRICS_FILE", "")  # Append every sample as JSONL (empty = off)
+}
+
+# Crash/hang recovery: reconnect over CDP or reopen the page, then retry the action once
+BROWSER_RECOVERY = {
+    "enabled": os.getenv("BROWSER_RECOVERY", "true").lower() == "true",
+    "heartbeat_timeout": float(os.getenv("HEARTBEAT_TIMEOUT", "5")),  # Seconds a page has to answer after a failed action
+    "reconnect_timeout": float(os.getenv("RECONNECT_TIMEOUT", "30"))  # Seconds to wait for a restarted Chrome
+}
+
+# Shared LLM gateway: one pooled HTTP client per process with an in-flight and tokens-per-minute governor
+LLM_GATEWAY = {
+    "enabled": os.getenv("LLM_GATEWAY", "true").lower() == "true",
+    "base_url": os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),  # Point at a local OpenAI-compatible stub for testing
+    "max_in_flight": int(os.getenv("LLM_MAX_IN_FLIGHT", "4")),
+    "tokens_per_minute": int(os.getenv("LLM_TPM", "0")),  # 0 = no token budget
+    "max_connections": 8,  # Keep-alive connections shared by every agent
+    "keepalive_seconds": 60,
+    "timeout": 120,
+    "default_backoff": 5,  # Seconds every session pauses after a 429 without Retry-After
+    "log_wait_over": 2.0,  # Print calls that queued at least this long
+    "history": 500  # Recent calls kept for the report
+}
+
+# ScrollUntil: one in-page scroll loop that stops on a condition or at the end of the content
+SCROLL_UNTIL = {
+    "max_scrolls": 30,
+    "step_ratio": 0.85,  # Fraction of the viewport scrolled per step
+    "settle_ms": 600,  # Wait after each step for lazy content to load
+    "stable_rounds": 3,  # Steps at the bottom with no height change before the content counts as ended
+    "timeout": 30,  # Seconds
+    "max_chars": 6000  # New content returned to the agent
+}
+
+# ExtractData: tables and repeated items as JSON/CSV
+EXTRACT_DATA = {
+    "dir": os.getenv("EXTRACT_DIR", "extracted_data"),  # Every extracted dataset is saved here in full
+    "page_rows": 50,  # Rows returned to the agent per call
+    "min_repeat": 3,  # Similar siblings needed to count as a list
+    "max_cell_chars": 200,
+    "max_datasets": 10
+}
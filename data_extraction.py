@@ -0,0 +1,225 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import time
+
+# One in-page pass that finds tables and lists of similar items (cards, results, rows built
+# from divs) and returns them as column-aligned datasets, most rows first
+EXTRACT_DATA_JS = """
+            (params) => {
+                const { minRepeat, maxCellChars, maxDatasets } = params;
+                const clean = (text) => (text || '').replace(/\\s+/g, ' ').trim().substring(0, maxCellChars);
+                const isVisible = (el) => {
+                    const rect = el.getBoundingClientRect();
+                    if (rect.width <= 0 || rect.height <= 0) return false;
+                    const style = getComputedStyle(el);
+                    return style.display !== 'none' && style.visibility !== 'hidden';
+                };
+                const uniqueNames = (names) => {
+                    const seen = {};
+                    return names.map(name => {
+                        name = name || 'column';
+                        seen[name] = (seen[name] || 0) + 1;
+                        return seen[name] > 1 ? `${name}_${seen[name]}` : name;
+                    });
+                };
+                const titleFor = (el) => {
+                    const label = el.getAttribute('aria-label') || (el.caption && clean(el.caption.textContent));
+                    if (label) return clean(label);
+                    // Nearest heading before the element
+                    let node = el;
+                    while (node && node !== document.body) {
+                        let sibling = node.previousElementSibling;
+                        while (sibling) {
+                            if (/^H[1-6]$/.test(sibling.tagName)) return clean(sibling.textContent);
+                            const inner = sibling.querySelector && sibling.querySelector('h1, h2, h3, h4, h5, h6');
+                            if (inner) return clean(inner.textContent);
+                            sibling = sibling.previousElementSibling;
+                        }
+                        node = node.parentElement;
+                    }
+                    return '';
+                };
+
+                const datasets = [];
+
+                // <table>: cells expanded by colspan and rowspan so columns line up
+                for (const table of document.querySelectorAll('table')) {
+                    if (!isVisible(table)) continue;
+                    const spanning = [];  // column -> { text, rows } still occupied by a cell from a row above
+                    const grid = Array.from(table.rows).map(row => {
+                        const cells = [];
+                        const fillOccupied = () => {
+                            while (spanning[cells.length] && spanning[cells.length].rows > 0) {
+                                spanning[cells.length].rows--;
+                                cells.push(spanning[cells.length].text);
+                            }
+                        };
+                        for (const cell of row.cells) {
+                            fillOccupied();
+                            const text = clean(cell.textContent);
+                            // rowSpan 0 runs to the end of the table section
+                            const rowSpan = cell.rowSpan === 0 ? table.rows.length : (cell.rowSpan || 1);
+                            for (let i = 0; i < (cell.colSpan || 1); i++) {
+                                spanning[cells.length] = { text, rows: rowSpan - 1 };
+                                cells.push(text);
+                            }
+                        }
+                        fillOccupied();
+                        return { cells, header: Array.from(row.cells).every(cell => cell.tagName === 'TH'),
+                                 inHead: row.parentElement && row.parentElement.tagName === 'THEAD' };
+                    }).filter(row => row.cells.some(text => text));
+                    if (grid.length < 2) continue;
+
+                    const headerRows = grid.filter(row => row.inHead);
+                    const header = headerRows.length ? headerRows[headerRows.length - 1] : (grid[0].header ? grid[0] : null);
+                    const body = grid.filter(row => !row.inHead && row !== header);
+                    const width = Math.max(...body.map(row => row.cells.length), header ? header.cells.length : 0);
+                    if (width < 2 || body.length < 1) continue;  // Layout tables
+
+                    const columns = uniqueNames(Array.from({ length: width },
+                        (_, i) => (header && header.cells[i]) || `column_${i + 1}`));
+                    datasets.push({
+                        kind: 'table', title: titleFor(table), columns,
+                        rows: body.map(row => Array.from({ length: width }, (_, i) => row.cells[i] || ''))
+                    });
+                }
+
+                // Repeated items: siblings with the same tag and classes, fields aligned by their path in the item
+                const signature = (el) => el.tagName + '.' +
+                    Array.from(el.classList).filter(name => !/\\d/.test(name)).sort().join('.');
+                const fieldName = (el, item) => {
+                    const parts = [];
+                    for (let node = el; node && node !== item && parts.length < 3; node = node.parentElement) {
+                        const name = Array.from(node.classList).find(name => !/\\d/.test(name));
+                        parts.unshift(name || node.tagName.toLowerCase());
+                    }
+                    return parts.join('>') || 'text';
+                };
+
+                const candidates = [];
+                for (const parent of document.querySelectorAll('body *')) {
+                    if (parent.children.length < minRepeat || parent.closest('table')) continue;
+                    const groups = {};
+                    for (const child of parent.children) {
+                        const key = signature(child);
+                        (groups[key] = groups[key] || []).push(child);
+                    }
+                    for (const items of Object.values(groups)) {
+                        if (items.length < minRepeat || items.length < parent.children.length / 2) continue;
+                        if (!isVisible(items[0])) continue;
+
+                        const records = items.map(item => {
+                            const record = {};
+                            const walker = document.createTreeWalker(item, NodeFilter.SHOW_TEXT);
+                            while (walker.nextNode()) {
+                                const text = clean(walker.currentNode.textContent);
+                                const el = walker.currentNode.parentElement;
+                                if (!text || !el || ['SCRIPT', 'STYLE'].includes(el.tagName)) continue;
+                                let key = fieldName(el, item);
+                                for (let n = 2; key in record; n++) key = `${fieldName(el, item)}#${n}`;
+                                record[key] = text;
+                            }
+                            const link = item.tagName === 'A' ? item : item.querySelector('a[href]');
+                            if (link && link.href) record.link = link.href;
+                            const image = item.querySelector('img');
+                            if (image && (image.alt || image.src)) record.image = image.alt || image.src;
+                            return record;
+                        }).filter(record => Object.keys(record).length);
+
+                        // Keep fields present in at least half of the items, in first-seen order
+                        const counts = new Map();
+                        records.forEach(record => Object.keys(record).forEach(key => counts.set(key, (counts.get(key) || 0) + 1)));
+                        const keys = Array.from(counts.keys()).filter(key => counts.get(key) >= records.length / 2);
+                        if (records.length < minRepeat || !keys.length) continue;
+
+                        candidates.push({
+                            parent, score: records.length * 1000 + keys.length,
+                            dataset: {
+                                kind: 'list', title: '',
+                                columns: uniqueNames(keys.map(key => key.split('>').pop().replace(/#\\d+$/, ''))),
+                                rows: records.map(record => keys.map(key => record[key] || ''))
+                            }
+                        });
+                    }
+                }
+
+                // Longest lists win; lists nested in (or wrapping) an accepted one are the same data
+                candidates.sort((a, b) => b.score - a.score);
+                const accepted = [];
+                for (const candidate of candidates) {
+                    if (accepted.some(other => other.contains(candidate.parent) || candidate.parent.contains(other))) continue;
+                    accepted.push(candidate.parent);
+                    // Titles walk back through the page, so only accepted lists get one
+                    candidate.dataset.title = titleFor(candidate.parent);
+                    datasets.push(candidate.dataset);
+                }
+
+                datasets.sort((a, b) => (b.rows.length - a.rows.length) || (b.columns.length - a.columns.length));
+                return datasets.slice(0, maxDatasets);
+            }
+            """
+
+
+def parse_extract_request(input_text):
+    """
+    Turn ExtractData input into a request dict: dataset index, format, offset and limit.
+
+    JSON: {"dataset": 0, "format": "csv", "offset": 50, "limit": 50}. Plain input: "csv"/"json",
+    a dataset number, or nothing for the largest dataset as JSON.
+    """
+    request = {"dataset": 0, "format": "json", "offset": 0, "limit": None}
+    text = input_text.strip().strip("'\"").strip() if isinstance(input_text, str) else input_text
+    if not text:
+        return request
+    if isinstance(text, str):
+        try:
+            text = json.loads(text)
+        except ValueError:
+            pass
+    if isinstance(text, int):
+        request["dataset"] = text
+    elif isinstance(text, str):
+        if text.lower() in ("csv", "json"):
+            request["format"] = text.lower()
+        else:
+            raise ValueError(f"Unknown ExtractData input '{text}'")
+    elif isinstance(text, dict):
+        for key in ("dataset", "offset", "limit"):
+            if text.get(key) is not None:
+                request[key] = int(text[key])
+        if text.get("format"):
+            request["format"] = str(text["format"]).lower()
+    if request["format"] not in ("csv", "json"):
+        raise ValueError("format must be 'csv' or 'json'")
+    return request
+
+
+def format_rows(columns, rows, output_format):
+    """Render rows as CSV text or a JSON list of records."""
+    if output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        writer.writerows(rows)
+        return buffer.getvalue().strip()
+    return json.dumps([dict(zip(columns, row)) for row in rows], ensure_ascii=False)
+
+
+def save_dataset(dataset, page_url, index, output_format, directory):
+    """
+    Write the whole dataset to a file so large results do not have to pass through the LLM.
+
+    The name carries the time and a hash of the page URL, so datasets with the same title
+    on different pages (or extracted again later) do not overwrite each other.
+    """
+    os.makedirs(directory, exist_ok=True)
+    slug = re.sub(r'[^a-z0-9]+', '-', (dataset["title"] or page_url).lower()).strip('-')[:40] or "data"
+    digest = hashlib.sha1(page_url.encode("utf-8")).hexdigest()[:8]
+    path = os.path.join(directory, f"{slug}-{digest}-{time.strftime('%Y%m%d-%H%M%S')}-{index}.{output_format}")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(format_rows(dataset["columns"], dataset["rows"], output_format))
+    return path
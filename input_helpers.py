@@ -123,7 +123,48 @@ def virtual_click(page, current_x, current_y):
     print(f"DOM click result: {click_result}")
     time.sleep(0.3)  # Wait for click to register
 
-def virtual_type(page, text):
+TYPING_MODES = ("human", "bulk", "hybrid", "auto")
+
+def resolve_typing_mode(text, mode, auto_threshold=40):
+    """Pick the concrete typing mode; "auto" types short text like a human and long text hybrid."""
+    if mode == "auto":
+        return "human" if len(text) < auto_threshold else "hybrid"
+    return mode if mode in TYPING_MODES else "human"
+
+def virtual_type(page, text, mode="human", human_chars=5):
+    """
+    Type text into the focused element.
+
+    Modes:
+        human: character by character with realistic timing
+        bulk: insert the whole text in one input operation
+        hybrid: type the first human_chars characters human-style, bulk-insert the rest
+    """
+    if mode == "bulk":
+        bulk_insert_text(page, text)
+    elif mode == "hybrid":
+        human_type(page, text[:human_chars])
+        bulk_insert_text(page, text[human_chars:])
+    else:
+        human_type(page, text)
+
+def bulk_insert_text(page, text):
+    """Insert text in a single operation and fire the change event frameworks listen for."""
+    if not text:
+        return
+
+    # insert_text fires one input event for the whole string, without per-key events
+    page.keyboard.insert_text(text)
+    page.evaluate("""
+        () => {
+            const el = document.activeElement;
+            if (el) {
+                el.dispatchEvent(new Event('change', {bubbles: true}));
+            }
+        }
+    """)
+
+def human_type(page, text):
     """Type text character by character with realistic timing."""
     for char in text:
         # Different delay based on character type
@@ -0,0 +1,195 @@
+import re
+import time
+from collections import OrderedDict, namedtuple
+
+# Keyboard tool names mapped to Playwright key names
+SPECIAL_KEYS = {
+    # Basic navigation keys
+    "enter": "Enter",
+    "tab": "Tab",
+    "shift+tab": "Shift+Tab",
+    "backspace": "Backspace",
+    "escape": "Escape", "esc": "Escape",
+    "delete": "Delete", "del": "Delete",
+    "space": "Space",
+
+    # Arrow keys
+    "up": "ArrowUp",
+    "down": "ArrowDown",
+    "left": "ArrowLeft",
+    "right": "ArrowRight",
+
+    # Common shortcuts
+    "ctrl+a": "Control+a", "cmd+a": "Meta+a",
+    "ctrl+c": "Control+c", "cmd+c": "Meta+c",
+    "ctrl+v": "Control+v", "cmd+v": "Meta+v",
+    "ctrl+x": "Control+x", "cmd+x": "Meta+x",
+    "ctrl+z": "Control+z", "cmd+z": "Meta+z",
+    "ctrl+y": "Control+y", "cmd+y": "Meta+y",
+    "ctrl+f": "Control+f", "cmd+f": "Meta+f",
+
+    # Function keys
+    "f1": "F1", "f2": "F2", "f3": "F3", "f4": "F4",
+    "f5": "F5", "f6": "F6", "f7": "F7", "f8": "F8",
+    "f9": "F9", "f10": "F10", "f11": "F11", "f12": "F12",
+
+    # Navigation shortcuts
+    "home": "Home",
+    "end": "End",
+    "pageup": "PageUp",
+    "pagedown": "PageDown",
+
+    # Special combinations
+    "alt+tab": "Alt+Tab",
+    "ctrl+enter": "Control+Enter", "cmd+enter": "Meta+Enter",
+    "ctrl+home": "Control+Home", "cmd+home": "Meta+Home",
+    "ctrl+end": "Control+End", "cmd+end": "Meta+End",
+
+    # Web-specific
+    "ctrl+t": "Control+t", "cmd+t": "Meta+t",  # New tab
+    "ctrl+w": "Control+w", "cmd+w": "Meta+w",  # Close tab
+    "ctrl+r": "Control+r", "cmd+r": "Meta+r",  # Reload
+}
+
+MODIFIER_KEYS = {
+    "ctrl": "Control", "control": "Control",
+    "cmd": "Meta", "meta": "Meta", "command": "Meta",
+    "alt": "Alt", "option": "Alt",
+    "shift": "Shift",
+}
+
+# Sleeps around each step; "human" is the original fixed timing
+KEY_TIMING_POLICIES = {
+    "human": {"before_key": 0.2, "after_key": 0.3, "between_steps": 0.3, "hold": 0.3},
+    "fast": {"before_key": 0.0, "after_key": 0.05, "between_steps": 0.0, "hold": 0.05},
+}
+
+HOLD_PATTERN = re.compile(r'^hold\s+(\w+),?\s+(?:press\s+)?(\w+)$')
+HOLD_START_PATTERN = re.compile(r'^hold\s+(\w+)$')
+PRESS_PATTERN = re.compile(r'^(?:press\s+)?(\w+)$')
+CHORD_PATTERN = re.compile(r'^(?:(?:ctrl|control|cmd|meta|command|alt|option|shift)\+)+[^+\s]+$')
+
+# One compiled step: kind is "press", "hold" or "type"
+KeyStep = namedtuple("KeyStep", ["kind", "key", "modifier", "text", "label"])
+
+# Compiled plans made only of keys, chords and holds, most recently used last. Plans with
+# text runs are never kept, since the text may be a password or other typed secret.
+KEY_PLAN_CACHE_SIZE = 256
+_key_plans = OrderedDict()
+
+
+def _key_name(name):
+    """Playwright name for a single key word ('tab' -> 'Tab', 'a' -> 'a')."""
+    name = name.lower()
+    if name in SPECIAL_KEYS:
+        return SPECIAL_KEYS[name]
+    if name in MODIFIER_KEYS:
+        return MODIFIER_KEYS[name]
+    return name if len(name) == 1 else name.capitalize()
+
+
+def _compile_token(token):
+    """Compile one comma-separated piece of a sequence into a step."""
+    lowered = token.lower()
+
+    if lowered in SPECIAL_KEYS:
+        return KeyStep("press", SPECIAL_KEYS[lowered], None, None, f"Pressed {lowered}")
+
+    # Chords that are not in the table, e.g. "ctrl+shift+t"
+    if CHORD_PATTERN.match(lowered):
+        *modifiers, key = lowered.split("+")
+        chord = "+".join([MODIFIER_KEYS[m] for m in modifiers] + [_key_name(key)])
+        return KeyStep("press", chord, None, None, f"Pressed {lowered}")
+
+    hold_match = HOLD_PATTERN.match(lowered)
+    if hold_match:
+        modifier, key = hold_match.groups()
+        return KeyStep("hold", _key_name(key), _key_name(modifier), None, f"Held {modifier} and pressed {key}")
+
+    # Anything else is text, typed with its original case
+    return KeyStep("type", None, None, token, f"Typed '{token}'")
+
+
+def compile_key_sequence(input_text):
+    """
+    Parse a Keyboard tool input once into a tuple of KeyStep objects.
+
+    Commas and semicolons separate steps; "hold shift, press tab" spanning a comma
+    becomes a single hold step. Plans without text runs are cached since agents repeat
+    the same key inputs; anything that types text is compiled every time.
+    """
+    steps = _key_plans.get(input_text)
+    if steps is not None:
+        _key_plans.move_to_end(input_text)
+        return steps
+
+    steps = _compile_sequence(input_text)
+    if all(step.kind != "type" for step in steps):
+        _key_plans[input_text] = steps
+        while len(_key_plans) > KEY_PLAN_CACHE_SIZE:
+            _key_plans.popitem(last=False)
+    return steps
+
+
+def _compile_sequence(input_text):
+    if "," not in input_text and ";" not in input_text:
+        return (_compile_token(input_text.strip()),)
+
+    tokens = [token.strip() for token in re.split(r'[,;]', input_text) if token.strip()]
+    steps = []
+    index = 0
+    while index < len(tokens):
+        hold_start = HOLD_START_PATTERN.match(tokens[index].lower())
+        press = PRESS_PATTERN.match(tokens[index + 1].lower()) if index + 1 < len(tokens) else None
+        if hold_start and press:
+            modifier, key = hold_start.group(1), press.group(1)
+            steps.append(KeyStep("hold", _key_name(key), _key_name(modifier), None,
+                                 f"Held {modifier} and pressed {key}"))
+            index += 2
+            continue
+
+        steps.append(_compile_token(tokens[index]))
+        index += 1
+    return tuple(steps)
+
+
+def run_key_plan(page, steps, timing, type_text):
+    """
+    Dispatch compiled steps with the given timing policy.
+
+    Args:
+        page: Playwright page receiving the keys
+        steps: Tuple of KeyStep from compile_key_sequence
+        timing: Entry of KEY_TIMING_POLICIES
+        type_text: Callable used for text steps (keeps the configured typing mode)
+
+    Returns:
+        tuple: (list of completed step labels, failure description or None)
+    """
+    completed = []
+    for index, step in enumerate(steps, 1):
+        try:
+            if index > 1 and timing["between_steps"]:
+                time.sleep(timing["between_steps"])
+
+            if step.kind == "press":
+                if timing["before_key"]:
+                    time.sleep(timing["before_key"])
+                page.keyboard.press(step.key)
+                if timing["after_key"]:
+                    time.sleep(timing["after_key"])
+            elif step.kind == "hold":
+                page.keyboard.down(step.modifier)
+                try:
+                    time.sleep(timing["hold"])
+                    page.keyboard.press(step.key)
+                finally:
+                    page.keyboard.up(step.modifier)
+            else:
+                type_text(step.text)
+
+            completed.append(step.label)
+        except Exception as e:
+            return completed, f"step {index} of {len(steps)} ({step.label}): {str(e)}"
+
+    return completed, None
@@ -0,0 +1,224 @@
+import contextvars
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+import httpx
+
+# Which session an LLM call belongs to, for fair queuing; set by whoever runs a task
+llm_session = contextvars.ContextVar("llm_session", default="default")
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway(options):
+    """Return the process-wide gateway, creating it on first use."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway(options)
+        return _gateway
+
+
+def _estimate_tokens(request):
+    """Rough token count of a chat request: ~4 bytes per prompt token plus the completion allowance."""
+    try:
+        body = json.loads(request.content or b"{}")
+    except ValueError:
+        return len(request.content or b"") // 4
+    completion = body.get("max_completion_tokens") or body.get("max_tokens") or 500
+    return len(request.content or b"") // 4 + completion
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Wrap a response stream and run on_close exactly once when it is closed."""
+
+    def __init__(self, stream, on_close):
+        self.stream = stream
+        self.on_close = on_close
+
+    def __iter__(self):
+        yield from self.stream
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            on_close, self.on_close = self.on_close, None
+            if on_close:
+                on_close()
+
+
+class GovernedTransport(httpx.BaseTransport):
+    """httpx transport that asks the gateway for a slot before every request."""
+
+    def __init__(self, gateway, transport):
+        self.gateway = gateway
+        self.transport = transport
+
+    def handle_request(self, request):
+        return self.gateway.send(request, self.transport)
+
+    def close(self):
+        self.transport.close()
+
+
+class LLMGateway:
+    """
+    One HTTP client shared by every LLM in the process, with a concurrency governor.
+
+    All agents reuse the same pool of keep-alive connections. A request only goes out when
+    fewer than max_in_flight are running and the estimated tokens fit in the rolling
+    tokens-per-minute budget. Waiting requests are granted round-robin across sessions, so
+    one busy session cannot starve the others. A 429 pauses every session until its
+    Retry-After, instead of each retrying on its own.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._waiting = OrderedDict()  # session -> deque of tickets, in round-robin order
+        self._token_log = deque()  # (time, tokens) of calls in the last minute
+        self._paused_until = 0
+        self.calls = deque(maxlen=options["history"])
+
+        limits = httpx.Limits(max_connections=options["max_connections"],
+                              max_keepalive_connections=options["max_connections"],
+                              keepalive_expiry=options["keepalive_seconds"])
+        transport = GovernedTransport(self, httpx.HTTPTransport(limits=limits, retries=1))
+        self.client = httpx.Client(transport=transport, timeout=options["timeout"])
+
+    def _tokens_used(self, now):
+        while self._token_log and now - self._token_log[0][0] > 60:
+            self._token_log.popleft()
+        return sum(tokens for _, tokens in self._token_log)
+
+    def _head_ticket(self):
+        """First ticket of the session at the head of the rotation."""
+        return next(iter(self._waiting.values()))[0]
+
+    def _can_start(self, estimate, now):
+        if self._in_flight >= self.options["max_in_flight"] or now < self._paused_until:
+            return False
+        budget = self.options["tokens_per_minute"]
+        # A call bigger than the whole budget may still go alone, or it would never run
+        return not budget or not self._token_log or self._tokens_used(now) + estimate <= budget
+
+    def _acquire(self, session, estimate):
+        ticket = object()
+        with self._condition:
+            self._waiting.setdefault(session, deque()).append(ticket)
+            while True:
+                now = time.time()
+                if self._head_ticket() is ticket and self._can_start(estimate, now):
+                    break
+                self._condition.wait(timeout=self._wait_hint(now))
+
+            # Take the slot and move this session to the back of the rotation
+            tickets = self._waiting.pop(session)
+            tickets.popleft()
+            if tickets:
+                self._waiting[session] = tickets
+            self._in_flight += 1
+            self._token_log.append((time.time(), estimate))
+            entry = self._token_log[-1]
+            self._condition.notify_all()
+            return entry
+
+    def _wait_hint(self, now):
+        """How long to sleep before re-checking when nothing will notify us (budget or pause expiry)."""
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._token_log:
+            return max(0.05, 60 - (now - self._token_log[0][0]))
+        return 1.0
+
+    def _release(self, entry, tokens, retry_after=None):
+        with self._condition:
+            self._in_flight -= 1
+            if tokens is not None and entry in self._token_log:
+                # Replace the estimate with what the API reported
+                index = self._token_log.index(entry)
+                self._token_log[index] = (entry[0], tokens)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.time() + retry_after)
+            self._condition.notify_all()
+
+    def send(self, request, transport):
+        session = llm_session.get()
+        estimate = _estimate_tokens(request)
+        queued_at = time.time()
+        entry = self._acquire(session, estimate)
+        started_at = time.time()
+
+        try:
+            response = transport.handle_request(request)
+        except Exception:
+            self._finish(entry, session, queued_at, started_at, estimate, None)
+            raise
+
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.headers.get("retry-after", self.options["default_backoff"]))
+            except ValueError:
+                retry_after = self.options["default_backoff"]
+            self._finish(entry, session, queued_at, started_at, estimate, None, retry_after)
+            return response
+
+        if "json" in response.headers.get("content-type", ""):
+            # Read the body here so the slot can report the tokens the API actually used
+            try:
+                raw = b"".join(response.iter_raw())
+            finally:
+                response.close()
+            result = httpx.Response(response.status_code, headers=response.headers, stream=httpx.ByteStream(raw),
+                                    extensions=response.extensions, request=request)
+            tokens = None
+            try:
+                tokens = json.loads(result.read()).get("usage", {}).get("total_tokens")
+            except (ValueError, AttributeError):
+                pass
+            self._finish(entry, session, queued_at, started_at, estimate, tokens)
+            return result
+
+        # Streamed completions hold their slot until the stream is closed
+        stream = _ReleasingStream(response.stream,
+                                  lambda: self._finish(entry, session, queued_at, started_at, estimate, None))
+        return httpx.Response(response.status_code, headers=response.headers, stream=stream,
+                              extensions=response.extensions, request=request)
+
+    def _finish(self, entry, session, queued_at, started_at, estimate, tokens, retry_after=None):
+        self._release(entry, tokens, retry_after)
+        call = {"session": session, "queue_wait": round(started_at - queued_at, 3),
+                "seconds": round(time.time() - started_at, 3), "tokens": tokens or estimate,
+                "estimated": tokens is None, "throttled": retry_after is not None}
+        self.calls.append(call)
+        if call["queue_wait"] >= self.options["log_wait_over"]:
+            print(f"LLM call for session {session} waited {call['queue_wait']:.2f}s in the gateway queue")
+
+    def stats(self):
+        """Recent calls: count, queue waits, throttling and the current token rate."""
+        calls = list(self.calls)
+        waits = sorted(call["queue_wait"] for call in calls)
+        with self._condition:
+            tokens_last_minute = self._tokens_used(time.time())
+            in_flight = self._in_flight
+        return {
+            "calls": len(calls),
+            "avg_queue_wait": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "p95_queue_wait": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+            "throttled": sum(1 for call in calls if call["throttled"]),
+            "tokens_last_minute": tokens_last_minute,
+            "in_flight": in_flight,
+        }
+
+    def report(self):
+        stats = self.stats()
+        if not stats["calls"]:
+            return "LLM gateway: no calls yet"
+        return (f"LLM gateway: {stats['calls']} calls, queue wait avg {stats['avg_queue_wait']:.2f}s "
+                f"/ p95 {stats['p95_queue_wait']:.2f}s, {stats['throttled']} throttled, "
+                f"{stats['tokens_last_minute']} tokens in the last minute, {stats['in_flight']} in flight")
@@ -0,0 +1,185 @@
+import json
+import os
+import re
+import time
+import uuid
+from types import SimpleNamespace
+
+from checkpoints import REDACTED
+from selector_memory import url_pattern
+
+# Tools a macro replays; read-only tools (AnalyzePage, ReadPages, Screenshot) are only
+# how the agent decided what to do, so they are left out of the compiled macro
+MACRO_ACTIONS = {
+    "Navigate": lambda controller, tool_input: controller.navigate(str(tool_input).strip("'\"").strip()),
+    "VisualClick": lambda controller, tool_input: controller.visual_click(str(tool_input).strip("'\"").strip()),
+    "FillForm": lambda controller, tool_input: controller.fill_form(str(tool_input).strip()),
+    "Keyboard": lambda controller, tool_input: controller.keyboard_action(tool_input),
+    "GoBack": lambda controller, tool_input: controller.go_back(),
+    "Scroll": lambda controller, tool_input: controller.scroll(tool_input or "down"),
+    "ScrollUntil": lambda controller, tool_input: controller.scroll_until(tool_input or "end"),
+    "GoogleSearch": lambda controller, tool_input: controller.search_for(str(tool_input).strip("'\"").strip()),
+}
+
+# Observations that mean a step did not do what it did when it was recorded
+FAILURE_PATTERN = re.compile(r'^(Error|No elements|Cannot|Click attempted with errors|Key sequence failed)'
+                             r'|: not found|not found$|- failed', re.MULTILINE)
+
+
+def _failed(observation):
+    return bool(FAILURE_PATTERN.search(str(observation)))
+
+
+def _normalize(text):
+    return " ".join(str(text or "").lower().split())
+
+
+def _click_input(target):
+    return json.dumps({"type": target.get("type"), "text": target.get("text")})
+
+
+def _form_input(tool_input, targets):
+    """Rewrite a FillForm spec so fields point at stable names instead of analysis IDs."""
+    spec = json.loads(tool_input) if isinstance(tool_input, str) else tool_input
+    fields = spec.get("fields", []) if isinstance(spec, dict) else spec
+    field_targets = [target for target in targets if target["role"] == "field"]
+    submit_targets = [target for target in targets if target["role"] == "submit"]
+
+    rewritten = []
+    for field, target in zip(fields, field_targets):
+        value = field.get("value", "") if isinstance(field, dict) else field[1]
+        if target.get("missing"):
+            continue
+        rewritten.append({"target": target["name"], "value": value})
+
+    new_spec = {"fields": rewritten}
+    if isinstance(spec, dict):
+        if spec.get("typing_mode"):
+            new_spec["typing_mode"] = spec["typing_mode"]
+        if submit_targets and not submit_targets[0].get("missing"):
+            new_spec["submit"] = submit_targets[0]["name"]
+    return json.dumps(new_spec)
+
+
+def compile_macro(checkpoint, name):
+    """
+    Compile a finished checkpointed run into a macro.
+
+    Failed attempts and read-only steps are dropped. Clicks and form fields are rewritten
+    from analysis IDs (which change between visits) to the type/text/name the element had,
+    so each replay resolves them again on the live page.
+    """
+    if not checkpoint.finished:
+        raise ValueError(f"Task {checkpoint.task_id} did not finish; only successful runs can be compiled")
+
+    steps = []
+    for record in checkpoint.steps:
+        tool = record["tool"]
+        if tool not in MACRO_ACTIONS or _failed(record["observation"]):
+            continue
+
+        tool_input = record["tool_input"]
+        targets = record.get("targets") or []
+        step = {"tool": tool, "input": tool_input, "log": record.get("log", ""),
+                "expect_url": url_pattern(record["url"]) if record.get("url") else None}
+
+        clicks = [target for target in targets if target["role"] == "click" and not target.get("missing")]
+        if tool == "VisualClick" and clicks:
+            step["input"] = _click_input(clicks[0])
+            step["expect_text"] = clicks[0].get("text", "")
+        elif tool == "FillForm" and targets:
+            try:
+                step["input"] = _form_input(tool_input, targets)
+            except (ValueError, TypeError, KeyError):
+                pass  # Keep the recorded input
+
+        if REDACTED in json.dumps(tool_input):
+            step["redacted"] = True  # Password input is not recorded, so replay hands this step to the agent
+        steps.append(step)
+
+    return {
+        "name": name,
+        "input": checkpoint.task_input,
+        "source": checkpoint.task_id,
+        "created_at": time.time(),
+        "steps": steps,
+    }
+
+
+def save_macro(macro, directory):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{macro['name']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(macro, f, indent=2)
+    return path
+
+
+def load_macro(name, directory):
+    path = name if name.endswith(".json") else os.path.join(directory, f"{name}.json")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def replay_macro(macro, controller, agent_executor=None, agent_mode="react", callbacks=None):
+    """
+    Run a macro directly against the controller, verifying every step.
+
+    A step diverges when its observation reports a failure, a click lands on an element
+    whose text differs from the recorded one, or the page ends up on a different URL
+    pattern than when it was recorded. The agent then takes over with the
+    replayed steps as its scratchpad, so it continues from the current page.
+
+    Returns:
+        dict: status ("completed", "fallback" or "diverged"), steps_replayed, seconds, output
+    """
+    start_time = time.time()
+    replayed = []
+    divergence = None
+
+    run_id = uuid.uuid4().hex[:8]
+    for index, step in enumerate(macro["steps"], 1):
+        if step.get("redacted"):
+            divergence = f"step {index} ({step['tool']}) types into a password field, which was not recorded"
+            break
+        controller.take_resolved_targets()  # Only this step's targets are checked below
+        observation = MACRO_ACTIONS[step["tool"]](controller, step["input"])
+        print(f"Macro step {index}/{len(macro['steps'])} {step['tool']}: {str(observation)[:120]}")
+        clicked = [target for target in controller.take_resolved_targets()
+                   if target["role"] == "click" and not target.get("missing")]
+
+        if _failed(observation):
+            divergence = f"step {index} ({step['tool']}) failed: {str(observation)[:200]}"
+        elif step.get("expect_text") and (not clicked or
+                                          _normalize(clicked[0].get("text")) != _normalize(step["expect_text"])):
+            found = clicked[0].get("text") if clicked else "nothing"
+            divergence = f"step {index} ({step['tool']}) clicked '{found}', expected '{step['expect_text']}'"
+        elif step.get("expect_url") and url_pattern(controller.page.url) != step["expect_url"]:
+            divergence = (f"step {index} ({step['tool']}) ended on {controller.page.url}, "
+                          f"expected a page like {step['expect_url']}")
+
+        # Tool-calling scratchpads only keep steps that answer a tool call, so each gets an id
+        replayed.append({"tool": step["tool"], "tool_input": step["input"], "log": step["log"],
+                         "observation": str(observation), "tool_call_id": f"macro_{run_id}_{index}"})
+        if divergence:
+            break
+
+    seconds = time.time() - start_time
+    if not divergence:
+        return {"status": "completed", "steps_replayed": len(replayed), "seconds": seconds,
+                "output": f"Macro '{macro['name']}' completed {len(replayed)} steps in {seconds:.1f}s. "
+                          f"Current page: {controller.page.url}"}
+
+    print(f"Macro diverged at {divergence}")
+    if agent_executor is None:
+        return {"status": "diverged", "steps_replayed": len(replayed), "seconds": seconds,
+                "output": f"Macro '{macro['name']}' diverged at {divergence}"}
+
+    # Hand over to the agent with the replayed steps as if it had taken them itself
+    from checkpoints import rebuild_steps
+    print("Falling back to the agent from the current page...")
+    response = agent_executor.invoke(
+        {"input": macro["input"], "resume_steps": rebuild_steps(SimpleNamespace(steps=replayed), agent_mode)},
+        config={"callbacks": callbacks or []}
+    )
+    return {"status": "fallback", "steps_replayed": len(replayed), "seconds": time.time() - start_time,
+            "output": response.get("output", ""), "divergence": divergence}
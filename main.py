@@ -1,15 +1,62 @@
 import time
+_IMPORT_START = time.perf_counter()
+
+import argparse
 import traceback
-from config import OPENAI_API_KEY, BROWSER_OPTIONS, BROWSER_CONNECTION
-from browser_setup import initialize_browser, close_browser
-from browser_controller import VirtualBrowserController
-from agent_tools import create_browser_tools
-from agent import create_agent
-from chrome_launcher import launch_chrome_with_debugging
-
-def main():
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    OPENAI_API_KEY, BROWSER_OPTIONS, BROWSER_CONNECTION, NETWORK_ARCHIVE, PAGE_POOL, MEMORY_BUDGET,
+    CHECKPOINTS, AGENT_OPTIONS, MACRO_OPTIONS, BROWSER_RECOVERY,
+    LLM_GATEWAY
+)
+from startup_profile import StartupProfiler
+
+# Heavy modules (playwright, langchain, psutil) are imported where they are first needed
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="AI agent that controls your browser")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print a per-phase breakdown of startup time")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="TASK_ID",
+                        help="Resume a task from its checkpoint (default: the latest unfinished task)")
+    parser.add_argument("--compile-macro", metavar="TASK_ID",
+                        help="Compile a finished task checkpoint into a replayable macro and exit")
+    parser.add_argument("--macro-name", help="Name for the compiled macro (default: the task id)")
+    parser.add_argument("--macro", metavar="NAME",
+                        help="Replay a macro without the LLM, falling back to the agent if a step diverges")
+    return parser.parse_args()
+
+def build_llm():
+    """Import LangChain and build the chat model; runs on a background thread during browser startup."""
+    start = time.perf_counter()
+    from agent import create_llm
+    return create_llm(OPENAI_API_KEY), time.perf_counter() - start
+
+def main(args=None):
     """Main entry point for the browser automation agent."""
+    args = args or parse_args()
+
+    # Compiling a macro only reads checkpoint files, so no browser or LLM is needed
+    if args.compile_macro:
+        from checkpoints import CheckpointStore
+        from macros import compile_macro, save_macro
+        checkpoint = CheckpointStore(CHECKPOINTS).load(args.compile_macro)
+        macro = compile_macro(checkpoint, args.macro_name or checkpoint.task_id)
+        path = save_macro(macro, MACRO_OPTIONS["dir"])
+        print(f"✅ Compiled {len(macro['steps'])} steps from {checkpoint.task_id} into {path}")
+        return
+
+    profiler = StartupProfiler(enabled=args.profile_startup, start_time=_IMPORT_START)
+    profiler.record("imports", time.perf_counter() - _IMPORT_START)
+
+    # Build the LLM client while Chrome is launching
+    llm_executor = ThreadPoolExecutor(max_workers=1)
+    llm_future = llm_executor.submit(build_llm)
+
     try:
+        connection_options = BROWSER_CONNECTION
+
         # Step 1: Automatically launch Chrome with remote debugging if needed
         if BROWSER_CONNECTION.get("use_existing", False):
             port = 9222  # Default port
@@ -22,31 +69,64 @@ def main():
                     pass
 
             print("Ensuring Chrome is running with remote debugging...")
-            chrome_launched = launch_chrome_with_debugging(port)
+            with profiler.phase("chrome launch"):
+                from chrome_launcher import launch_chrome_with_debugging
+                chrome_launched = launch_chrome_with_debugging(port)
             if not chrome_launched and not BROWSER_CONNECTION.get("fallback_to_new", True):
                 print("❌ Failed to launch Chrome with debugging and fallback is disabled")
                 return
 
+            # Connect straight to the announced websocket instead of looking it up again
+            if isinstance(chrome_launched, str):
+                connection_options = {**BROWSER_CONNECTION, "cdp_endpoint": chrome_launched}
+
         # Step 2: Initialize browser with connection options
         print("Initializing browser...")
-        playwright, browser, page = initialize_browser(BROWSER_OPTIONS, BROWSER_CONNECTION)
+        with profiler.phase("cdp connect"):
+            from browser_setup import connect_browser, prepare_page
+            playwright, browser, page = connect_browser(BROWSER_OPTIONS, connection_options)
 
         # Track connection state
         using_connected_browser = BROWSER_CONNECTION.get("use_existing", False)
 
-        # Rest of your code remains the same
         # Initialize browser controller
         print("Setting up virtual browser controller...")
-        controller = VirtualBrowserController(page)
+        with profiler.phase("page init"):
+            prepare_page(page)
+            print(f"Browser setup successful. User agent: {page.evaluate('() => navigator.userAgent')}")
+
+            from browser_controller import VirtualBrowserController
+            controller = VirtualBrowserController(page)
 
-        # Create LangChain tools
-        print("Creating tools...")
-        tools = create_browser_tools(controller)
+            # Reconnect / reopen the page when Chrome restarts or a renderer crashes or hangs
+            if BROWSER_RECOVERY.get("enabled", True):
+                from browser_recovery import BrowserRecovery
+                controller.recovery = BrowserRecovery(playwright, browser, BROWSER_RECOVERY, BROWSER_OPTIONS,
+                                                      connection_options, connected=using_connected_browser)
 
         # Create the agent with better error handling
         print("Creating agent with tools...")
         try:
-            agent_executor = create_agent(tools, OPENAI_API_KEY)
+            with profiler.phase("agent build"):
+                # The agent modules pull in LangChain, so load them only once the browser is ready
+                from agent_tools import create_browser_tools
+                from agent import create_agent
+                from agent_callbacks import FirstActionTimer, CheckpointCallback, AccountingCallback
+
+                print("Creating tools...")
+                tools = create_browser_tools(controller)
+
+                llm, llm_seconds = llm_future.result()
+                profiler.record("llm client", llm_seconds, "built in background")
+
+                # Cap what the controller and the agent keep between and within tasks
+                memory_budget = None
+                if MEMORY_BUDGET.get("enabled", True):
+                    from memory_budget import MemoryBudget
+                    memory_budget = MemoryBudget(MEMORY_BUDGET)
+                agent_executor = create_agent(
+                    tools, OPENAI_API_KEY, llm=llm,
+                    trim_intermediate_steps=memory_budget.trim_intermediate_steps if memory_budget else -1)
             print("Agent created successfully!")
         except Exception as agent_error:
             print(f"\n❌ ERROR CREATING AGENT: {str(agent_error)}")
@@ -54,12 +134,61 @@ def main():
             traceback.print_exc()
             print("\nTrying to continue without the agent...")
             return  # Exit the function if agent creation fails
+        finally:
+            llm_executor.shutdown(wait=False)
+
+        profiler.report()
+
+        # Optionally keep pre-warmed pages so every task starts on a fresh, ready page
+        page_pool = None
+        if PAGE_POOL.get("enabled", False):
+            if NETWORK_ARCHIVE.get("mode", "off") != "off":
+                print("⚠️ Page pool is not used while network archive mode is active")
+            else:
+                from page_pool import PagePool
+                # Same context as the main page, so pooled pages share its cookies and login
+                page_pool = PagePool(page.context, size=PAGE_POOL.get("size", 2))
+                print(f"Pre-warming {page_pool.size} pages...")
+                page_pool.fill()
+
+        # Every completed step is checkpointed so a crashed task can be resumed with --resume
+        checkpoint_store = None
+        resume_checkpoint = None
+        if CHECKPOINTS.get("enabled", True) or args.resume:
+            from checkpoints import CheckpointStore
+            checkpoint_store = CheckpointStore(CHECKPOINTS)
+            if args.resume:
+                try:
+                    resume_checkpoint = checkpoint_store.load(args.resume)
+                except (OSError, ValueError) as e:
+                    print(f"❌ Could not load checkpoint '{args.resume}': {e}")
+
+        # Replay a recorded flow directly against the controller
+        if args.macro:
+            from macros import load_macro, replay_macro
+            try:
+                macro = load_macro(args.macro, MACRO_OPTIONS["dir"])
+                print(f"\nReplaying macro '{macro['name']}' ({len(macro['steps'])} steps)")
+                result = replay_macro(macro, controller, agent_executor, AGENT_OPTIONS.get("mode", "react"))
+                print("\n" + "="*50)
+                print(f"Macro {result['status']} in {result['seconds']:.2f} seconds "
+                      f"({result['steps_replayed']} steps replayed)")
+                print("="*50)
+                print(result["output"])
+                print("="*50)
+            except Exception as e:
+                print(f"\nError replaying macro: {str(e)}")
 
         # Main interaction loop
+        task_page = None
         keep_running = True
         while keep_running:
-            # Get user query
-            user_query = input("\nEnter your instruction for the browser agent (or type 'exit' to quit): ")
+            # Get user query (or take it from the checkpoint being resumed)
+            if resume_checkpoint is not None:
+                user_query = resume_checkpoint.task_input
+                print(f"\nResuming task {resume_checkpoint.task_id} after step {len(resume_checkpoint.steps)}")
+            else:
+                user_query = input("\nEnter your instruction for the browser agent (or type 'exit' to quit): ")
 
             if user_query.lower() in ['exit', 'quit', 'q']:
                 break
@@ -67,18 +196,63 @@ def main():
             # Execute task with proper input format
             print(f"\nExecuting: {user_query}\n")
             start_time = time.time()
+            archive_context = None
+            checkpoint = None
+            page_source = "reused page, no pool"
 
             try:
-                response = agent_executor.invoke({"input": user_query})
+                # In record/replay mode each task gets its own context and HAR archive
+                if NETWORK_ARCHIVE.get("mode", "off") != "off":
+                    from network_archive import open_archive_context
+                    archive_context, archive_page, _ = open_archive_context(browser, NETWORK_ARCHIVE, user_query)
+                    controller.attach_page(archive_page)
+                elif page_pool is not None:
+                    previous_page = task_page
+                    task_page, wait_seconds, from_pool = page_pool.acquire()
+                    controller.attach_page(task_page)
+                    page_pool.release(previous_page)
+                    page_source = f"{'warm pool' if from_pool else 'cold page'}, ready in {wait_seconds:.2f}s"
+
+                task_input = {"input": user_query}
+                if resume_checkpoint is not None:
+                    from checkpoints import rebuild_steps, restore_browser_state
+                    restored_url = restore_browser_state(controller.page, resume_checkpoint)
+                    print(f"Restored browser state{f' at {restored_url}' if restored_url else ''}")
+                    task_input["resume_steps"] = rebuild_steps(resume_checkpoint, AGENT_OPTIONS.get("mode", "react"))
+                    checkpoint, resume_checkpoint = resume_checkpoint, None
+                elif checkpoint_store is not None:
+                    checkpoint = checkpoint_store.start(user_query)
+
+                first_action_timer = FirstActionTimer(start_time)
+                accounting = AccountingCallback()
+                callbacks = [first_action_timer, accounting]
+                if checkpoint is not None:
+                    callbacks.append(CheckpointCallback(checkpoint, lambda: controller.page,
+                                                        controller.take_resolved_targets))
+                response = agent_executor.invoke(task_input, config={"callbacks": callbacks})
+                response["accounting"] = accounting.summary()
                 end_time = time.time()
 
                 # Print results
                 print("\n" + "="*50)
                 print(f"Execution completed in {end_time - start_time:.2f} seconds")
+                if first_action_timer.seconds is not None:
+                    print(f"Time to first action: {first_action_timer.seconds:.2f} seconds ({page_source})")
+                print(accounting.report(response["accounting"]))
+                if controller.selector_memory is not None:
+                    print(controller.selector_memory.report())
+                if controller.prefetch is not None:
+                    print(controller.prefetch.report())
+                if LLM_GATEWAY.get("enabled", True):
+                    from llm_gateway import get_gateway
+                    print(get_gateway(LLM_GATEWAY).report())
                 print("="*50)
                 print(response.get("output", "No output received"))
                 print("="*50)
 
+                if memory_budget is not None:
+                    print(memory_budget.report(memory_budget.release_task(controller, response)))
+
                 # Ask if user wants to continue
                 continue_input = input("\nContinue with another task? (y/n): ")
                 if continue_input.lower() != 'y':
@@ -93,7 +267,36 @@ def main():
                 if retry_input.lower() != 'y':
                     keep_running = False
 
+            finally:
+                if checkpoint is not None:
+                    checkpoint.close()  # Unfinished checkpoints stay resumable
+                if archive_context is not None:
+                    from network_archive import close_archive_context
+                    close_archive_context(archive_context)
+                    controller.attach_page(page)
+                # A recovered browser replaces the one the main page and the pool were built on
+                if controller.recovery is not None and controller.recovery.browser is not browser:
+                    browser = controller.recovery.browser
+                    if page.is_closed():
+                        if controller.page.is_closed():
+                            new_page = browser.contexts[0].new_page()
+                            prepare_page(new_page)
+                            controller.attach_page(new_page)
+                        page = controller.page
+                    if page_pool is not None:
+                        from page_pool import PagePool
+                        page_pool.close()
+                        page_pool = PagePool(page.context, size=page_pool.size)
+                if page_pool is not None:
+                    page_pool.refill()
+
     finally:
+        if 'page_pool' in locals() and page_pool is not None:
+            stats = page_pool.stats()
+            print(f"Page pool: {stats['hits']} hits, {stats['misses']} misses, "
+                  f"average page init {stats['avg_page_init_seconds']:.2f}s")
+            page_pool.close()
+
         # Pass the connection state to close_browser
         if 'playwright' in locals() and 'browser' in locals():
             # Ask if user wants to close the browser
@@ -105,6 +308,9 @@ def main():
             if close_input.lower() == 'y':
                 # Cleanup with appropriate mode
                 print("Cleaning up browser resources...")
+                from browser_setup import close_browser
+                if 'controller' in locals() and controller.recovery is not None:
+                    browser = controller.recovery.browser  # May have been reconnected
                 close_browser(playwright, browser, is_connected=using_connected_browser)
             else:
                 print("Browser left open. You can close it manually.")
@@ -0,0 +1,69 @@
+import gc
+import os
+import sys
+
+
+def process_memory_mb():
+    """Resident memory of this Python process in MB (peak RSS where psutil is unavailable)."""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+    except ImportError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and kilobytes on Linux
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class MemoryBudget:
+    """
+    Keep a long-lived controller and its agent from growing with every task.
+
+    During a task, observations older than the last few steps are cut down in place, so
+    intermediate_steps stop accumulating full page analyses. After a task the step payloads
+    are dropped and the controller releases its cached analysis and images. When the process
+    is over max_rss_mb, caches are cleared more aggressively and the garbage collector runs.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self.baseline_mb = process_memory_mb()
+        self.last_mb = self.baseline_mb
+
+    def trim_intermediate_steps(self, intermediate_steps):
+        """AgentExecutor trim_intermediate_steps hook: shorten old observations in place."""
+        keep = self.options["keep_full_steps"]
+        limit = self.options["max_observation_chars"]
+        for index in range(max(0, len(intermediate_steps) - keep)):
+            action, observation = intermediate_steps[index]
+            if isinstance(observation, str) and len(observation) > limit:
+                intermediate_steps[index] = (action, observation[:limit] + "\n...observation trimmed...")
+        return intermediate_steps
+
+    def release_task(self, controller, response=None):
+        """
+        Drop what a finished task no longer needs and return memory metrics.
+
+        Returns:
+            dict: rss_mb, delta_mb (since the previous task), over_budget
+        """
+        if isinstance(response, dict) and "intermediate_steps" in response:
+            steps = response.pop("intermediate_steps")
+            if isinstance(steps, list):
+                steps.clear()
+
+        rss_mb = process_memory_mb()
+        over_budget = bool(self.options["max_rss_mb"]) and rss_mb > self.options["max_rss_mb"]
+        controller.release_memory(aggressive=over_budget)
+        if over_budget:
+            gc.collect()
+            rss_mb = process_memory_mb()
+
+        metrics = {"rss_mb": rss_mb, "delta_mb": rss_mb - self.last_mb, "over_budget": over_budget}
+        self.last_mb = rss_mb
+        return metrics
+
+    def report(self, metrics):
+        return (f"Memory: {metrics['rss_mb']:.1f} MB RSS ({metrics['delta_mb']:+.1f} MB this task, "
+                f"{metrics['rss_mb'] - self.baseline_mb:+.1f} MB since start)"
+                + (" - over budget, caches cleared" if metrics["over_budget"] else ""))
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import re
+from pathlib import Path
+
+from browser_setup import prepare_page
+
+ARCHIVE_MODES = ("off", "record", "replay")
+NOT_FOUND_POLICIES = ("abort", "fallback")
+
+
+def har_path_for_task(har_dir, task):
+    """Map a task instruction to a stable HAR file path inside har_dir."""
+    slug = re.sub(r'[^a-z0-9]+', '-', task.lower()).strip('-')[:60] or "task"
+    digest = hashlib.sha1(task.strip().encode("utf-8")).hexdigest()[:10]
+    return Path(har_dir) / f"{slug}-{digest}.har"
+
+
+def open_archive_context(browser, archive_options, task):
+    """
+    Open a dedicated browser context for one task in record or replay mode.
+
+    Args:
+        browser: Connected or launched Playwright browser
+        archive_options: NETWORK_ARCHIVE-style dict with mode, har_dir, not_found and url_filter
+        task: The user instruction, used to name the HAR archive
+
+    Returns:
+        tuple: (context, page, har_path) with the page already prepared for the controller
+    """
+    mode = archive_options.get("mode", "off")
+    if mode not in ARCHIVE_MODES or mode == "off":
+        raise ValueError(f"Network archive mode must be 'record' or 'replay', got '{mode}'")
+
+    har_path = har_path_for_task(archive_options.get("har_dir", "har_archives"), task)
+    url_filter = archive_options.get("url_filter") or None
+
+    if mode == "record":
+        os.makedirs(har_path.parent, exist_ok=True)
+        # The HAR is flushed to disk when the context is closed
+        context = browser.new_context(
+            viewport=None,
+            record_har_path=str(har_path),
+            record_har_mode="full",
+            record_har_url_filter=url_filter,
+        )
+        print(f"📼 Recording network traffic to {har_path}")
+    else:
+        if not har_path.exists():
+            raise FileNotFoundError(f"No HAR archive recorded for this task (expected {har_path})")
+
+        not_found = archive_options.get("not_found", "abort")
+        if not_found not in NOT_FOUND_POLICIES:
+            print(f"⚠️ Unknown not_found policy '{not_found}', using 'abort'")
+            not_found = "abort"
+
+        context = browser.new_context(viewport=None)
+        context.route_from_har(str(har_path), url=url_filter, not_found=not_found)
+        print(f"📼 Replaying network traffic from {har_path} (unmatched requests: {not_found})")
+
+    page = context.new_page()
+    prepare_page(page)
+    return context, page, har_path
+
+
+def close_archive_context(context):
+    """Close a task context, which also writes the HAR file in record mode."""
+    try:
+        context.close()
+    except Exception as e:
+        print(f"Error closing archive context: {str(e)}")
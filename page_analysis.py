@@ -0,0 +1,427 @@
+import time
+import uuid
+import weakref
+from collections import deque
+
+# Shared in-page helpers: visibility, element typing, attributes and the node extractor
+ANALYZE_HELPERS_JS = """
+                // Helper function to check if element is visible
+                function isVisible(el) {
+                    if (!el.getBoundingClientRect) return false;
+                    const rect = el.getBoundingClientRect();
+
+                    // Check if element has dimensions
+                    if (rect.width <= 0 || rect.height <= 0) return false;
+
+                    // Check CSS properties that would make it invisible
+                    const style = window.getComputedStyle(el);
+                    if (style.display === 'none' ||
+                        style.visibility === 'hidden' ||
+                        parseFloat(style.opacity) <= 0.1) {
+                        return false;
+                    }
+
+                    return true;
+                }
+
+                // Helper to clean text
+                function cleanText(text) {
+                    if (!text) return '';
+                    return text.replace(/\\s+/g, ' ').trim();
+                }
+
+                // In the analyze_page method, replace the current getElementType function with this enhanced version:
+                function getElementType(el) {
+                    const tagName = el.tagName.toLowerCase();
+                    const type = el.getAttribute('type')?.toLowerCase();
+                    const role = el.getAttribute('role')?.toLowerCase();
+
+                    // Interactive elements with specific types
+                    if (tagName === 'a') return 'link';
+                    if (tagName === 'button') return 'button';
+
+                    if (tagName === 'input') {
+                        if (['submit', 'button', 'reset'].includes(type)) return 'button';
+                        if (['text', 'email', 'password', 'search', 'tel', 'url'].includes(type)) return 'input';
+                        if (type === 'checkbox') return 'checkbox';
+                        if (type === 'radio') return 'radio';
+                        return 'input'; // Default for other input types
+                    }
+
+                    if (tagName === 'select') return 'dropdown';
+                    if (tagName === 'textarea') return 'textarea';
+
+                    // Check for ARIA roles
+                    if (role === 'button') return 'button';
+                    if (role === 'link') return 'link';
+                    if (role === 'checkbox') return 'checkbox';
+                    if (role === 'radio') return 'radio';
+                    if (role === 'textbox' || role === 'searchbox') return 'input';
+                    if (role === 'combobox' || role === 'listbox') return 'dropdown';
+                    if (role === 'tab') return 'tab';
+
+                    // Check for interactive divs/spans
+                    const style = window.getComputedStyle(el);
+                    const hasClickHandler = el.onclick || el.getAttribute('onclick');
+                    const isPointable = style.cursor === 'pointer';
+
+                    if ((tagName === 'div' || tagName === 'span') && (hasClickHandler || isPointable)) {
+                        // Try to determine a more specific type for divs/spans that are clickable
+                        if (el.getAttribute('aria-haspopup') === 'true') return 'dropdown';
+                        if (el.classList.contains('btn') || el.classList.contains('button')) return 'button';
+                        if (el.getAttribute('href') || el.getAttribute('url')) return 'link';
+
+                        // If we can't determine a more specific type, default to button
+                        return 'button';
+                    }
+
+                    // Enhanced detection for additional interactive elements
+                    if (el.getAttribute('onclick') || el.getAttribute('tabindex') === '0') return 'interactive';
+                    if (style.cursor === 'pointer') return 'interactive';
+
+                    // Form label elements often need to be clickable
+                    if (tagName === 'label') return 'label';
+
+                    // Interactive list items
+                    if (tagName === 'li' && (isPointable || hasClickHandler)) return 'listitem';
+
+                    // Images that might be clickable
+                    if (tagName === 'img' && (isPointable || hasClickHandler || el.parentElement?.tagName.toLowerCase() === 'a'))
+                        return 'image';
+
+                    // Headers that might be expandable
+                    if (['h1','h2','h3','h4','h5','h6'].includes(tagName) && (isPointable || hasClickHandler))
+                        return 'header';
+
+                    // For elements that aren't clearly interactive but have children that are
+                    if (el.querySelector('a, button, input, select, textarea')) return 'container';
+
+                    // Last resort: any element with sufficient content should be identifiable
+                    if (el.innerText && el.innerText.trim().length > 0 &&
+                        ['div', 'span', 'p', 'section', 'article'].includes(tagName))
+                        return 'content';
+
+                    return null; // Only truly non-interactive elements get null
+                }
+
+                // Get all attributes of an element
+                function getElementAttributes(el) {
+                    const result = {};
+                    for (const attr of el.attributes) {
+                        result[attr.name] = attr.value;
+                    }
+                    return result;
+                }
+
+                // Generate CSS selector for element
+                function generateSelector(el) {
+                    if (!el) return '';
+                    if (el.id) return '#' + CSS.escape(el.id);
+
+                    let selector = el.tagName.toLowerCase();
+
+                    if (el.classList && el.classList.length) {
+                        const classes = Array.from(el.classList).slice(0, 2);
+                        selector += '.' + classes.join('.');
+                    }
+
+                    return selector;
+                }
+
+                // Get parent info for context
+                function getParentInfo(el) {
+                    if (!el || !el.parentElement) return null;
+
+                    const parent = el.parentElement;
+                    return {
+                        tagName: parent.tagName.toLowerCase(),
+                        id: parent.id || '',
+                        className: parent.className || '',
+                        text: cleanText(parent.innerText || parent.textContent || '').substring(0, 50)
+                    };
+                }
+
+                // Extract visible content maintaining the document structure. processNode can be
+                // called on several roots in turn; nodes already processed are skipped. startId
+                // continues the numbering of an earlier analysis.
+                function createExtractor(startId = 0) {
+                    const extractedContent = [];
+                    const detailedElements = [];
+                    const processedNodes = new Set();
+                    let elementId = startId;
+
+                    // Process elements in document order
+                    function processNode(node, depth = 0, recurse = true) {
+                        if (!node || processedNodes.has(node)) return;
+                        processedNodes.add(node);
+
+                        // Only process elements (not text nodes or other node types)
+                        if (node.nodeType !== Node.ELEMENT_NODE) return;
+
+                        // Skip invisible elements
+                        if (!isVisible(node)) return;
+
+                        // Get element's own text (excluding child element text)
+                        let ownText = '';
+
+                        for (const child of node.childNodes) {
+                            if (child.nodeType === Node.TEXT_NODE) {
+                                ownText += child.textContent;
+                            }
+                        }
+                        ownText = cleanText(ownText);
+
+                        // Get element type
+                        const elementType = getElementType(node);
+
+                        // Replace the conditional element processing block with this:
+                        // For interactive elements, add with type prefix
+                        if (elementType) {
+                            // For input fields, use placeholder or name if there's no text
+                            let displayText = ownText;
+                            if ((elementType === 'input' || elementType === 'textarea') && !displayText) {
+                                displayText = node.getAttribute('placeholder') ||
+                                            node.getAttribute('name') ||
+                                            node.getAttribute('aria-label') ||
+                                            node.getAttribute('title') || '';
+                            }
+
+                            // For images without text, use alt text
+                            if (elementType === 'image' && !displayText) {
+                                displayText = node.getAttribute('alt') || node.getAttribute('title') || 'image';
+                            }
+
+                            // Only include elements that have text content or are interactive inputs
+                            if (displayText || elementType === 'input' || elementType === 'button' ||
+                                elementType === 'checkbox' || elementType === 'radio') {
+                                if (!displayText) displayText = elementType; // Default text is the element type
+
+                                // Add element ID to the output
+                                extractedContent.push(`[${elementId}][${elementType}]${displayText}`);
+
+                                // Get detailed information about the element
+                                const rect = node.getBoundingClientRect();
+                                const elementInfo = {
+                                    id: elementId,
+                                    tagName: node.tagName,
+                                    type: elementType,
+                                    text: displayText,
+                                    x: rect.left + window.pageXOffset,
+                                    y: rect.top + window.pageYOffset,
+                                    width: rect.width,
+                                    height: rect.height,
+                                    center_x: rect.left + rect.width/2 + window.pageXOffset,
+                                    center_y: rect.top + rect.height/2 + window.pageYOffset,
+                                    inViewport: (
+                                        rect.top >= 0 &&
+                                        rect.left >= 0 &&
+                                        rect.bottom <= (window.innerHeight || document.documentElement.clientHeight) &&
+                                        rect.right <= (window.innerWidth || document.documentElement.clientWidth)
+                                    ),
+                                    attributes: getElementAttributes(node),
+                                    cssSelector: generateSelector(node),
+                                    parentInfo: getParentInfo(node),
+                                    innerHTML: node.innerHTML.substring(0, 200),
+                                    childElementCount: node.childElementCount,
+                                    isDisabled: node.disabled || node.hasAttribute('disabled'),
+                                    zIndex: parseInt(window.getComputedStyle(node).zIndex) || 0
+                                };
+
+                                detailedElements.push(elementInfo);
+                                elementId++;
+                            }
+                        }
+                        // For non-interactive elements with text, just add the text
+                        else if (ownText && ownText.length > 1) {
+                            extractedContent.push(ownText);
+                        }
+
+                        // Process children in document order
+                        if (!recurse) return;
+                        for (const child of node.children) {
+                            processNode(child, depth + 1);
+                        }
+                    }
+
+                    return {
+                        processNode: processNode,
+                        content: extractedContent,
+                        elements: detailedElements
+                    };
+                }
+
+"""
+
+# In-page DOM analysis used by analyze_page
+ANALYZE_PAGE_JS = """
+            () => {""" + ANALYZE_HELPERS_JS + """
+                // Extract content in document structure order
+                const extractor = createExtractor();
+                extractor.processNode(document.body);
+                return {
+                    content: extractor.content,
+                    elements: extractor.elements
+                };
+            }
+            """
+
+# Streaming variant: the page is split into regions that are extracted one at a time and
+# sent through the exposed binding. Each send waits for Python to accept the chunk; a false
+# reply (or the cancel flag) stops the traversal. Starts the run and returns immediately.
+STREAM_ANALYSIS_JS = """
+            (params) => {
+                const { runId, order, chunkElements, maxRegionSize } = params;
+                window.__agentAnalysisCancelled = window.__agentAnalysisCancelled || {};
+""" + ANALYZE_HELPERS_JS + """
+                // Split the body into regions of at most maxRegionSize descendant elements
+                function collectRegions(root) {
+                    const regions = [];
+                    const visit = (node) => {
+                        if (node.getElementsByTagName('*').length <= maxRegionSize || node.children.length === 0) {
+                            regions.push({ node, recurse: true });
+                            return;
+                        }
+                        // Hidden containers are skipped whole, as in the one-shot analysis
+                        if (!isVisible(node)) return;
+                        regions.push({ node, recurse: false });  // The container itself, then its children
+                        for (const child of node.children) visit(child);
+                    };
+                    visit(root);
+                    return regions;
+                }
+
+                function intersectsViewport(region) {
+                    const rect = region.node.getBoundingClientRect();
+                    return rect.bottom > 0 && rect.right > 0 &&
+                        rect.top < window.innerHeight && rect.left < window.innerWidth;
+                }
+
+                const run = async () => {
+                    const extractor = createExtractor();
+                    let regions = collectRegions(document.body);
+                    if (order === 'viewport') {
+                        regions = regions.filter(intersectsViewport).concat(regions.filter(r => !intersectsViewport(r)));
+                    }
+
+                    let sentContent = 0;
+                    let sentElements = 0;
+                    let index = 0;
+                    const send = async (done) => {
+                        const chunk = {
+                            runId, index: index++, done,
+                            content: extractor.content.slice(sentContent),
+                            elements: extractor.elements.slice(sentElements)
+                        };
+                        sentContent = extractor.content.length;
+                        sentElements = extractor.elements.length;
+                        return await window.__agentAnalysisChunk(chunk);
+                    };
+
+                    for (const region of regions) {
+                        if (window.__agentAnalysisCancelled[runId]) return;
+                        extractor.processNode(region.node, 0, region.recurse);
+                        if (extractor.elements.length - sentElements >= chunkElements) {
+                            if (!(await send(false))) return;
+                        }
+                    }
+                    await send(true);
+                };
+
+                run().catch(error => window.__agentAnalysisChunk({ runId, done: true, error: String(error) }));
+                return runId;
+            }
+            """
+
+
+class PageAnalysisStream:
+    """
+    Run the page analysis region by region and hand the chunks to Python as a generator.
+
+    Playwright's sync API only delivers binding calls while a call is blocking, so the
+    generator pumps the event loop between chunks. The in-page traversal waits for every
+    chunk to be accepted, which means it never runs far ahead of the consumer; closing the
+    generator (or breaking out of a loop over it) cancels the traversal.
+    """
+
+    BINDING_NAME = "__agentAnalysisChunk"
+
+    def __init__(self):
+        self._bound_pages = weakref.WeakSet()
+        self._runs = {}
+        self.last_stats = None
+
+    def _bind(self, page):
+        if page not in self._bound_pages:
+            page.expose_binding(self.BINDING_NAME, self._on_chunk)
+            self._bound_pages.add(page)
+
+    def _on_chunk(self, source, chunk):
+        """Binding handler: queue the chunk and tell the page whether to keep going."""
+        run = self._runs.get(chunk.get("runId"))
+        if run is None or run["cancelled"]:
+            return False
+        run["chunks"].append(chunk)
+        return True
+
+    def stream(self, page, order="document", chunk_elements=25, max_region_size=400, timeout=20):
+        """
+        Yield analysis chunks ({"index", "content", "elements", "done"}) as the page produces them.
+
+        Args:
+            page: Playwright page to analyze
+            order: "document" for document order, "viewport" for visible regions first
+            chunk_elements: Interactive elements collected before a chunk is sent
+            max_region_size: Largest subtree (in elements) extracted in one go
+            timeout: Seconds to wait for the whole run
+        """
+        self._bind(page)
+        run_id = uuid.uuid4().hex
+        run = {"chunks": deque(), "cancelled": False}
+        self._runs[run_id] = run
+
+        start_time = time.time()
+        stats = {"order": order, "chunks": 0, "elements": 0, "first_element_seconds": None,
+                 "total_seconds": None, "completed": False}
+        try:
+            page.evaluate(STREAM_ANALYSIS_JS, {"runId": run_id, "order": order,
+                                               "chunkElements": chunk_elements, "maxRegionSize": max_region_size})
+            while True:
+                while run["chunks"]:
+                    chunk = run["chunks"].popleft()
+                    if chunk.get("error"):
+                        raise RuntimeError(f"Page analysis failed: {chunk['error']}")
+
+                    stats["chunks"] += 1
+                    stats["elements"] += len(chunk["elements"])
+                    if chunk["elements"] and stats["first_element_seconds"] is None:
+                        stats["first_element_seconds"] = time.time() - start_time
+                    if chunk["done"]:
+                        stats["completed"] = True
+
+                    yield chunk
+                    if chunk["done"]:
+                        return
+
+                if time.time() - start_time > timeout:
+                    raise TimeoutError(f"Page analysis did not finish within {timeout}s")
+                page.wait_for_timeout(5)
+        finally:
+            stats["total_seconds"] = time.time() - start_time
+            self.last_stats = stats
+            run["cancelled"] = True
+            self._runs.pop(run_id, None)
+            if not stats["completed"]:
+                try:
+                    page.evaluate("runId => { (window.__agentAnalysisCancelled || {})[runId] = true; }", run_id)
+                except Exception:
+                    pass  # Page may have navigated away
+
+    def report(self):
+        stats = self.last_stats
+        if not stats:
+            return "Streaming analysis: no runs yet"
+        first = (f"{stats['first_element_seconds']:.3f}s" if stats["first_element_seconds"] is not None
+                 else "n/a")
+        return (f"Streaming analysis ({stats['order']} order): first element in {first}, "
+                f"{stats['elements']} elements in {stats['chunks']} chunks, {stats['total_seconds']:.3f}s total"
+                + ("" if stats["completed"] else " (stopped early)"))
@@ -0,0 +1,87 @@
+import time
+from collections import deque
+
+from browser_setup import prepare_page
+
+
+class PagePool:
+    """
+    Keep a few fully initialized pages (init scripts installed, cursor ready) on standby.
+
+    Playwright's sync API is bound to the thread that started it, so the pool cannot
+    refill from a worker thread. Instead callers hand out a page with acquire() and
+    call refill() once the task is done, keeping page setup off the critical path.
+    """
+
+    def __init__(self, context, size=2, history=100):
+        self.context = context
+        self.size = max(0, int(size))
+        self._ready = deque()
+        self.hits = 0
+        self.misses = 0
+        self.init_times = deque(maxlen=history)  # Recent page init times, for stats()
+
+    def _new_page(self):
+        """Create and prepare a single page, recording how long it took."""
+        start = time.time()
+        page = self.context.new_page()
+        prepare_page(page)
+        self.init_times.append(time.time() - start)
+        return page
+
+    def fill(self):
+        """Top the pool up to its target size."""
+        # Drop pages that were closed or crashed while waiting
+        self._ready = deque(page for page in self._ready if not page.is_closed())
+
+        while len(self._ready) < self.size:
+            try:
+                self._ready.append(self._new_page())
+            except Exception as e:
+                print(f"⚠️ Could not pre-warm page: {str(e)}")
+                break
+
+    # Refilling between tasks is the "background" step for the sync API
+    refill = fill
+
+    def acquire(self):
+        """
+        Hand out a ready page, creating one on the spot if the pool is empty.
+
+        Returns:
+            tuple: (page, seconds spent waiting for it, whether it came from the pool)
+        """
+        start = time.time()
+        while self._ready:
+            page = self._ready.popleft()
+            if not page.is_closed():
+                self.hits += 1
+                return page, time.time() - start, True
+
+        self.misses += 1
+        page = self._new_page()
+        return page, time.time() - start, False
+
+    def release(self, page):
+        """Close a page that is no longer needed."""
+        try:
+            if page and not page.is_closed():
+                page.close()
+        except Exception as e:
+            print(f"Error releasing page: {str(e)}")
+
+    def close(self):
+        """Close all standby pages."""
+        while self._ready:
+            self.release(self._ready.popleft())
+
+    def stats(self):
+        """Return pool hit/miss counts and the average init time of recent pages."""
+        avg_init = sum(self.init_times) / len(self.init_times) if self.init_times else 0.0
+        return {
+            "size": self.size,
+            "ready": len(self._ready),
+            "hits": self.hits,
+            "misses": self.misses,
+            "avg_page_init_seconds": round(avg_init, 3),
+        }
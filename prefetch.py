@@ -0,0 +1,131 @@
+import re
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urljoin, urldefrag, urlparse
+
+from background_pages import BackgroundLoad
+
+# Links that change state when merely loaded (a GET logout, "remove from cart") are never prefetched
+UNSAFE_LINK_PATTERN = re.compile(
+    r'log[\s_-]?(out|off)|sign[\s_-]?(out|off)|delete|remove|unsubscribe|cart|basket|checkout', re.IGNORECASE)
+# Query parameters that carry an action or a one-time token
+ACTION_QUERY_KEYS = {"action", "act", "do", "cmd", "op", "token", "csrf", "csrf_token", "_token", "nonce",
+                     "sig", "signature", "confirm"}
+
+
+def is_safe_to_prefetch(text, url):
+    """False for links whose text or URL suggests that loading them does something."""
+    if UNSAFE_LINK_PATTERN.search(text or '') or UNSAFE_LINK_PATTERN.search(url):
+        return False
+    return not any(key.lower() in ACTION_QUERY_KEYS
+                   for key, _ in parse_qsl(urlparse(url).query, keep_blank_values=True))
+
+
+def prefetch_candidates(elements, current_url, options):
+    """
+    Pick the links most likely to be clicked next from an AnalyzePage element list.
+
+    Result-style links (enough text to be a title) in the viewport come first, then the
+    rest in document order. Navigation back to the current page, anchors, scripts and links
+    that look like actions (logout, delete, cart, action or token query parameters) are skipped.
+    """
+    current = urldefrag(current_url)[0]
+    current_origin = urlparse(current_url).netloc
+    ranked = []
+
+    for element in elements or []:
+        if element.get('type') != 'link' or element.get('isDisabled'):
+            continue
+        href = (element.get('attributes') or {}).get('href')
+        if not href or href.startswith(('#', 'javascript:', 'mailto:', 'tel:')):
+            continue
+        if len((element.get('text') or '').strip()) < options["min_text_length"]:
+            continue
+
+        url = urldefrag(urljoin(current_url, href))[0]
+        if url == current or not url.startswith(('http://', 'https://')):
+            continue
+        if options["same_origin_only"] and urlparse(url).netloc != current_origin:
+            continue
+        if not is_safe_to_prefetch(element.get('text'), url):
+            continue
+
+        ranked.append((0 if element.get('inViewport') else 1, len(ranked), url))
+
+    urls = []
+    for _, _, url in sorted(ranked):
+        if url not in urls:
+            urls.append(url)
+        if len(urls) >= options["max_links"]:
+            break
+    return urls
+
+
+class PrefetchCache:
+    """
+    Warm background pages for links the agent is likely to open next.
+
+    Pages load in the agent's own context with nothing blocked by default, so a page taken
+    for use is swapped in exactly as loaded, DOM and script state included. They are kept
+    for a short TTL. At most max_concurrent loads are started per batch and at most
+    max_pages pages are held at once, which bounds the extra memory used by the browser.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self.loads = OrderedDict()  # url -> BackgroundLoad, oldest first
+        self.stats = {"started": 0, "used": 0, "expired": 0}
+
+    def expire(self):
+        """Close prefetched pages older than the TTL."""
+        now = time.time()
+        for url, load in list(self.loads.items()):
+            if now - load.started_at > self.options["ttl"]:
+                load.close()
+                del self.loads[url]
+                self.stats["expired"] += 1
+
+    def prefetch(self, context, urls, setup=None):
+        """Start background loads for urls that are not already warm, within the limits."""
+        self.expire()
+        started = []
+        for url in urls:
+            if url in self.loads:
+                continue
+            if len(started) >= self.options["max_concurrent"]:
+                break
+
+            # Make room by dropping the oldest warm page
+            while len(self.loads) >= self.options["max_pages"]:
+                _, oldest = self.loads.popitem(last=False)
+                oldest.close()
+
+            self.loads[url] = BackgroundLoad(context, url, self.options["block_resources"], setup=setup)
+            started.append(url)
+
+        self.stats["started"] += len(started)
+        if started:
+            print(f"Prefetching {len(started)} likely next pages: {', '.join(started)}")
+        return started
+
+    def take(self, url):
+        """Remove and return the warm load for url, or None if it is not prefetched (or expired)."""
+        self.expire()
+        load = self.loads.pop(urldefrag(url)[0], None)
+        if load is None or load.page.is_closed():
+            return None
+
+        # With block_resources configured, resources skipped during the load stay missing;
+        # later requests from the page go through
+        load.stop_blocking()
+        self.stats["used"] += 1
+        return load
+
+    def clear(self):
+        for load in self.loads.values():
+            load.close()
+        self.loads.clear()
+
+    def report(self):
+        return (f"Prefetch: {self.stats['used']}/{self.stats['started']} prefetched pages used, "
+                f"{self.stats['expired']} expired")
@@ -0,0 +1,177 @@
+import json
+
+from page_analysis import ANALYZE_HELPERS_JS
+
+# One async in-page loop: scroll a step, let the page settle, check the condition. New content
+# is tracked with a MutationObserver, and only the subtrees added during the loop are analyzed
+# at the end, numbered after the elements of the last analysis.
+SCROLL_UNTIL_JS = """
+            async (params) => {""" + ANALYZE_HELPERS_JS + """
+                const { mode, text, selector, count, maxScrolls, stepRatio, settleMs, stableRounds,
+                        timeoutMs, startId } = params;
+                const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+                const started = Date.now();
+
+                // Pages that keep their feed in an inner scrolling box scroll that box instead
+                function findScroller() {
+                    const root = document.scrollingElement || document.documentElement;
+                    if (root.scrollHeight > window.innerHeight + 2) return root;
+                    let best = root, bestArea = 0;
+                    for (const el of document.querySelectorAll('body *')) {
+                        if (el.scrollHeight <= el.clientHeight + 2) continue;
+                        const overflow = getComputedStyle(el).overflowY;
+                        if (overflow !== 'auto' && overflow !== 'scroll') continue;
+                        const area = el.clientWidth * el.clientHeight;
+                        if (area > bestArea) { best = el; bestArea = area; }
+                    }
+                    return best;
+                }
+                const scroller = findScroller();
+                const viewportHeight = scroller === (document.scrollingElement || document.documentElement)
+                    ? window.innerHeight : scroller.clientHeight;
+
+                // Top-level subtrees added while scrolling (children of added nodes are covered by them)
+                const added = new Set();
+                const observer = new MutationObserver(mutations => {
+                    for (const mutation of mutations) {
+                        for (const node of mutation.addedNodes) {
+                            if (node.nodeType !== Node.ELEMENT_NODE || node.id === 'ai-agent-cursor') continue;
+                            let parent = node.parentElement, nested = false;
+                            while (parent) {
+                                if (added.has(parent)) { nested = true; break; }
+                                parent = parent.parentElement;
+                            }
+                            if (!nested) added.add(node);
+                        }
+                    }
+                });
+                observer.observe(document.body, { childList: true, subtree: true });
+
+                // A subtree added as a wrapper (a page of results) holds several items: its largest
+                // group of same-looking children, when they make up most of it. Anything else is one item.
+                const signature = (el) => el.tagName + '.' +
+                    Array.from(el.classList).filter(name => !/\\d/.test(name)).sort().join('.');
+                const repeatedChildren = (node) => {
+                    while (node.children.length === 1) node = node.children[0];
+                    const groups = {};
+                    for (const child of node.children) (groups[signature(child)] = groups[signature(child)] || []).push(child);
+                    const largest = Object.values(groups).sort((a, b) => b.length - a.length)[0] || [];
+                    return largest.length >= 2 && largest.length >= node.children.length / 2 ? largest : null;
+                };
+                const newItems = () => {
+                    let total = 0;
+                    for (const node of added) {
+                        if (!node.isConnected || !cleanText(node.innerText || '')) continue;
+                        const items = repeatedChildren(node);
+                        total += items ? items.filter(item => cleanText(item.textContent || '')).length : 1;
+                    }
+                    return total;
+                };
+
+                function findTarget() {
+                    if (mode === 'selector') {
+                        const el = document.querySelector(selector);
+                        return el && isVisible(el) ? el : null;
+                    }
+                    if (mode === 'text') {
+                        const wanted = text.toLowerCase();
+                        const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+                        while (walker.nextNode()) {
+                            const parent = walker.currentNode.parentElement;
+                            if (parent && walker.currentNode.textContent.toLowerCase().includes(wanted) && isVisible(parent)) {
+                                return parent;
+                            }
+                        }
+                    }
+                    return null;
+                }
+
+                let status = 'max_scrolls', scrolls = 0, stable = 0, target = null;
+                let lastHeight = scroller.scrollHeight;
+                try {
+                    while (true) {
+                        target = findTarget();
+                        if (target) { status = 'found'; break; }
+                        if (mode === 'items' && newItems() >= count) { status = 'loaded'; break; }
+                        if (scrolls >= maxScrolls) break;
+                        if (Date.now() - started > timeoutMs) { status = 'timeout'; break; }
+
+                        scroller.scrollBy(0, Math.max(100, viewportHeight * stepRatio));
+                        scrolls++;
+                        await sleep(settleMs);
+
+                        // End of content: at the bottom and the height stopped growing
+                        const atBottom = scroller.scrollTop + viewportHeight >= scroller.scrollHeight - 2;
+                        stable = (atBottom && scroller.scrollHeight === lastHeight) ? stable + 1 : 0;
+                        lastHeight = scroller.scrollHeight;
+                        if (stable >= stableRounds) { status = 'end'; break; }
+                    }
+                } finally {
+                    observer.disconnect();
+                }
+
+                if (target) target.scrollIntoView({ block: 'center' });
+
+                const extractor = createExtractor(startId);
+                for (const node of added) {
+                    if (node.isConnected) extractor.processNode(node);
+                }
+                return {
+                    status, scrolls,
+                    newItems: newItems(),
+                    targetText: target ? cleanText(target.innerText || target.textContent || '').substring(0, 100) : null,
+                    seconds: (Date.now() - started) / 1000,
+                    height: scroller.scrollHeight,
+                    content: extractor.content,
+                    elements: extractor.elements
+                };
+            }
+            """
+
+STATUS_MESSAGES = {
+    "found": "Found {target}",
+    "loaded": "Loaded {new_items} new items",
+    "end": "Reached the end of the content",
+    "max_scrolls": "Stopped after {scrolls} scrolls without meeting the condition",
+    "timeout": "Stopped at the time limit without meeting the condition",
+}
+
+
+def parse_scroll_condition(input_text):
+    """
+    Turn ScrollUntil input into (mode, params).
+
+    JSON: {"text": "..."}, {"selector": "..."}, {"new_items": N} or {"end": true}, each with
+    an optional "max_scrolls". Plain input: "end"/"bottom", a number of new items, or text to find.
+    """
+    spec = input_text
+    if isinstance(input_text, str):
+        stripped = input_text.strip().strip("'\"").strip()
+        try:
+            spec = json.loads(stripped)
+        except ValueError:
+            spec = stripped
+    if isinstance(spec, int):
+        spec = {"new_items": spec}
+    if isinstance(spec, str):
+        if spec.lower() in ("", "end", "bottom"):
+            spec = {"end": True}
+        elif spec.isdigit():
+            spec = {"new_items": int(spec)}
+        else:
+            spec = {"text": spec}
+    if not isinstance(spec, dict):
+        raise ValueError("Expected text to find, a number of new items, 'end', or a JSON condition")
+
+    params = {"text": None, "selector": None, "count": 0}
+    if spec.get("text"):
+        mode, params["text"] = "text", str(spec["text"])
+    elif spec.get("selector"):
+        mode, params["selector"] = "selector", str(spec["selector"])
+    elif spec.get("new_items"):
+        mode, params["count"] = "items", int(spec["new_items"])
+    else:
+        mode = "end"
+    if spec.get("max_scrolls"):
+        params["maxScrolls"] = int(spec["max_scrolls"])
+    return mode, params
@@ -0,0 +1,204 @@
+import json
+import os
+import re
+import time
+from urllib.parse import urlparse
+
+# Re-find a remembered element: candidates come from the stored selector and must still
+# match the stored fingerprint (text or stable attributes) and be visible.
+LOOKUP_JS = """
+(entry) => {
+    function normalizeText(text) {
+        if (!text) return '';
+        text = text.replace(/\\s+/g, ' ').trim().toLowerCase();
+        return text.replace(/\\s*\\/\\s*/g, '/');
+    }
+
+    function isVisible(el) {
+        const rect = el.getBoundingClientRect();
+        if (rect.width <= 0 || rect.height <= 0) return false;
+        const style = window.getComputedStyle(el);
+        return !(style.display === 'none' || style.visibility === 'hidden' ||
+            parseFloat(style.opacity) <= 0.1);
+    }
+
+    function elementText(el) {
+        return normalizeText(el.innerText || '') || normalizeText(el.textContent || '') || normalizeText(
+            el.getAttribute('aria-label') || el.getAttribute('placeholder') || el.getAttribute('value') ||
+            el.getAttribute('title') || el.getAttribute('name') || el.getAttribute('alt') || el.id || '');
+    }
+
+    let elements;
+    try {
+        elements = document.querySelectorAll(entry.selector);
+    } catch (e) {
+        return null;
+    }
+    if (elements.length > 50) return null;  // Selector too generic to trust
+
+    const fingerprint = entry.fingerprint;
+    const attributes = Object.entries(fingerprint.attributes || {});
+    let best = null;
+    let bestScore = 0;
+    for (const el of elements) {
+        if (el.disabled || !isVisible(el)) continue;
+
+        // Accept on the same text, or on every stable attribute matching
+        const textMatch = !!fingerprint.text && elementText(el).substring(0, 100) === fingerprint.text;
+        const attributeMatches = attributes.filter(([name, value]) => el.getAttribute(name) === value).length;
+        if (!textMatch && (attributes.length === 0 || attributeMatches < attributes.length)) continue;
+
+        const score = (textMatch ? attributes.length + 1 : 0) + attributeMatches;
+        if (score > bestScore) {
+            best = el;
+            bestScore = score;
+        }
+    }
+    if (!best) return null;
+
+    const rect = best.getBoundingClientRect();
+    return {
+        score: bestScore,
+        tagName: best.tagName,
+        type: entry.type,
+        text: elementText(best).substring(0, 100),
+        x: rect.left + window.pageXOffset,
+        y: rect.top + window.pageYOffset,
+        width: rect.width,
+        height: rect.height,
+        center_x: rect.left + rect.width/2 + window.pageXOffset,
+        center_y: rect.top + rect.height/2 + window.pageYOffset,
+        inViewport: rect.top >= 0 && rect.left >= 0 &&
+                rect.bottom <= (window.innerHeight || document.documentElement.clientHeight) &&
+                rect.right <= (window.innerWidth || document.documentElement.clientWidth),
+        cssSelector: entry.selector,
+        fromSelectorMemory: true
+    };
+}
+"""
+
+# Attributes stable enough to identify an element across visits
+FINGERPRINT_ATTRIBUTES = ["id", "name", "aria-label", "data-testid", "type", "role", "href"]
+
+
+def url_pattern(url):
+    """Path of a URL with ids and numbers wildcarded, e.g. /item/123/reviews -> /item/*/reviews."""
+    path = urlparse(url).path or "/"
+    parts = [("*" if re.search(r'\d', part) or len(part) > 40 else part) for part in path.split("/")]
+    return "/".join(parts)
+
+
+def normalize_description(text):
+    return re.sub(r'\s+', ' ', str(text or "")).strip().lower()
+
+
+class SelectorMemory:
+    """
+    Persistent per-domain map from (description, type, URL pattern) to the element that matched.
+
+    On a repeat visit the remembered selector is checked with one cheap query before the
+    full DOM scoring runs; a stale entry is dropped and relearned from the full search.
+    """
+
+    def __init__(self, path, max_entries_per_domain=200):
+        self.path = path
+        self.max_entries_per_domain = max_entries_per_domain
+        self.domains = {}
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "seconds_saved": 0.0}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.domains = json.load(f).get("domains", {})
+        except FileNotFoundError:
+            self.domains = {}
+        except (ValueError, OSError) as e:
+            print(f"Could not read selector memory {self.path}: {e}")
+            self.domains = {}
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"domains": self.domains}, f, indent=1)
+        os.replace(temp_path, self.path)
+
+    @staticmethod
+    def _key(target_type, description, url):
+        return f"{target_type or ''}|{normalize_description(description)}|{url_pattern(url)}"
+
+    def lookup(self, page, target_type, description):
+        """Return the remembered element for this page if it is still there, else None."""
+        if not description and not target_type:
+            return None
+
+        domain = urlparse(page.url).netloc
+        key = self._key(target_type, description, page.url)
+        entry = self.domains.get(domain, {}).get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+
+        start_time = time.time()
+        result = page.evaluate(LOOKUP_JS, {
+            "selector": entry["selector"], "fingerprint": entry["fingerprint"], "type": entry["type"]
+        })
+        lookup_seconds = time.time() - start_time
+
+        if not result:
+            # Page changed since we learned it; forget and let full scoring relearn
+            self.stats["stale"] += 1
+            self.stats["misses"] += 1
+            del self.domains[domain][key]
+            return None
+
+        entry["hits"] = entry.get("hits", 0) + 1
+        entry["last_used"] = time.time()
+        self.stats["hits"] += 1
+        self.stats["seconds_saved"] += max(0.0, entry.get("find_seconds", 0.0) - lookup_seconds)
+        print(f"Selector memory hit for '{description}' on {domain}: {entry['selector']}")
+        return result
+
+    def remember(self, url, target_type, description, element, find_seconds):
+        """Store the element that full scoring picked for this description."""
+        selector = element.get("cssSelector")
+        if not selector or (not description and not target_type):
+            return
+
+        attributes = element.get("attributes") or {}
+        domain = urlparse(url).netloc
+        entries = self.domains.setdefault(domain, {})
+        entries[self._key(target_type, description, url)] = {
+            "selector": selector,
+            "type": element.get("type"),
+            "fingerprint": {
+                "text": element.get("text", ""),
+                "attributes": {name: attributes[name] for name in FINGERPRINT_ATTRIBUTES if name in attributes},
+            },
+            "url_pattern": url_pattern(url),
+            "find_seconds": find_seconds,
+            "hits": 0,
+            "last_used": time.time(),
+        }
+
+        # Keep the most recently used entries per domain
+        if len(entries) > self.max_entries_per_domain:
+            oldest = sorted(entries, key=lambda k: entries[k].get("last_used", 0))
+            for key in oldest[:len(entries) - self.max_entries_per_domain]:
+                del entries[key]
+
+        try:
+            self.save()
+        except OSError as e:
+            print(f"Could not save selector memory: {e}")
+
+    def report(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        if not lookups:
+            return "Selector memory: no lookups yet"
+        return (f"Selector memory: {self.stats['hits']}/{lookups} hits "
+                f"({100 * self.stats['hits'] / lookups:.0f}%), {self.stats['stale']} stale, "
+                f"~{self.stats['seconds_saved']:.2f}s saved")
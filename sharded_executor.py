@@ -0,0 +1,230 @@
+import argparse
+import atexit
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from config import (
+    OPENAI_API_KEY, BROWSER_OPTIONS, SHARDED_OPTIONS, RESOURCE_MONITOR, BROWSER_RECOVERY, LLM_GATEWAY
+)
+
+# Per-process state set up by _init_worker; each worker owns one Chrome, controller and agent
+_worker = {}
+
+
+def _launch_worker_chrome(port, profile_dir):
+    """Start this worker's Chrome and return (chrome process, playwright, prepared page)."""
+    from chrome_launcher import launch_isolated_chrome
+    from browser_setup import connect_browser, prepare_page
+
+    chrome_process, ws_url = launch_isolated_chrome(port, profile_dir, headless=BROWSER_OPTIONS.get("headless", False))
+    connection = {"use_existing": True, "cdp_endpoint": ws_url or f"http://localhost:{port}", "fallback_to_new": False}
+    playwright, browser, page = connect_browser(BROWSER_OPTIONS, connection)
+    prepare_page(page)
+    return chrome_process, playwright, browser, page
+
+
+def _relaunch_worker_chrome():
+    """Recovery relaunch: this worker's Chrome died, so start a new one on the same port and profile."""
+    from chrome_monitor import find_browser_process
+
+    print(f"[worker {_worker['worker_id']}] relaunching Chrome")
+    _stop_worker_chrome()
+    chrome_process, playwright, browser, page = _launch_worker_chrome(_worker["port"], _worker["profile_dir"])
+    _worker.update(chrome_process=chrome_process, playwright=playwright)
+    if _worker.get("monitor") is not None:
+        _worker["monitor"].reset(find_browser_process(pid=chrome_process.pid))
+    return page.context
+
+
+def _browser_recovery(playwright, browser, port):
+    if not BROWSER_RECOVERY.get("enabled", True):
+        return None
+    from browser_recovery import BrowserRecovery
+    # Nothing else would restart a worker's Chrome, so waiting to reconnect to it is pointless
+    return BrowserRecovery(playwright, browser, BROWSER_RECOVERY, BROWSER_OPTIONS,
+                           {"cdp_endpoint": f"http://localhost:{port}"}, relaunch=_relaunch_worker_chrome)
+
+
+def _init_worker(worker_ids, options):
+    """Process-pool initializer: launch this worker's own Chrome and build its agent."""
+    from browser_controller import VirtualBrowserController
+    from agent_tools import create_browser_tools
+    from agent import create_agent
+
+    worker_id = worker_ids.get()
+    port = options["base_port"] + worker_id
+
+    # The LLM gateway governs one process, so each worker gets its share of the account's limits
+    LLM_GATEWAY["max_in_flight"] = max(1, LLM_GATEWAY["max_in_flight"] // options["workers"])
+    LLM_GATEWAY["tokens_per_minute"] //= options["workers"]
+    profile_dir = os.path.abspath(os.path.join(options["profile_dir"], f"worker-{worker_id}"))
+
+    chrome_process, playwright, browser, page = _launch_worker_chrome(port, profile_dir)
+    controller = VirtualBrowserController(page)
+    controller.recovery = _browser_recovery(playwright, browser, port)
+    agent_executor = create_agent(create_browser_tools(controller), OPENAI_API_KEY)
+    _worker.update(worker_id=worker_id, port=port, profile_dir=profile_dir, chrome_process=chrome_process,
+                   playwright=playwright, controller=controller, agent_executor=agent_executor,
+                   monitor=None, recycles=0)
+
+    if RESOURCE_MONITOR.get("enabled", True):
+        from chrome_monitor import ChromeResourceMonitor, find_browser_process
+        _worker["monitor"] = ChromeResourceMonitor(find_browser_process(pid=chrome_process.pid), RESOURCE_MONITOR,
+                                                   label=f"worker {worker_id}").start()
+
+    atexit.register(_shutdown_worker)
+    print(f"[worker {worker_id}] ready on port {port}")
+
+
+def _stop_worker_chrome():
+    try:
+        _worker["playwright"].stop()
+    except Exception:
+        pass
+    chrome_process = _worker.get("chrome_process")
+    if chrome_process is not None and chrome_process.poll() is None:
+        chrome_process.terminate()
+        try:
+            chrome_process.wait(timeout=5)
+        except Exception:
+            chrome_process.kill()
+
+
+def _shutdown_worker():
+    if _worker.get("monitor") is not None:
+        _worker["monitor"].stop()
+    _stop_worker_chrome()
+
+
+def _recycle_worker_chrome(reason):
+    """
+    Restart this worker's Chrome between tasks, keeping the controller and agent.
+
+    The profile directory keeps persistent cookies on its own; session cookies and
+    localStorage are carried over from a storage_state() snapshot.
+    """
+    from browser_setup import restore_storage_state
+    from chrome_monitor import find_browser_process
+
+    worker_id = _worker["worker_id"]
+    print(f"[worker {worker_id}] recycling Chrome ({reason})")
+    controller = _worker["controller"]
+    state = controller.page.context.storage_state()
+
+    _stop_worker_chrome()
+    chrome_process, playwright, browser, page = _launch_worker_chrome(_worker["port"], _worker["profile_dir"])
+    restore_storage_state(page.context, state)
+    controller.attach_page(page)
+    controller.recovery = _browser_recovery(playwright, browser, _worker["port"])
+    controller.release_memory(aggressive=True)
+
+    _worker.update(chrome_process=chrome_process, playwright=playwright, recycles=_worker["recycles"] + 1)
+    _worker["monitor"].reset(find_browser_process(pid=chrome_process.pid))
+
+
+def _run_task(index, instruction):
+    """Run one instruction on this worker's agent and return a result record."""
+    start_time = time.time()
+    record = {"index": index, "input": instruction, "worker": _worker.get("worker_id")}
+    from agent_callbacks import AccountingCallback
+
+    accounting = AccountingCallback()
+    try:
+        response = _worker["agent_executor"].invoke({"input": instruction}, config={"callbacks": [accounting]})
+        record["output"] = response.get("output", "")
+        record["accounting"] = accounting.summary()["totals"]
+    except Exception as e:
+        record["error"] = str(e)
+    record["seconds"] = round(time.time() - start_time, 2)
+
+    monitor = _worker.get("monitor")
+    if monitor is not None:
+        record["chrome"] = monitor.latest()
+        if monitor.recycle_reason:
+            # Tasks are handed out one at a time, so nothing else is using this Chrome right now
+            try:
+                _recycle_worker_chrome(monitor.recycle_reason)
+                record["recycled"] = True
+            except Exception as e:
+                print(f"[worker {_worker['worker_id']}] Chrome recycle failed: {str(e)}")
+    return record
+
+
+def run_sharded(instructions, workers=None, on_result=None):
+    """
+    Run instructions across a pool of worker processes, each with its own Chrome.
+
+    Tasks are handed out one at a time as workers become free, so long and short tasks
+    balance themselves. Results come back in input order.
+
+    Args:
+        instructions: List of task instructions
+        workers: Number of worker processes (default SHARDED_OPTIONS["workers"])
+        on_result: Optional callable invoked with each result as it completes
+    """
+    workers = min(workers or SHARDED_OPTIONS["workers"], len(instructions)) or 1
+
+    # Playwright and Chrome do not survive fork well, so workers are always spawned fresh
+    context = multiprocessing.get_context("spawn")
+    worker_ids = context.Queue()
+    for worker_id in range(workers):
+        worker_ids.put(worker_id)
+
+    results = [None] * len(instructions)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(worker_ids, {**SHARDED_OPTIONS, "workers": workers})) as executor:
+        futures = {executor.submit(_run_task, index, instruction): index
+                   for index, instruction in enumerate(instructions)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. Chrome failed to start)
+                result = {"index": index, "input": instructions[index], "worker": None, "error": str(e)}
+            results[index] = result
+            if on_result:
+                on_result(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many browser-agent tasks in parallel, one Chrome per worker")
+    parser.add_argument("tasks_file", help="Text file with one instruction per line")
+    parser.add_argument("--workers", type=int, default=SHARDED_OPTIONS["workers"])
+    parser.add_argument("--output", default="sharded_results.jsonl", help="JSONL file for the results")
+    args = parser.parse_args()
+
+    with open(args.tasks_file, "r", encoding="utf-8") as f:
+        instructions = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if not instructions:
+        print("No tasks to run")
+        return
+
+    start_time = time.time()
+    done = []
+
+    def report(result):
+        done.append(result)
+        status = "error: " + result["error"] if "error" in result else "ok"
+        print(f"[{len(done)}/{len(instructions)}] worker {result['worker']} task {result['index']} "
+              f"({result.get('seconds', 0):.1f}s): {status}")
+
+    print(f"Running {len(instructions)} tasks on {min(args.workers, len(instructions))} workers...")
+    results = run_sharded(instructions, args.workers, on_result=report)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        for result in results:
+            f.write(json.dumps(result) + "\n")
+
+    elapsed = time.time() - start_time
+    failures = sum(1 for result in results if "error" in result)
+    print(f"✅ {len(results) - failures}/{len(results)} tasks succeeded in {elapsed:.1f}s "
+          f"({len(results) / elapsed * 60:.1f} tasks/min). Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import time
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """Collect per-phase startup timings and print them as a small table."""
+
+    def __init__(self, enabled=False, start_time=None):
+        self.enabled = enabled
+        self.start_time = start_time if start_time is not None else time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        """Time the wrapped block as one startup phase."""
+        phase_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - phase_start)
+
+    def record(self, name, seconds, note=""):
+        """Add a phase measured elsewhere (e.g. on a background thread)."""
+        self.phases.append((name, seconds, note))
+
+    def report(self):
+        """Print the breakdown if profiling was requested."""
+        if not self.enabled:
+            return
+
+        total = time.perf_counter() - self.start_time
+        print("\n" + "="*50)
+        print("Startup profile")
+        print("="*50)
+        for name, seconds, note in self.phases:
+            suffix = f"  ({note})" if note else ""
+            print(f"  {name:<20} {seconds:7.3f}s{suffix}")
+        print("-"*50)
+        print(f"  {'total':<20} {total:7.3f}s")
+        print("="*50)
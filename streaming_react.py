@@ -0,0 +1,91 @@
+import json
+import re
+import time
+from collections import deque
+
+from langchain_core.messages import AIMessage
+
+# Default ReAct stop sequence; generation also ends here when the action is not dispatched early
+REACT_STOP = ["\nObservation"]
+
+ACTION_PATTERN = re.compile(r'Action\s*\d*\s*:(.*?)\n\s*Action\s*\d*\s*Input\s*\d*\s*:[ \t]*', re.DOTALL)
+
+
+def action_end(text):
+    """
+    Return the index where a complete Action / Action Input ends in text, or None.
+
+    The input must be on the Action Input line itself. Plain inputs are complete at the end
+    of that line; inputs starting with { or [ are complete once they parse as JSON, since
+    FillForm specs may span several lines. A Final Answer is never cut short.
+    """
+    if "Final Answer:" in text:
+        return None
+    match = ACTION_PATTERN.search(text)
+    if not match:
+        return None
+
+    start = match.end()
+    rest = text[start:]
+    newline = rest.find("\n")
+    if newline <= 0:
+        return None  # Input line not finished, or the input is on a later line
+
+    if rest.lstrip()[:1] in ("{", "["):
+        # Try each line end after the opening bracket until the JSON is whole
+        position = newline
+        while position != -1:
+            try:
+                json.loads(rest[:position])
+                return start + position
+            except ValueError:
+                position = rest.find("\n", position + 1)
+        return None
+    return start + newline
+
+
+class StreamingReActLLM:
+    """
+    Stream a ReAct completion and hand it to the parser as soon as the action is complete.
+
+    Used in place of the model in the ReAct agent chain. Tokens are read as they arrive;
+    once Action and a finished Action Input are present, the stream is closed, which drops
+    the HTTP response so the server stops generating, and the text up to the action is
+    returned. Completions without an early cut (final answers, odd formats) are read to
+    the end exactly as before.
+    """
+
+    def __init__(self, llm, stop=None, history=200):
+        self.llm = llm
+        self.stop = stop or REACT_STOP
+        self.calls = deque(maxlen=history)
+
+    def __call__(self, prompt_value, config):
+        start_time = time.time()
+        first_token_at = None
+        text = ""
+        cut = None
+
+        stream = self.llm.stream(prompt_value, config=config, stop=self.stop)
+        try:
+            for chunk in stream:
+                if first_token_at is None:
+                    first_token_at = time.time()
+                text += chunk.content if isinstance(chunk.content, str) else ""
+                cut = action_end(text)
+                if cut is not None:
+                    break
+        finally:
+            stream.close()
+
+        end_time = time.time()
+        call = {
+            "early": cut is not None,
+            "first_token_seconds": round((first_token_at or end_time) - start_time, 3),
+            "seconds": round(end_time - start_time, 3),
+            "chars": len(text),
+        }
+        self.calls.append(call)
+        if call["early"]:
+            print(f"\n⚡ Action dispatched after {call['seconds']:.2f}s of generation, rest of the output skipped")
+        return AIMessage(content=text[:cut] if cut is not None else text)
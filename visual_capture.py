@@ -0,0 +1,229 @@
+import base64
+import hashlib
+import os
+import struct
+import time
+import zlib
+from collections import OrderedDict
+
+# Grid used for the difference hash: 9x8 grayscale gives a 64-bit hash
+HASH_WIDTH = 9
+HASH_HEIGHT = 8
+# Width of the tiny PNG captured for hashing, before it is reduced to the grid
+THUMB_WIDTH = 36
+
+
+def _decode_png(data):
+    """
+    Decode an 8-bit RGB/RGBA/grayscale PNG into (width, height, rows of gray values).
+
+    Only what Chrome produces for screenshots is supported; the images decoded here
+    are tiny thumbnails, so a pure Python decoder is fast enough.
+    """
+    if data[:8] != b'\x89PNG\r\n\x1a\n':
+        raise ValueError("Not a PNG image")
+
+    position = 8
+    width = height = color_type = None
+    compressed = []
+    while position < len(data):
+        length, chunk_type = struct.unpack(">I4s", data[position:position + 8])
+        chunk = data[position + 8:position + 8 + length]
+        position += 12 + length
+        if chunk_type == b'IHDR':
+            width, height, bit_depth, color_type = struct.unpack(">IIBB", chunk[:10])
+            if bit_depth != 8 or color_type not in (0, 2, 4, 6):
+                raise ValueError(f"Unsupported PNG format (depth {bit_depth}, color type {color_type})")
+        elif chunk_type == b'IDAT':
+            compressed.append(chunk)
+        elif chunk_type == b'IEND':
+            break
+
+    channels = {0: 1, 2: 3, 4: 2, 6: 4}[color_type]
+    raw = zlib.decompress(b"".join(compressed))
+    stride = width * channels
+    previous = bytearray(stride)
+    gray_rows = []
+    offset = 0
+
+    for _ in range(height):
+        filter_type = raw[offset]
+        line = bytearray(raw[offset + 1:offset + 1 + stride])
+        offset += 1 + stride
+
+        # Undo the per-row PNG filter
+        for i in range(stride):
+            left = line[i - channels] if i >= channels else 0
+            up = previous[i]
+            if filter_type == 1:
+                line[i] = (line[i] + left) & 0xFF
+            elif filter_type == 2:
+                line[i] = (line[i] + up) & 0xFF
+            elif filter_type == 3:
+                line[i] = (line[i] + ((left + up) >> 1)) & 0xFF
+            elif filter_type == 4:
+                upper_left = previous[i - channels] if i >= channels else 0
+                estimate = left + up - upper_left
+                pa, pb, pc = abs(estimate - left), abs(estimate - up), abs(estimate - upper_left)
+                predictor = left if pa <= pb and pa <= pc else (up if pb <= pc else upper_left)
+                line[i] = (line[i] + predictor) & 0xFF
+        previous = line
+
+        if channels >= 3:
+            gray_rows.append([(line[i] * 299 + line[i + 1] * 587 + line[i + 2] * 114) // 1000
+                              for i in range(0, stride, channels)])
+        else:
+            gray_rows.append([line[i] for i in range(0, stride, channels)])
+
+    return width, height, gray_rows
+
+
+def difference_hash(png_bytes):
+    """64-bit difference hash of a PNG: each bit says whether a cell is brighter than its right neighbour."""
+    width, height, gray = _decode_png(png_bytes)
+
+    # Box-average the thumbnail down to the hash grid
+    grid = []
+    for row in range(HASH_HEIGHT):
+        y0, y1 = row * height // HASH_HEIGHT, max((row + 1) * height // HASH_HEIGHT, row * height // HASH_HEIGHT + 1)
+        cells = []
+        for column in range(HASH_WIDTH):
+            x0 = column * width // HASH_WIDTH
+            x1 = max((column + 1) * width // HASH_WIDTH, x0 + 1)
+            total = sum(sum(gray[y][x0:x1]) for y in range(y0, min(y1, height)))
+            cells.append(total / max(1, (min(y1, height) - y0) * (x1 - x0)))
+        grid.append(cells)
+
+    value = 0
+    for cells in grid:
+        for column in range(HASH_WIDTH - 1):
+            value = (value << 1) | (1 if cells[column] > cells[column + 1] else 0)
+    return value
+
+
+def hamming_distance(first, second):
+    return bin(first ^ second).count("1")
+
+
+class ImageObservation(str):
+    """Tool output text that also carries a JPEG for the model to look at (see agent.screenshot_messages)."""
+
+    def __new__(cls, text, image):
+        observation = super().__new__(cls, text)
+        observation.image = image
+        return observation
+
+
+class VisualCapture:
+    """
+    Downscaled viewport screenshots with perceptual-hash dedupe.
+
+    Each capture first grabs a tiny PNG thumbnail through CDP and hashes it. If the hash is
+    close to the previous frame, no full screenshot is taken at all; otherwise a viewport-only,
+    downscaled JPEG is captured and saved. A small LRU of recent frames lets the agent be told
+    that the page went back to something it has already seen.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self.frames = OrderedDict()  # hash -> frame info, most recent last
+        self.last_hash = None
+        self.frame_count = 0
+        self._cdp_page = None
+        self._cdp = None
+
+    def _session(self, page):
+        """CDP session for the page, recreated when the controller moves to another page."""
+        if self._cdp_page is not page:
+            self._cdp = page.context.new_cdp_session(page)
+            self._cdp_page = page
+        return self._cdp
+
+    def _capture(self, page, image_format, target_width, quality=None):
+        """Capture the current viewport scaled so the image is about target_width pixels wide."""
+        viewport = page.evaluate("() => ({width: window.innerWidth, height: window.innerHeight, "
+                                 "x: window.scrollX, y: window.scrollY, dpr: window.devicePixelRatio || 1})")
+        scale = min(1.0, target_width / (viewport["width"] * viewport["dpr"]))
+        params = {
+            "format": image_format,
+            "clip": {"x": viewport["x"], "y": viewport["y"], "width": viewport["width"],
+                     "height": viewport["height"], "scale": scale},
+            "captureBeyondViewport": False,
+        }
+        if quality is not None:
+            params["quality"] = quality
+        return base64.b64decode(self._session(page).send("Page.captureScreenshot", params)["data"])
+
+    def capture(self, page, force=False):
+        """
+        Capture the viewport unless it looks the same as the last frame.
+
+        force skips both the last-frame and the LRU comparison and always stores a new image.
+
+        Returns:
+            dict: status ("unchanged", "seen_before" or "new"), hash, distance, and frame info
+        """
+        start_time = time.time()
+        jpeg = None
+        try:
+            frame_hash = difference_hash(self._capture(page, "png", THUMB_WIDTH))
+        except Exception as e:
+            # Non-Chromium pages or odd PNG formats fall back to an exact hash of a normal screenshot
+            print(f"Perceptual hash unavailable ({e}); using exact comparison")
+            jpeg = page.screenshot(type="jpeg", quality=self.options["jpeg_quality"])
+            frame_hash = int(hashlib.sha1(jpeg).hexdigest()[:16], 16)
+
+        if not force:
+            seen = self._compare(frame_hash, start_time)
+            if seen is not None:
+                return seen
+
+        if jpeg is None:
+            jpeg = self._capture(page, "jpeg", self.options["max_width"], self.options["jpeg_quality"])
+        return self._store(page, frame_hash, jpeg, start_time)
+
+    def _compare(self, frame_hash, start_time):
+        """Result for a frame matching the last one or one in the LRU, or None for a new look."""
+        threshold = self.options["change_threshold"]
+        if self.last_hash is not None and hamming_distance(frame_hash, self.last_hash) <= threshold:
+            frame = self.frames.get(self.last_hash)
+            if frame:
+                self.frames.move_to_end(self.last_hash)
+            return {"status": "unchanged", "hash": frame_hash, "frame": frame,
+                    "distance": hamming_distance(frame_hash, self.last_hash),
+                    "seconds": time.time() - start_time}
+
+        # Same look as an older frame in the LRU (e.g. after going back)
+        for known_hash, frame in reversed(self.frames.items()):
+            if hamming_distance(frame_hash, known_hash) <= threshold:
+                self.frames.move_to_end(known_hash)
+                self.last_hash = known_hash
+                return {"status": "seen_before", "hash": frame_hash, "frame": frame,
+                        "distance": hamming_distance(frame_hash, known_hash),
+                        "seconds": time.time() - start_time}
+        return None
+
+    def _store(self, page, frame_hash, jpeg, start_time):
+        """Save a new frame to disk and the LRU."""
+        self.frame_count += 1
+        os.makedirs(self.options["screenshot_dir"], exist_ok=True)
+        path = os.path.join(self.options["screenshot_dir"], f"frame_{self.frame_count:04d}_{frame_hash:016x}.jpg")
+        with open(path, "wb") as f:
+            f.write(jpeg)
+
+        frame = {"number": self.frame_count, "path": path, "url": page.url,
+                 "bytes": len(jpeg), "image": jpeg, "captured_at": time.time()}
+        self.frames[frame_hash] = frame
+        self.last_hash = frame_hash
+        while len(self.frames) > self.options["cache_size"]:
+            self.frames.popitem(last=False)
+
+        return {"status": "new", "hash": frame_hash, "frame": frame, "distance": None,
+                "seconds": time.time() - start_time}
+
+    def drop_images(self, keep_last=True):
+        """Release JPEG bytes held in the LRU; hashes and paths stay so dedupe keeps working."""
+        for frame_hash, frame in self.frames.items():
+            if keep_last and frame_hash == self.last_hash:
+                continue
+            frame["image"] = None